@@ -0,0 +1,81 @@
+# Created by Sinclert Perez (Sinclert@hotmail.com)
+
+# Program to compare the training time and F-score of several sentences budgets
+# Usage: python3 budget_curve.py <training profile name> <budget 1> <budget 2> ...
+
+
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+os.chdir(os.path.dirname(os.path.abspath(__file__)))
+
+from clf_node import NodeClassif
+from pipeline_config import read_training_profile
+
+
+
+
+def compare(profile: str, budgets: list, algorithm: str = 'logistic-regression', feats_pct: int = 5):
+
+	""" Prints the training times and validation F-score of every sentences budget
+
+	The first training time includes reading, tokenizing and vectorizing
+	the sentences (unless their tokens or features were already cached),
+	while the second one only includes the features selection and fitting.
+
+	Arguments:
+	----------
+		profile: JSON training profile file name
+		budgets: maximum total numbers of training sentences (None for all)
+		algorithm: name of the algorithm to train (optional)
+		feats_pct: percentage of features to keep (optional)
+
+	"""
+
+	profile_data, pipeline = read_training_profile(profile)
+
+	print('budget', 'pipeline', 'first_s', 'fit_s', 'f_score', sep = '\t')
+
+	for budget in budgets:
+		node = NodeClassif(
+			algorithm = algorithm,
+			feats_pct = feats_pct,
+			lang = 'english',
+			pipeline = pipeline
+		)
+
+		times = []
+
+		for _ in range(2):
+			start = time.time()
+			node.train(profile_data, validate = False, budget = budget)
+			times.append(time.time() - start)
+
+		scores = node.evaluate(
+			profile_data = profile_data,
+			algorithms_names = [algorithm],
+			feats_pcts = [feats_pct],
+			cv_folds = 5,
+			budget = budget
+		)
+
+		print(
+			budget or 'all',
+			node.fingerprint[:12],
+			round(times[0], 2),
+			round(times[1], 2),
+			round(scores[(algorithm, feats_pct)], 4),
+			sep = '\t'
+		)
+
+
+
+
+if __name__ == '__main__':
+
+	if len(sys.argv) < 3:
+		exit('Usage: python3 budget_curve.py <training profile name> <budget 1> <budget 2> ...')
+
+	compare(sys.argv[1], [int(b) for b in sys.argv[2:]] + [None])
@@ -0,0 +1,122 @@
+# Created by Sinclert Perez (Sinclert@hotmail.com)
+
+# Program to compare the string and token ids n-grams vectorizers
+# Usage: python3 compare_ngrams.py <training profile name>
+
+
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+os.chdir(os.path.dirname(os.path.abspath(__file__)))
+
+from sklearn.feature_extraction.text import CountVectorizer
+
+from pipeline_config import read_training_profile
+from text_tokenizer import get_tokenizer
+from text_vectorizer import IdNgramVectorizer
+from token_cache import TokenCache
+from utils import read_lines
+
+
+
+
+def measure(function, *args) -> tuple:
+
+	""" Runs a function measuring its time and its peak of allocated memory
+
+	Arguments:
+	----------
+		function: function to run
+		args: function arguments
+
+	Returns:
+	----------
+		result: function result
+		seconds: elapsed seconds
+		peak: peak of allocated megabytes
+
+	"""
+
+	tracemalloc.start()
+	start = time.time()
+
+	result = function(*args)
+
+	seconds = time.time() - start
+	peak = tracemalloc.get_traced_memory()[1] / 2 ** 20
+	tracemalloc.stop()
+
+	return result, seconds, peak
+
+
+
+
+def compare(profile: str, lang: str = 'english'):
+
+	""" Prints the fitting and transforming costs of both vectorizers
+
+	Arguments:
+	----------
+		profile: JSON training profile file name
+		lang: language of the datasets sentences (optional)
+
+	"""
+
+	datasets, pipeline = read_training_profile(profile)
+
+	tokenizer = get_tokenizer(lang, **pipeline['tokenizer'])
+	ngram_range = tuple(pipeline['vectorizer']['ngram_range'])
+	cache = TokenCache(tokenizer)
+	docs, sentences = [], []
+
+	for info in datasets:
+		docs.extend(cache.load(info['dataset_name']))
+		sentences.extend(read_lines(info['dataset_name'], 'dataset'))
+
+	print('vectorizer', 'fit_s', 'fit_mb', 'transform_s', 'transform_mb', 'equal', sep = '\t')
+	reference = None
+
+	for vectorizer in (CountVectorizer, IdNgramVectorizer):
+		vectorizer = vectorizer(tokenizer = tokenizer, lowercase = False, ngram_range = ngram_range)
+		fitted, fit_time, fit_peak = measure(vectorizer.fit_transform, docs)
+
+		# Each vectorizer transforms the raw sentences through its batch path
+		if isinstance(vectorizer, IdNgramVectorizer):
+			feats, transform_time, transform_peak = measure(vectorizer.transform, sentences)
+		else:
+			feats, transform_time, transform_peak = measure(
+				lambda s: vectorizer.transform(tokenizer.tokenize_docs(s)),
+				sentences
+			)
+
+		if reference is None:
+			reference = (vectorizer.vocabulary_, fitted, feats)
+
+		equal = (
+			vectorizer.vocabulary_ == reference[0]
+			and (fitted != reference[1]).nnz == 0
+			and (feats != reference[2]).nnz == 0
+		)
+
+		print(
+			type(vectorizer).__name__,
+			round(fit_time, 2),
+			round(fit_peak, 1),
+			round(transform_time, 2),
+			round(transform_peak, 1),
+			equal,
+			sep = '\t'
+		)
+
+
+
+
+if __name__ == '__main__':
+
+	if len(sys.argv) != 2:
+		exit('Usage: python3 compare_ngrams.py <training profile name>')
+
+	compare(sys.argv[1])
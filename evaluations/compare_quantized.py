@@ -0,0 +1,134 @@
+# Created by Sinclert Perez (Sinclert@hotmail.com)
+
+# Program to compare a trained model with its quantized versions
+# Usage: python3 compare_quantized.py <model name> <dataset 1> <dataset 2> ...
+
+
+import os
+import pickle
+import sys
+import time
+
+import numpy
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+os.chdir(os.path.dirname(os.path.abspath(__file__)))
+
+from clf_node import NodeClassif
+from quantized_model import QuantizedModel
+from quantized_model import precisions
+from utils import read_lines
+
+
+
+
+def model_bytes(model) -> int:
+
+	""" Computes the memory used by the arrays of a model
+
+	Arguments:
+	----------
+		model: sklearn.estimator or QuantizedModel object
+
+	Returns:
+	----------
+		bytes: total bytes of the model arrays
+
+	"""
+
+	if isinstance(model, QuantizedModel):
+		return model.nbytes()
+
+	arrays = [v for v in vars(model).values() if isinstance(v, numpy.ndarray)]
+	return sum(a.nbytes for a in arrays if a.dtype != object)
+
+
+
+
+def predict(node: NodeClassif, sentences: list) -> tuple:
+
+	""" Predicts the labels and label probabilities of the given sentences
+
+	Arguments:
+	----------
+		node: trained NodeClassif object
+		sentences: texts to classify
+
+	Returns:
+	----------
+		labels: predicted label of each sentence
+		scores: probability of each label (None if unknown or not probabilistic)
+		seconds: elapsed seconds
+
+	"""
+
+	start = time.time()
+	labels, scores = node.predict_batch_scores(sentences)
+
+	return labels, scores, time.time() - start
+
+
+
+
+def compare(model: str, datasets: list):
+
+	""" Prints the agreement, memory and speed of every weights precision
+
+	Arguments:
+	----------
+		model: saved model file name
+		datasets: names of the datasets to classify
+
+	"""
+
+	sentences = []
+
+	for dataset in datasets:
+		sentences.extend(read_lines(dataset, 'dataset'))
+
+	reference = NodeClassif(model)
+	labels, scores, seconds = predict(reference, sentences)
+
+	print('precision', 'weights_kb', 'pickle_kb', 'predict_s', 'agreement', 'max_score_diff', sep = '\t')
+	print(
+		'float64',
+		round(model_bytes(reference.model) / 2 ** 10, 1),
+		round(len(pickle.dumps(reference.__dict__)) / 2 ** 10, 1),
+		round(seconds, 2),
+		1.0,
+		0.0 if any(s is not None for s in scores) else None,
+		sep = '\t'
+	)
+
+	for precision in precisions:
+		node = NodeClassif(model)
+		node.quantize(precision)
+
+		q_labels, q_scores, q_seconds = predict(node, sentences)
+		agreement = numpy.mean([a == b for a, b in zip(labels, q_labels)])
+
+		# Scores are only compared when both versions predict the same label
+		diffs = [
+			abs(a - b) for a, b, l, q in zip(scores, q_scores, labels, q_labels)
+			if (l == q) and (a is not None) and (b is not None)
+		]
+
+		print(
+			precision,
+			round(model_bytes(node.model) / 2 ** 10, 1),
+			round(len(pickle.dumps(node.__dict__)) / 2 ** 10, 1),
+			round(q_seconds, 2),
+			round(agreement, 5),
+			round(max(diffs), 5) if diffs else None,
+			sep = '\t'
+		)
+
+
+
+
+if __name__ == '__main__':
+
+	if len(sys.argv) < 3:
+		exit('Usage: python3 compare_quantized.py <model name> <dataset 1> <dataset 2> ...')
+
+	compare(sys.argv[1], sys.argv[2:])
@@ -0,0 +1,92 @@
+# Created by Sinclert Perez (Sinclert@hotmail.com)
+
+# Program to compare the tokenizer speed with and without a stem table
+# Usage: python3 compare_stemmers.py <language> <dataset names>
+
+
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+os.chdir(os.path.dirname(os.path.abspath(__file__)))
+
+from text_tokenizer import TextTokenizer
+from utils import read_lines
+
+
+
+
+def measure(tokenizer: TextTokenizer, sentences: list) -> tuple:
+
+	""" Tokenizes the sentences one by one, as done during prediction
+
+	Arguments:
+	----------
+		tokenizer: TextTokenizer object
+		sentences: texts to tokenize
+
+	Returns:
+	----------
+		seconds: tokenization time
+		tokens: list containing the tokens of each sentence
+
+	"""
+
+	start = time.time()
+	tokens = [tokenizer(s) for s in sentences]
+
+	return time.time() - start, tokens
+
+
+
+
+def compare(lang: str, datasets: list):
+
+	""" Prints the tokenizer speed using Snowball only and using a stem table
+
+	Arguments:
+	----------
+		lang: language to perform the tokenizer process
+		datasets: dataset file names
+
+	"""
+
+	sentences = []
+
+	for dataset in datasets:
+		sentences.extend(read_lines(dataset, 'dataset'))
+
+	# Half of the sentences build the table, all of them are tokenized
+	train = sentences[::2]
+
+	snowball = TextTokenizer(lang)
+	snowball.max_stems = 0
+	snowball_time, snowball_tokens = measure(snowball, sentences)
+
+	table = TextTokenizer(lang)
+	table.add_stems(table.build_stems(train))
+	table_size = len(table.stems)
+	table_time, table_tokens = measure(table, sentences)
+
+	print('lang', 'sentences', 'table_words', 'snowball_s', 'table_s', 'speedup', 'equal', sep = '\t')
+	print(
+		lang,
+		len(sentences),
+		table_size,
+		round(snowball_time, 2),
+		round(table_time, 2),
+		round(snowball_time / table_time, 2),
+		snowball_tokens == table_tokens,
+		sep = '\t'
+	)
+
+
+
+
+if __name__ == '__main__':
+
+	if len(sys.argv) < 3:
+		exit('Usage: python3 compare_stemmers.py <language> <dataset names>')
+
+	compare(sys.argv[1], sys.argv[2:])
@@ -0,0 +1,111 @@
+# Created by Sinclert Perez (Sinclert@hotmail.com)
+
+# Program to compare the vocabulary and hashing vectorizers
+# Usage: python3 compare_vectorizers.py <training profile name>
+
+
+import os
+import pickle
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+os.chdir(os.path.dirname(os.path.abspath(__file__)))
+
+from sklearn.base import clone
+from sklearn.model_selection import cross_val_score
+from sklearn.pipeline import make_pipeline
+
+from clf_node import NodeClassif
+from pipeline_config import read_training_profile
+from token_cache import TokenCache
+
+
+# Compared configurations: (vectorizer name, hash bits)
+configurations = (
+	('count', None),
+	('hashing', 16),
+	('hashing', 18),
+	('hashing', 20),
+)
+
+
+
+
+def compare(profile: str, algorithm: str = 'logistic-regression', feats_pct: int = 5):
+
+	""" Prints the memory, speed and F-score of every vectorizer configuration
+
+	Arguments:
+	----------
+		profile: JSON training profile file name
+		algorithm: name of the algorithm to train (optional)
+		feats_pct: percentage of features to keep (optional)
+
+	"""
+
+	profile_data, pipeline = read_training_profile(profile)
+
+	print('vectorizer', 'bits', 'features', 'train_s', 'peak_mb', 'model_kb', 'f_score', sep = '\t')
+
+	for vectorizer, hash_bits in configurations:
+		node = NodeClassif(
+			algorithm = algorithm,
+			feats_pct = feats_pct,
+			lang = 'english',
+			vectorizer = vectorizer,
+			hash_bits = hash_bits or 20,
+			pipeline = pipeline
+		)
+
+		# Tokens are loaded beforehand, so only the vectorization is measured
+		cache = TokenCache(node.vectorizer.tokenizer)
+		samples, labels = [], []
+
+		for info in profile_data:
+			sentences = cache.load(info['dataset_name'])
+			samples.extend(sentences)
+			labels.extend([info['dataset_label']] * len(sentences))
+
+		tracemalloc.start()
+		start = time.time()
+
+		feats = node.vectorizer.fit_transform(samples)
+		selected = node.selector.fit_transform(feats, labels)
+		node.model.fit(selected, labels)
+
+		train_time = time.time() - start
+		peak_memory = tracemalloc.get_traced_memory()[1]
+		tracemalloc.stop()
+
+		model_size = len(pickle.dumps(node.__dict__))
+
+		scores = cross_val_score(
+			estimator = make_pipeline(clone(node.selector), clone(node.model)),
+			X = feats,
+			y = labels,
+			scoring = 'f1_weighted',
+			cv = 10
+		)
+
+		print(
+			vectorizer,
+			hash_bits or '-',
+			node.get_fingerprints()['vectorizer'][:12],
+			round(train_time, 2),
+			round(peak_memory / 2 ** 20, 1),
+			round(model_size / 2 ** 10),
+			round(scores.mean(), 4),
+			sep = '\t'
+		)
+
+
+
+
+if __name__ == '__main__':
+
+	if len(sys.argv) != 2:
+		exit('Usage: python3 compare_vectorizers.py <training profile name>')
+
+	compare(sys.argv[1])
@@ -33,22 +33,21 @@ clf_profiles=(	"subjectivity.json"
 				"sentiment.json")
 
 max_pct=10
+cv_folds=10
+min_folds=2
 
-
-############################# FUNCTIONS DECLARATION ############################
-function print_progress() {
-	algorithm=$1
-	features_pct=$2
-
-	# If it is the first call (0%) avoid the message
-	if [ ${features_pct} != 1 ]; then
-		completed=$(( (($features_pct-1) * ($max_pct+1)) ))
-		total=$(( $completed * 100 / ($max_pct * ($max_pct+1) ) ))
-		echo "$algorithm: $total%"
-	fi
-}
+# Formats the final result of each percentage (from the JSON lines events)
+parse_results='
+import json, sys
+for line in sys.stdin:
+	event = json.loads(line)
+	if event["event"] == "result":
+		folds = "" if event["complete"] else " (discarded after %d folds)" % event["folds"]
+		print("\t\t%d%% features: %.4f%s" % (event["pct"], event["score"], folds))
+'
 
 
+############################# FUNCTIONS DECLARATION ############################
 function algorithm_eval() {
 	algorithm=$1
 	output=$2
@@ -56,28 +55,25 @@ function algorithm_eval() {
 	echo "Starting $algorithm evaluation"
 	echo "############# Evaluating $algorithm #############" >> ${output}
 
-	# While the features percentage is lower than the max
-	for ((features_pct = 1 ; features_pct <= $max_pct ; features_pct++)); do
-		echo >> ${output}
+	# For each classifier type (polarized VS sentiment)
+	for ((i = 0 ; i < ${#clf_types[@]} ; i++)); do
+		profile=${clf_profiles[$i]}
 
-		print_progress ${algorithm} ${features_pct}
-		echo "	$features_pct% features" >> ${output}
-
-		# For each classifier type (polarized VS sentiment)
-		for ((i = 0 ; i < ${#clf_types[@]} ; i++)); do
-			profile=${clf_profiles[$i]}
-			score=$(python3 ../src/main.py train_model -a ${algorithm} \
-													 -f ${features_pct} \
-													 -l 'english' \
-													 -o None \
-													 -p ${profile})
-
-			score=$(echo ${score} | cut -d " " -f 1)
-			echo "		${clf_types[$i]}: $score" >> ${output}
-		done
+		echo >> ${output}
+		echo "	${clf_types[$i]}" >> ${output}
+
+		# All the percentages are validated over the same stored features,
+		# discarding the worst half of them every time the folds double
+		python3 ../src/main.py evaluate_models -a ${algorithm} \
+											   -f $(seq 1 ${max_pct}) \
+											   -l 'english' \
+											   -p ${profile} \
+											   --folds ${cv_folds} \
+											   --min-folds ${min_folds} \
+			| python3 -c "${parse_results}" >> ${output}
+
+		echo "$algorithm: $(( ($i+1) * 100 / ${#clf_types[@]} ))%"
 	done
-
-	echo "$algorithm: 100%"
 }
 
 
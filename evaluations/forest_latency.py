@@ -0,0 +1,77 @@
+# Created by Sinclert Perez (Sinclert@hotmail.com)
+
+# Program to compare the random forest prediction latencies
+# Usage: python3 forest_latency.py <random forest model name> <dataset name>
+
+
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+os.chdir(os.path.dirname(os.path.abspath(__file__)))
+
+from clf_node import NodeClassif
+from utils import read_lines
+
+
+# Compared inference paths: (name, compile forest, parallel batch rows)
+configurations = (
+	('parallel', False, 1),
+	('sequential', False, NodeClassif.parallel_rows),
+	('compiled', True, NodeClassif.parallel_rows),
+)
+
+
+
+
+def compare(model: str, dataset: str, singles: int = 200, batch: int = 4000):
+
+	""" Prints the single sentence and batch latencies of every inference path
+
+	Arguments:
+	----------
+		model: random forest model file name
+		dataset: dataset file name
+		singles: number of sentences predicted one by one (optional)
+		batch: number of sentences predicted in a batch (optional)
+
+	"""
+
+	sentences = read_lines(dataset, 'dataset')
+	reference = None
+
+	print('path', 'single_ms', 'batch_s', 'equal', sep = '\t')
+
+	for name, compile_forest, parallel_rows in configurations:
+		node = NodeClassif(model, compile_forest = compile_forest)
+		node.parallel_rows = parallel_rows
+
+		start = time.time()
+		labels = [node.predict(s) for s in sentences[:singles]]
+		single_time = (time.time() - start) / singles
+
+		start = time.time()
+		labels += node.predict_batch(sentences[:batch])
+		batch_time = time.time() - start
+
+		if reference is None:
+			reference = labels
+
+		print(
+			name,
+			round(single_time * 1000, 2),
+			round(batch_time, 2),
+			labels == reference,
+			sep = '\t'
+		)
+
+
+
+
+if __name__ == '__main__':
+
+	if len(sys.argv) != 3:
+		exit('Usage: python3 forest_latency.py <random forest model name> <dataset name>')
+
+	compare(sys.argv[1], sys.argv[2])
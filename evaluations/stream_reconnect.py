@@ -0,0 +1,244 @@
+# Created by Sinclert Perez (Sinclert@hotmail.com)
+
+# Program to check the stream reconnection against a local fake streaming end point
+# Usage: python3 stream_reconnect.py <predicting profile name> <dataset name> <seconds>
+
+
+import json
+import os
+import ssl
+import subprocess
+import sys
+import tempfile
+import time
+
+from http.server import BaseHTTPRequestHandler
+from http.server import ThreadingHTTPServer
+from threading import Event
+from threading import Thread
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+os.chdir(os.path.dirname(os.path.abspath(__file__)))
+
+from clf_hierarchy import HierarchicalClassif
+from twitter_stream import TwitterListener
+from utils import read_lines
+
+
+# Behaviour of each connection: dropped, HTTP error, stalled or served until the end
+schedule = ('drop', 503, 'stall', 420, 'drop', 'serve')
+
+
+
+
+class FakeEndpoint(BaseHTTPRequestHandler):
+
+	""" Represents a fake Twitter filter end point, following a connections schedule
+
+	Attributes:
+	----------
+		sentences:
+			type: list
+			info: texts of the served tweets (class attribute)
+
+		connections:
+			type: list
+			info: (behaviour, start, end, served tweets) of every connection (class attribute)
+
+		finished:
+			type: threading.Event
+			info: set when the check is over (class attribute)
+	"""
+
+
+	sentences = []
+	connections = []
+	finished = Event()
+
+	# Tweets per second and tweets before dropping or stalling (class attributes)
+	tweets_rate = 200
+	tweets_burst = 300
+
+
+
+
+	def log_message(self, *args):
+
+		""" Silences the requests log """
+
+		pass
+
+
+
+
+	def __send_tweet(self, tweet_id: int):
+
+		""" Sends a length delimited tweet
+
+		Arguments:
+		----------
+			tweet_id: served tweet number
+
+		"""
+
+		tweet = {
+			'id': tweet_id,
+			'text': self.sentences[tweet_id % len(self.sentences)],
+			'lang': 'en',
+			'created_at': time.strftime('%a %b %d %H:%M:%S +0000 %Y', time.gmtime()),
+			'in_reply_to_status_id': None,
+			'user': {'id': 1, 'screen_name': 'fake'}
+		}
+
+		data = (json.dumps(tweet) + '\r\n').encode('utf-8')
+		self.wfile.write(str(len(data)).encode('utf-8') + b'\r\n' + data)
+		self.wfile.flush()
+
+
+
+
+	def do_POST(self):
+
+		""" Serves a connection following the schedule """
+
+		behaviour = schedule[min(len(self.connections), len(schedule) - 1)]
+		connection = [behaviour, time.time(), None, 0]
+		self.connections.append(connection)
+
+		if isinstance(behaviour, int):
+			self.send_response(behaviour)
+			self.end_headers()
+			connection[2] = time.time()
+			return
+
+		self.send_response(200)
+		self.send_header('Content-Type', 'application/json; charset=utf-8')
+		self.end_headers()
+
+		try:
+			while not self.finished.is_set():
+				if (behaviour != 'serve') and (connection[3] == self.tweets_burst):
+					break
+
+				self.__send_tweet(sum(c[3] for c in self.connections))
+				connection[3] += 1
+				time.sleep(1 / self.tweets_rate)
+
+			# A stalled connection is kept open without data, until the client gives up
+			if behaviour == 'stall':
+				self.finished.wait(60)
+
+		except (BrokenPipeError, ConnectionResetError, ssl.SSLError):
+			pass
+
+		connection[2] = time.time()
+
+
+
+
+def create_certificate(folder: str) -> tuple:
+
+	""" Creates a self signed certificate for 'localhost'
+
+	Arguments:
+	----------
+		folder: folder where the files are written
+
+	Returns:
+	----------
+		cert_path: certificate path (also usable as CA bundle)
+		key_path: private key path
+
+	"""
+
+	cert_path = os.path.join(folder, 'cert.pem')
+	key_path = os.path.join(folder, 'key.pem')
+
+	subprocess.run(
+		[
+			'openssl', 'req', '-x509', '-newkey', 'rsa:2048', '-nodes', '-days', '1',
+			'-keyout', key_path, '-out', cert_path,
+			'-subj', '/CN=localhost', '-addext', 'subjectAltName=DNS:localhost'
+		],
+		check = True,
+		capture_output = True
+	)
+
+	return cert_path, key_path
+
+
+
+
+def check(profile: str, dataset: str, seconds: float):
+
+	""" Streams from the fake end point, printing its connections and the listener status
+
+	Arguments:
+	----------
+		profile: JSON predicting profile file name
+		dataset: name of the dataset whose sentences are served
+		seconds: duration of the check
+
+	"""
+
+	FakeEndpoint.sentences = read_lines(dataset, 'dataset')
+
+	# Shorter waits, so the whole schedule fits in a short check
+	TwitterListener.retry_start = 0.5
+	TwitterListener.retry_limited = 2
+	TwitterListener.stable_seconds = 1
+
+	with tempfile.TemporaryDirectory() as folder:
+		cert_path, key_path = create_certificate(folder)
+
+		context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+		context.load_cert_chain(cert_path, key_path)
+
+		server = ThreadingHTTPServer(('localhost', 0), FakeEndpoint)
+		server.daemon_threads = True
+		server.socket = context.wrap_socket(server.socket, server_side = True)
+		Thread(target = server.serve_forever, daemon = True).start()
+
+		listener = TwitterListener(token_key = 'fake', token_secret = 'fake')
+		listener.add_classifier(profile, HierarchicalClassif(profile), buffer_size = 10 ** 6)
+
+		listener.start_stream(
+			queries = ['fake'],
+			langs = ['en'],
+			coords = [],
+			timeout = 2,
+			host = 'localhost:' + str(server.server_address[1]),
+			verify = cert_path
+		)
+
+		time.sleep(seconds)
+		status = listener.get_status()
+
+		FakeEndpoint.finished.set()
+		listener.finish_stream()
+		server.shutdown()
+
+	start = FakeEndpoint.connections[0][1]
+
+	print('behaviour', 'start_s', 'end_s', 'tweets', sep = '\t')
+
+	for behaviour, c_start, c_end, tweets in FakeEndpoint.connections:
+		print(behaviour, round(c_start - start, 2), round((c_end or time.time()) - start, 2), tweets, sep = '\t')
+
+	_, counters = listener.snapshot(profile)
+
+	print()
+	print('served tweets:', sum(c[3] for c in FakeEndpoint.connections))
+	print('received tweets:', listener.received)
+	print('counted tweets:', round(sum(counters.values())))
+	print('status:', status)
+
+
+
+
+if __name__ == '__main__':
+
+	if len(sys.argv) != 4:
+		exit('Usage: python3 stream_reconnect.py <predicting profile name> <dataset name> <seconds>')
+
+	check(sys.argv[1], sys.argv[2], float(sys.argv[3]))
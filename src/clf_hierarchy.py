@@ -1,8 +1,18 @@
 # Created by Sinclert Perez (Sinclert@hotmail.com)
 
+import hashlib
+import time
+import weakref
+
+from concurrent.futures import ThreadPoolExecutor
+from typing import List
+from typing import Tuple
 from typing import Union
 
-from clf_node import NodeClassif
+from model_cache import acquire_model
+from model_cache import release_models
+from utils import clean_text
+from utils import hash_file
 from utils import read_json
 
 
@@ -12,38 +22,75 @@ class HierarchicalClassif(object):
 
 	""" Represents a hierarchical classification tree
 
+	A profile may contain a single 'tree', used for every language, or a
+	'langs' dictionary with the tree of each Twitter language code. When
+	both are specified, the single tree classifies the remaining languages.
+
 	Attributes:
 	----------
 		keys:
 			type: list
 			info: required keys in each JSON tree node
 
-		tree:
+		trees:
 			type: dict
-			info: tree structure in which each node has:
+			info: tree (value) of each language code (key, None for the default one).
+			Each tree node has:
 				- clf_file (string)
 				- clf_object (NodeClassif)
 				- clf_children (dict)
 
+		models:
+			type: dict
+			info: shared NodeClassif (value) of each 'clf_file' (key)
+
+		releaser:
+			type: weakref.finalize
+			info: releases the shared models when the object is closed or collected
+
 		colors:
 			type: dict
 			info: RGB color (value) of each label (key)
+
+		timings:
+			type: dict
+			info: load and warm up seconds (value) of each node name (key)
+
+		ready:
+			type: bool
+			info: whether every node has been warmed up
 	"""
 
 
 	# Required JSON node keys (class attribute)
 	keys = ['clf_file', 'clf_object', 'clf_children']
 
+	# Raw tweets used to warm up the cleaning and the models (class attribute)
+	warm_up_sentences = (
+		'@user I love this new phone, it is amazing!! #happy http://t.co/abc',
+		'This is the worst service ever &amp; I am never coming back \U0001F620',
+		'The meeting has been moved to Monday at 10 am',
+		'RT @news: Prices are rising again in the city centre #economy',
+		'not bad at all, but could be better... what do you think?',
+	)
 
+	# Warm up passes over the sample sentences (class attribute)
+	warm_up_rounds = 3
 
+	# Maximum number of models loaded concurrently (class attribute)
+	load_workers = 4
 
-	def __init__(self, profile: str):
 
-		""" Loads the JSON profile models into the tree attribute
+
+
+	def __init__(self, profile: str, warm_up: bool = True):
+
+		""" Loads the JSON profile models into the trees attribute
 
 		Arguments:
 		----------
 			profile: JSON predicting profile file name
+			warm_up: whether to warm up the models once loaded (optional)
 
 		"""
 
@@ -56,30 +103,135 @@ class HierarchicalClassif(object):
 		assert isinstance(profile, dict)
 
 		try:
-			self.tree = profile['tree']
+			self.trees = dict(profile.get('langs', {}))
+			self.models = {}
 			self.colors = profile['colors']
-			self.__load_clf(self.tree)
+			self.timings = {}
+			self.ready = False
+
+			if ('tree' in profile) or (not self.trees):
+				self.trees[None] = profile['tree']
+
+			for tree in self.trees.values():
+				self.__check_node(tree)
 
 		except KeyError:
 			exit('Invalid JSON keys')
 
+		seconds = self.__load_models()
+
+		for lang, tree in self.trees.items():
+			self.__attach_clf(lang, tree, seconds)
+
+		if warm_up:
+			self.warm_up()
 
 
 
-	def __load_clf(self, node: dict):
 
-		""" Recursively check and load classifier objects into 'clf_object'
+	def __check_node(self, node: dict):
+
+		""" Recursively checks the structure of a tree, without loading any model
 
 		Arguments:
 		----------
-			node: current tree node to load the 'clf_file' classifier
+			node: current tree node
 
 		"""
 
 		# Check JSON keys coherence
+		assert isinstance(node, dict)
 		assert all(k in node for k in self.keys)
 
-		node['clf_object'] = NodeClassif(node['clf_file'])
+		if not isinstance(node['clf_file'], str) or not isinstance(node['clf_children'], dict):
+			exit('Invalid JSON values')
+
+		for child_node in node['clf_children'].values():
+			self.__check_node(child_node)
+
+
+
+
+	@staticmethod
+	def __acquire(file_name: str) -> Tuple[object, float]:
+
+		""" Gets a shared model, measuring the seconds spent
+
+		Arguments:
+		----------
+			file_name: saved model file name
+
+		Returns:
+		----------
+			model: shared NodeClassif object
+			seconds: elapsed seconds (close to zero if already loaded)
+
+		"""
+
+		start = time.time()
+		model = acquire_model(file_name)
+
+		return model, time.time() - start
+
+
+
+
+	def __load_models(self) -> dict:
+
+		""" Loads every distinct model of the trees concurrently
+
+		Returns:
+		----------
+			seconds: load seconds (value) of each 'clf_file' (key)
+
+		"""
+
+		files = []
+
+		for lang in sorted(self.trees, key = str):
+			pending = [self.trees[lang]]
+
+			while pending:
+				node = pending.pop(0)
+				pending.extend(node['clf_children'].values())
+
+				if node['clf_file'] not in files:
+					files.append(node['clf_file'])
+
+		# Each model is loaded once, however many nodes or profiles use it
+		with ThreadPoolExecutor(max_workers = max(1, min(self.load_workers, len(files)))) as pool:
+			loads = [(f, pool.submit(self.__acquire, f)) for f in files]
+
+		seconds = {}
+
+		for file_name, load in loads:
+			self.models[file_name], seconds[file_name] = load.result()
+
+		self.releaser = weakref.finalize(self, release_models, list(self.models.values()))
+		return seconds
+
+
+
+
+	def __attach_clf(self, lang: Union[str, None], node: dict, seconds: dict):
+
+		""" Recursively sets the loaded classifier objects into 'clf_object'
+
+		Arguments:
+		----------
+			lang: language code of the node tree (None for the default one)
+			node: current tree node to set the 'clf_file' classifier
+			seconds: load seconds (value) of each 'clf_file' not counted yet (key)
+
+		"""
+
+		node['clf_object'] = self.models[node['clf_file']]
+
+		# The load time is only counted in the first node using the model
+		self.timings[self.__node_name(lang, node)] = {
+			'load': seconds.pop(node['clf_file'], 0.0),
+			'warm_up': 0.0
+		}
 
 		try:
 			clf_labels = node['clf_object'].get_labels()
@@ -90,7 +242,7 @@ class HierarchicalClassif(object):
 			assert all(k in clf_labels for k in clf_child_names)
 
 			for child_node in clf_child_nodes:
-				self.__load_clf(child_node)
+				self.__attach_clf(lang, child_node, seconds)
 
 		except AttributeError:
 			exit('Invalid JSON values')
@@ -98,6 +250,135 @@ class HierarchicalClassif(object):
 
 
 
+	def close(self):
+
+		""" Releases the shared models, so they are evicted once unused """
+
+		self.releaser()
+
+
+
+
+	@staticmethod
+	def __node_name(lang: Union[str, None], node: dict) -> str:
+
+		""" Gets the name identifying a node within the profile
+
+		Arguments:
+		----------
+			lang: language code of the node tree (None for the default one)
+			node: tree node
+
+		Returns:
+		----------
+			name: node 'clf_file' (prefixed by the language code if any)
+
+		"""
+
+		if lang is None:
+			return node['clf_file']
+
+		return lang + '/' + node['clf_file']
+
+
+
+
+	def __route(self, lang: Union[str, None]) -> Union[str, None]:
+
+		""" Gets the tree language code that classifies the specified language
+
+		Arguments:
+		----------
+			lang: Twitter language code of a sentence
+
+		Returns:
+		----------
+			route: language code of the tree (None for the default one)
+
+		"""
+
+		if lang in self.trees:
+			return lang
+
+		return None
+
+
+
+
+	def warm_up(self, sentences: list = None):
+
+		""" Exercises the cleaning and every node model before serving predictions
+
+		The first predictions of a freshly loaded model pay for the lazy
+		initializations of its libraries, caches and compiled patterns,
+		so they are made here instead of on the first real tweets.
+
+		Arguments:
+		----------
+			sentences: raw sample sentences (optional)
+
+		"""
+
+		if sentences is None:
+			sentences = self.warm_up_sentences
+
+		cleaned = [clean_text(s.lower()) for s in sentences]
+		warmed = set()
+
+		for lang in sorted(self.trees, key = str):
+			pending = [self.trees[lang]]
+
+			while pending:
+				node = pending.pop(0)
+				pending.extend(node['clf_children'].values())
+
+				# Models shared by several nodes are only warmed up once
+				if node['clf_file'] in warmed:
+					continue
+
+				warmed.add(node['clf_file'])
+				start = time.time()
+
+				# Both the single sentence and the batch paths are exercised
+				for _ in range(self.warm_up_rounds):
+					for sentence in cleaned:
+						node['clf_object'].predict(sentence)
+
+					node['clf_object'].predict_batch_scores(cleaned)
+
+				self.timings[self.__node_name(lang, node)]['warm_up'] = time.time() - start
+
+		self.ready = True
+
+
+
+
+	def fingerprint(self) -> str:
+
+		""" Computes a digest identifying the tree structures and their models
+
+		Returns:
+		----------
+			digest: hexadecimal digest of every node 'clf_file' content
+
+		"""
+
+		digest = hashlib.sha1()
+		pending = [(lang or '', self.trees[lang]) for lang in sorted(self.trees, key = str)]
+
+		while pending:
+			path, node = pending.pop()
+			model_hash = hash_file(node['clf_file'], 'model')
+			digest.update((path + ':' + model_hash + ';').encode('utf-8'))
+
+			for label, child_node in sorted(node['clf_children'].items()):
+				pending.append((path + '/' + label, child_node))
+
+		return digest.hexdigest()
+
+
+
+
 	def get_labels(self) -> list:
 
 		""" Gets the label names
@@ -136,28 +417,227 @@ class HierarchicalClassif(object):
 
 
 
-	def predict(self, sentence: str) -> Union[str, None]:
+	def get_nodes(self) -> list:
 
-		""" Predicts the label of a sentence using the loaded classifiers
+		""" Gets the names of all the tree nodes
+
+		Returns:
+		----------
+			nodes: 'clf_file' of every node (root first, prefixed by the language code if any)
+
+		"""
+
+		nodes = []
+
+		for lang in sorted(self.trees, key = str):
+			pending = [self.trees[lang]]
+
+			while pending:
+				node = pending.pop(0)
+				nodes.append(self.__node_name(lang, node))
+				pending.extend(node['clf_children'].values())
+
+		return nodes
+
+
+
+
+	def predict_nodes(self, sentence: str, lang: str = None) -> Tuple[Union[str, None], dict]:
+
+		""" Predicts the label of a sentence, keeping the label of every visited node
 
 		Arguments:
 		----------
 			sentence: text to classify
+			lang: Twitter language code of the sentence (optional)
 
 		Returns:
 		----------
 			label: predicted sentence label
+			nodes: dictionary with the label (value) of each visited node name (key)
 
 		"""
 
-		node = self.tree
+		route = self.__route(lang)
+
+		if route not in self.trees:
+			return None, {}
+
+		node = self.trees[route]
 		label = node['clf_object'].predict(sentence)
+		nodes = {self.__node_name(route, node): label}
 
 		while label in node['clf_children'].keys():
 			node = node['clf_children'][label]
 			label = node['clf_object'].predict(sentence)
+			nodes[self.__node_name(route, node)] = label
+
+		return label, nodes
+
+
+
+
+	def predict(self, sentence: str, lang: str = None) -> Union[str, None]:
+
+		""" Predicts the label of a sentence using the loaded classifiers
+
+		Arguments:
+		----------
+			sentence: text to classify
+			lang: Twitter language code of the sentence (optional)
+
+		Returns:
+		----------
+			label: predicted sentence label
+
+		"""
+
+		label, _ = self.predict_nodes(sentence, lang)
 
 		if label is None:
 			print(sentence, '(Unknown label)')
 
 		return label
+
+
+
+
+	def __predict_routes(self, sentences: list, langs: list, scored: bool) -> Tuple[list, list, list]:
+
+		""" Sends several sentences down their trees, one batch per node
+
+		Arguments:
+		----------
+			sentences: texts to classify
+			langs: Twitter language code of each sentence (None if unknown)
+			scored: whether the probability of each path is computed
+
+		Returns:
+		----------
+			labels: predicted sentences labels
+			nodes: dictionaries with the label (value) of each visited node name (key)
+			scores: probability of each predicted path (None if unknown or not scored)
+
+		"""
+
+		labels = [None] * len(sentences)
+		scores = [1.0 if scored else None] * len(sentences)
+		nodes = [{} for _ in sentences]
+		pending = {}
+
+		# Sentences are grouped by the tree of their language
+		for i, lang in enumerate(langs):
+			route = self.__route(lang)
+
+			if route in self.trees:
+				pending.setdefault(route, []).append(i)
+
+		pending = [(route, self.trees[route], indexes) for route, indexes in pending.items()]
+
+		# Each node classifies the whole batch of sentences routed to it
+		while pending:
+			route, node, indexes = pending.pop()
+			batch = [sentences[i] for i in indexes]
+			name = self.__node_name(route, node)
+			routes = {}
+
+			if scored:
+				node_labels, node_scores = node['clf_object'].predict_batch_scores(batch)
+			else:
+				node_labels = node['clf_object'].predict_batch(batch)
+				node_scores = [None] * len(batch)
+
+			for i, label, score in zip(indexes, node_labels, node_scores):
+				nodes[i][name] = label
+
+				# The path probability is the product of its nodes ones
+				if (score is None) or (scores[i] is None):
+					scores[i] = None
+				else:
+					scores[i] *= score
+
+				if label in node['clf_children'].keys():
+					routes.setdefault(label, []).append(i)
+				else:
+					labels[i] = label
+
+			for label, child_indexes in routes.items():
+				pending.append((route, node['clf_children'][label], child_indexes))
+
+		return labels, nodes, [s if l is not None else None for l, s in zip(labels, scores)]
+
+
+
+
+	def predict_batch_nodes(self, sentences: list, langs: list = None) -> Tuple[list, list]:
+
+		""" Predicts the labels of several sentences, keeping the label of every visited node
+
+		Arguments:
+		----------
+			sentences: texts to classify
+			langs: Twitter language code of each sentence (optional)
+
+		Returns:
+		----------
+			labels: predicted sentences labels
+			nodes: dictionaries with the label (value) of each visited node name (key)
+
+		"""
+
+		if langs is None:
+			langs = [None] * len(sentences)
+
+		labels, nodes, _ = self.__predict_routes(sentences, langs, scored = False)
+		return labels, nodes
+
+
+
+
+	def predict_batch_scores(self, sentences: list, langs: list = None) -> Tuple[list, list]:
+
+		""" Predicts the labels of several sentences and the probability of their paths
+
+		Arguments:
+		----------
+			sentences: texts to classify
+			langs: Twitter language code of each sentence (optional)
+
+		Returns:
+		----------
+			labels: predicted sentences labels (None if unknown)
+			scores: product of the visited nodes probabilities (None if unknown or not probabilistic)
+
+		"""
+
+		if langs is None:
+			langs = [None] * len(sentences)
+
+		labels, _, scores = self.__predict_routes(sentences, langs, scored = True)
+		return labels, scores
+
+
+
+
+	def predict_batch(self, sentences: list, langs: list = None) -> List[Union[str, None]]:
+
+		""" Predicts the labels of several sentences using the loaded classifiers
+
+		Arguments:
+		----------
+			sentences: texts to classify
+			langs: Twitter language code of each sentence (optional)
+
+		Returns:
+		----------
+			labels: predicted sentences labels
+
+		"""
+
+		labels, _ = self.predict_batch_nodes(sentences, langs)
+
+		for sentence, label in zip(sentences, labels):
+			if label is None:
+				print(sentence, '(Unknown label)')
+
+		return labels
@@ -1,22 +1,47 @@
 # Created by Sinclert Perez (Sinclert@hotmail.com)
 
+import copy
+import functools
+import hashlib
+import math
+import time
+
+import numpy
+
+from typing import List
 from typing import Tuple
 from typing import Union
 
 from sklearn.feature_extraction.text import CountVectorizer
-from sklearn.feature_selection import chi2
-from sklearn.feature_selection import SelectPercentile
 from sklearn.linear_model import LogisticRegression
 from sklearn.naive_bayes import MultinomialNB
 from sklearn.svm import LinearSVC
 from sklearn.ensemble import RandomForestClassifier as RandomForest
+from sklearn.base import clone
 from sklearn.pipeline import make_pipeline
-from sklearn.model_selection import cross_val_score
-
-from text_tokenizer import TextTokenizer
-
-from utils import read_lines
+from sklearn.metrics import f1_score
+from sklearn.metrics import get_scorer
+from sklearn.model_selection import cross_validate
+from sklearn.model_selection import StratifiedKFold
+
+from joblib import delayed
+from joblib import Parallel
+
+from compiled_forest import CompiledForest
+from feature_selector import ChiSquareSelector
+from feature_store import FeatureStore
+from pipeline_config import resolve_pipeline
+from quantized_model import QuantizedModel
+from text_tokenizer import get_tokenizer
+from text_vectorizer import IdNgramVectorizer
+from text_vectorizer import SignedHashingVectorizer
+from token_cache import TokenCache
+
+from utils import count_lines
+from utils import hash_file
 from utils import load_object
+from utils import read_lines
+from utils import sample_lines
 
 
 algorithms = {
@@ -27,6 +52,9 @@ algorithms = {
 }
 
 
+vectorizers = ('count', 'hashing')
+
+
 
 
 class NodeClassif(object):
@@ -36,23 +64,48 @@ class NodeClassif(object):
 	Attributes:
 	----------
 		model:
-			type: sklearn.estimator
-			info: trained classifier model
+			type: sklearn.estimator or QuantizedModel
+			info: trained classifier model (with quantized weights if requested)
 
 		selector:
-			type: SelectPercentile
+			type: ChiSquareSelector
 			info: filter the features depending on their relevance. It has:
-				- score_func (func)
 				- percentile (float)
+				- max_features (int)
 
 		vectorizer:
-			type: CountVectorizer
+			type: IdNgramVectorizer, CountVectorizer (older models) or SignedHashingVectorizer
 			info: builds the vector of features. It has:
 				- tokenizer (class)
+				- lowercase (bool)
 				- ngram_range (tuple of ints)
+				- n_features (int, only when hashing)
+
+		stems:
+			type: dict
+			info: precomputed stem (value) of each training word (key, None if disabled)
+
+		forest:
+			type: CompiledForest
+			info: compiled random forest model (None if not compiled)
+
+		pipeline:
+			type: dict
+			info: settings of every pipeline stage (see 'pipeline_config')
+
+		fingerprint:
+			type: string
+			info: digest of the whole trained pipeline (None if not trained)
 	"""
 
 
+	# Maximum batch size to predict using the compiled forest (class attribute)
+	compiled_rows = 32
+
+	# Minimum batch size to predict using parallel trees (class attribute)
+	parallel_rows = 1000
+
+
 
 
 	def __init__(self, file_name: str = None, **kwargs):
@@ -66,27 +119,78 @@ class NodeClassif(object):
 			kwargs: possible arguments:
 				- algorithm: name of the algorithm to train
 				- feats_pct: percentage of features to keep
+				- max_features: maximum number of features to keep (optional)
 				- lang: language to perform the tokenizer process
+				- vectorizer: name of the vectorizer (optional)
+				- hash_bits: bit width of the hashed features space (optional)
+				- stem_table: whether to save a stem table with the model (optional)
+				- compile_forest: whether to compile a loaded random forest (optional)
+				- pipeline: settings of the pipeline stages (optional)
 
 		"""
 
 		if file_name is not None:
 			self.__dict__ = load_object(file_name, 'model')
+			tokenizer = self.vectorizer.tokenizer
+
+			# Models saved with their own tokenizer copy use the shared one
+			if hasattr(tokenizer, 'lang'):
+				self.vectorizer.tokenizer = get_tokenizer(
+					tokenizer.lang,
+					tokenizer.tokenizer.reduce_len,
+					tokenizer.tokenizer.strip_handles
+				)
+
+			# The shared tokenizer only stems the words unseen in training
+			if getattr(self, 'stems', None):
+				self.vectorizer.tokenizer.add_stems(self.stems)
+
+			# Trees predict sequentially, unless the batch is large enough
+			if isinstance(self.model, RandomForest):
+				self.model.n_jobs = 1
+
+				if kwargs.get('compile_forest', True):
+					self.forest = CompiledForest(self.model)
 
 		else:
 
 			try:
 				self.model = algorithms[kwargs['algorithm']]
+				self.pipeline = resolve_pipeline(kwargs.get('pipeline'))
+				self.fingerprint = None
 
-				self.selector = SelectPercentile(
-					score_func = chi2,
-					percentile = kwargs['feats_pct']
+				self.stems = {} if kwargs.get('stem_table') else None
+				self.selector = ChiSquareSelector(
+					percentile = kwargs['feats_pct'],
+					max_features = kwargs.get('max_features')
 				)
 
-				self.vectorizer = CountVectorizer(
-					tokenizer = TextTokenizer(kwargs['lang']),
-					ngram_range = (1, 2)
-				)
+				# Tokenizers with the same settings are shared by the whole process
+				tokenizer = get_tokenizer(kwargs['lang'], **self.pipeline['tokenizer'])
+				ngram_range = tuple(self.pipeline['vectorizer']['ngram_range'])
+				vectorizer = kwargs.get('vectorizer', 'count')
+
+				# The tokenizer lowercases the text by itself (n-grams built from token ids)
+				if vectorizer == 'count':
+					self.vectorizer = IdNgramVectorizer(
+						tokenizer = tokenizer,
+						lowercase = False,
+						ngram_range = ngram_range
+					)
+
+				# The features space is bounded, no vocabulary is kept
+				elif vectorizer == 'hashing':
+					self.vectorizer = SignedHashingVectorizer(
+						tokenizer = tokenizer,
+						lowercase = False,
+						ngram_range = ngram_range,
+						n_features = 2 ** kwargs.get('hash_bits', 18),
+						alternate_sign = True,
+						norm = None
+					)
+
+				else:
+					exit('Invalid vectorizer name')
 
 			except KeyError:
 				exit('Invalid keyword arguments')
@@ -95,7 +199,88 @@ class NodeClassif(object):
 
 
 	@staticmethod
-	def __build_feats(datasets_info: list) -> Tuple[list, list]:
+	def __sample_sizes(datasets_info: list, budget: int = None) -> list:
+
+		""" Computes the maximum number of sentences read from each dataset
+
+		The budget is split evenly among the labels, and the share of each
+		label evenly among its datasets, so the classes stay balanced. The
+		share a dataset cannot use (having fewer sentences, or a smaller
+		'max_samples') is given to the other datasets of its label.
+
+		Arguments:
+		----------
+			datasets_info: list of dictionaries containing:
+				- dataset_name (string)
+				- dataset_label (string)
+				- max_samples (int, optional)
+
+			budget: maximum total number of sentences (optional)
+
+		Returns:
+		----------
+			sizes: maximum sentences of each dataset (None if unbounded)
+
+		"""
+
+		labels = [info['dataset_label'] for info in datasets_info]
+		sizes = [info.get('max_samples') for info in datasets_info]
+
+		for info, size in zip(datasets_info, sizes):
+			share = None if budget is None else budget // len(set(labels)) // labels.count(info['dataset_label'])
+
+			if any((n is not None) and (n < 1) for n in (size, share)):
+				exit('The number of samples of ' + info['dataset_name'] + ' must be positive')
+
+		if budget is None:
+			return sizes
+
+		for label in set(labels):
+			indexes = [i for i, l in enumerate(labels) if l == label]
+			limits = {}
+
+			for i in indexes:
+				limit = count_lines(datasets_info[i]['dataset_name'], 'dataset')
+				limits[i] = limit if sizes[i] is None else min(sizes[i], limit)
+
+			# The smallest datasets are filled first, their leftover going to the rest
+			share = budget // len(set(labels))
+			indexes.sort(key = lambda i: limits[i])
+
+			for k, i in enumerate(indexes):
+				sizes[i] = min(limits[i], share // (len(indexes) - k))
+				share -= sizes[i]
+
+		return sizes
+
+
+
+
+	@staticmethod
+	def __read_dataset(info: dict, size: Union[int, None]) -> list:
+
+		""" Reads the sentences of a dataset, sampling them if bounded
+
+		Arguments:
+		----------
+			info: dictionary containing the 'dataset_name' and the optional 'seed'
+			size: maximum number of sentences (None if unbounded)
+
+		Returns:
+		----------
+			sentences: dataset sentences (uniform sample if bounded)
+
+		"""
+
+		if size is None:
+			return read_lines(info['dataset_name'], 'dataset')
+
+		return sample_lines(info['dataset_name'], 'dataset', size, info.get('seed', 0))
+
+
+
+
+	def __build_feats(self, datasets_info: list, sizes: list) -> Tuple[list, list, list]:
 
 		""" Builds the feature and label vectors from the specified datasets
 
@@ -105,57 +290,460 @@ class NodeClassif(object):
 				- dataset_file (string)
 				- dataset_label (string)
 
+			sizes: maximum sentences of each dataset (None if unbounded)
+
 		Returns:
 		----------
-			samples: contains all the sentences
+			samples: contains all the sentences (already tokenized)
 			labels: contains all the sentences labels
+			groups: contains the dataset index of each sentence
 
 		"""
 
-		samples, labels = [], []
+		samples, labels, groups = [], [], []
+		cache = TokenCache(self.vectorizer.tokenizer)
 
-		for info in datasets_info:
+		for i, (info, size) in enumerate(zip(datasets_info, sizes)):
 			name = info['dataset_name']
 			label = info['dataset_label']
 
-			sentences = read_lines(
-				file_name = name,
-				file_type = 'dataset'
-			)
+			# Sampled datasets are streamed, and only the sample is tokenized
+			if size is None:
+				sentences = cache.load(name)
+			else:
+				sentences = self.vectorizer.tokenizer.tokenize_docs(self.__read_dataset(info, size))
 
 			samples.extend(sentences)
 			labels.extend([label] * len(sentences))
+			groups.extend([i] * len(sentences))
+
+		return samples, labels, groups
+
+
+
+
+	def __load_feats(self, datasets_info: list, budget: int = None) -> Tuple[object, list, object]:
+
+		""" Loads the features matrix from the feature store (building it if needed)
+
+		Arguments:
+		----------
+			datasets_info: list of dictionaries containing:
+				- dataset_file (string)
+				- dataset_label (string)
+				- max_samples (int, optional)
+				- seed (int, optional)
+				- weight (float, optional)
+
+			budget: maximum total number of sentences (optional)
+
+		Returns:
+		----------
+			feats: sparse features matrix (memory-mapped)
+			labels: contains all the sentences labels
+			weights: contains all the sentences weights (None if all equal)
+
+		"""
+
+		sizes = self.__sample_sizes(datasets_info, budget)
+
+		key = [
+			[hash_file(i['dataset_name'], 'dataset'), i['dataset_label'], size, i.get('seed', 0)]
+			for i, size in zip(datasets_info, sizes)
+		]
+
+		# Any pipeline sharing the tokenizer and vectorizer stages reuses the features
+		key.append(self.get_fingerprints()['vectorizer'])
+		key = hashlib.sha1(repr(key).encode('utf-8')).hexdigest()
+
+		store = FeatureStore(key)
+		stored = store.load()
+
+		if stored is None:
+			samples, labels, groups = self.__build_feats(datasets_info, sizes)
+			feats = self.vectorizer.fit_transform(samples)
+
+			vocab = getattr(self.vectorizer, 'vocabulary_', {})
+			store.save(feats, labels, groups, vocab)
+			stored = store.load()
+
+		# The store may not be writable
+		if stored is None:
+			return feats, labels, self.__sample_weights(datasets_info, groups)
+
+		feats, labels, groups, vocab = stored
 
-		return samples, labels
+		# Hashing vectorizers do not keep any vocabulary
+		if isinstance(self.vectorizer, CountVectorizer):
+			self.vectorizer.vocabulary_ = vocab
 
+		return feats, labels, self.__sample_weights(datasets_info, groups)
 
 
 
-	def __validate(self, samples: list, labels: list, cv_folds: int = 10):
+
+	@staticmethod
+	def __sample_weights(datasets_info: list, groups) -> Union[numpy.ndarray, None]:
+
+		""" Computes the weight of each sentence from the weight of its dataset
+
+		Arguments:
+		----------
+			datasets_info: list of dictionaries containing the optional 'weight'
+			groups: contains the dataset index of each sentence
+
+		Returns:
+		----------
+			weights: contains all the sentences weights (None if all equal)
+
+		"""
+
+		weights = [info.get('weight', 1.0) for info in datasets_info]
+
+		if any(w <= 0 for w in weights):
+			exit('The datasets weights must be positive')
+
+		# Unweighted profiles train exactly as before
+		if all(w == weights[0] for w in weights):
+			return None
+
+		return numpy.array(weights, dtype = numpy.float64)[numpy.asarray(groups)]
+
+
+
+
+	@staticmethod
+	def __fit_params(pipeline, weights) -> dict:
+
+		""" Builds the pipeline fit parameters passing the sample weights to the model
+
+		Arguments:
+		----------
+			pipeline: features selector and classifier model pipeline
+			weights: contains the sentences weights (None if all equal)
+
+		Returns:
+		----------
+			params: fit keyword arguments
+
+		"""
+
+		if weights is None:
+			return {}
+
+		return {pipeline.steps[-1][0] + '__sample_weight': weights}
+
+
+
+
+	def __validate(self, feats, labels: list, selector = None, model = None, cv_folds: int = 10,
+				   weights = None, precision: str = None) -> float:
 
 		""" Validates the trained algorithm using CV and F1 score
 
+		The features vocabulary is built once over all the sentences, so it
+		includes the n-grams of the validation folds. Only the features selector
+		and the model are fitted within each fold, which may shift the score
+		slightly from validating the whole pipeline per fold.
+
 		Arguments:
 		----------
-			samples: contains all the sentences
+			feats: sparse features matrix
 			labels: contains all the sentences labels
+			selector: features selector to validate (optional)
+			model: classifier model to validate (optional)
 			cv_folds: number of cross validation folds (optional)
+			weights: contains the sentences weights (optional)
+			precision: weights precision of the quantized model also scored (optional)
+
+		Returns:
+		----------
+			score: mean F-score of all the folds (of the quantized model if specified)
 
 		"""
 
-		model = make_pipeline(self.vectorizer, self.selector, self.model)
+		if selector is None: selector = self.selector
+		if model is None: model = self.model
+
+		model = make_pipeline(clone(selector), clone(model))
+		scoring = {'float': 'f1_weighted'}
+
+		# Every fold model is also scored once quantized
+		if precision is not None:
+			scoring[precision] = functools.partial(self.__score_quantized, precision = precision)
+
 		print('Starting cross-validation')
 
-		results = cross_val_score(
+		results = cross_validate(
 			estimator = model,
-			X = samples,
+			X = feats,
 			y = labels,
-			scoring = 'f1_weighted',
+			scoring = scoring,
 			cv = cv_folds,
-			n_jobs = -1
+			n_jobs = -1,
+			params = self.__fit_params(model, weights)
+		)
+
+		scores = {name: results['test_' + name].mean() for name in scoring}
+
+		print('F-score:', round(scores['float'], 4))
+
+		if precision is not None:
+			print('F-score (' + precision + '):', round(scores[precision], 4))
+
+		return scores[precision or 'float']
+
+
+
+
+	@staticmethod
+	def __score_quantized(pipeline, feats, labels, precision: str) -> float:
+
+		""" Scores a trained pipeline using the quantized weights of its model
+
+		Arguments:
+		----------
+			pipeline: trained features selector and classifier model pipeline
+			feats: sparse features matrix
+			labels: contains the sentences labels
+			precision: weights precision ('float32' or 'int8')
+
+		Returns:
+		----------
+			score: weighted F-score of the quantized model
+
+		"""
+
+		model = QuantizedModel(pipeline.steps[-1][1], precision)
+		predicted = model.predict(pipeline[:-1].transform(feats))
+
+		return f1_score(labels, predicted, average = 'weighted')
+
+
+
+
+	@staticmethod
+	def __validate_fold(task: tuple, pipeline, feats, labels, fold: tuple, scorer, weights = None) -> tuple:
+
+		""" Trains and scores a pipeline over one cross validation fold
+
+		Arguments:
+		----------
+			task: (algorithm, percentage, fold index) identifying the result
+			pipeline: features selector and classifier model pipeline
+			feats: sparse features matrix
+			labels: array containing all the sentences labels
+			fold: (train indexes, test indexes) tuple
+			scorer: scoring function
+			weights: array containing all the sentences weights (optional)
+
+		Returns:
+		----------
+			task: (algorithm, percentage, fold index) identifying the result
+			score: fold score
+			seconds: fold training and scoring time
+
+		"""
+
+		start = time.time()
+		train, test = fold
+
+		params = {}
+
+		if weights is not None:
+			params = {pipeline.steps[-1][0] + '__sample_weight': weights[train]}
+
+		pipeline = clone(pipeline).fit(feats[train], labels[train], **params)
+		score = scorer(pipeline, feats[test], labels[test])
+
+		return task, float(score), time.time() - start
+
+
+
+
+	def evaluate(self, profile_data: list, algorithms_names: list, feats_pcts: list, cv_folds: int = 10,
+				 scoring: str = 'f1_weighted', min_folds: int = None, halving: int = 2, report = None,
+				 budget: int = None) -> dict:
+
+		""" Validates several algorithms and features percentages over the same features
+
+		When 'min_folds' is specified, the combinations are validated with
+		successive halving: all of them are validated over 'min_folds' folds,
+		only the best 1/'halving' of them continue over 'halving' times more
+		folds, and so on until the remaining ones are validated over all folds.
+
+		The features vocabulary is built once over all the sentences and shared
+		by every combination, so it includes the n-grams of the validation folds.
+		Only the features selector and the model are fitted within each fold,
+		which may shift the scores slightly from validating the whole pipeline
+		per fold.
+
+		Arguments:
+		----------
+			profile_data: dictionaries containing datasets paths and labels
+			algorithms_names: names of the algorithms to validate
+			feats_pcts: percentages of features to keep
+			cv_folds: number of cross validation folds (optional)
+			scoring: name of the scikit-learn scoring metric (optional)
+			min_folds: folds validated before the first halving (optional)
+			halving: reduction factor of each halving (optional)
+			report: function called with a dictionary describing each event (optional):
+				- fold: a fold has been validated
+				- stop: a combination has been discarded
+				- result: final score of a combination
+
+			budget: maximum total number of sentences (optional)
+
+		Returns:
+		----------
+			scores: mean score of each (algorithm, percentage) combination (over its validated folds)
+
+		"""
+
+		if report is None: report = lambda event: None
+
+		try:
+			scorer = get_scorer(scoring)
+
+		except ValueError:
+			exit('Invalid scoring metric')
+
+		try:
+			pipelines = {
+				(name, pct): make_pipeline(
+					clone(self.selector).set_params(percentile = pct),
+					clone(algorithms[name])
+				)
+				for name in algorithms_names
+				for pct in feats_pcts
+			}
+
+		except KeyError:
+			exit('Invalid algorithm name')
+
+		feats, labels, weights = self.__load_feats(profile_data, budget)
+		labels = numpy.array(labels)
+
+		folds = list(StratifiedKFold(n_splits = cv_folds).split(feats, labels))
+		results = {combination: {} for combination in pipelines}
+		remaining = list(pipelines)
+		fold_budget = min(min_folds or cv_folds, cv_folds)
+
+		while True:
+			tasks = [(c, i) for c in remaining for i in range(fold_budget) if i not in results[c]]
+
+			# Folds results are reported as soon as they finish
+			jobs = Parallel(n_jobs = -1, return_as = 'generator_unordered')(
+				delayed(self.__validate_fold)(c + (i,), pipelines[c], feats, labels, folds[i], scorer, weights)
+				for c, i in tasks
+			)
+
+			for (name, pct, i), score, seconds in jobs:
+				results[(name, pct)][i] = score
+				report({
+					'event': 'fold',
+					'algorithm': name,
+					'pct': pct,
+					'fold': i,
+					'score': score,
+					'seconds': round(seconds, 3)
+				})
+
+			if fold_budget == cv_folds:
+				break
+
+			# Only the best combinations are validated over more folds
+			remaining.sort(key = lambda c: numpy.mean(list(results[c].values())), reverse = True)
+			kept = math.ceil(len(remaining) / halving)
+
+			for name, pct in remaining[kept:]:
+				report({
+					'event': 'stop',
+					'algorithm': name,
+					'pct': pct,
+					'folds': fold_budget,
+					'score': float(numpy.mean(list(results[(name, pct)].values())))
+				})
+
+			remaining = remaining[:kept]
+			fold_budget = cv_folds if (kept == 1) else min(fold_budget * halving, cv_folds)
+
+		scores = {}
+
+		features = self.get_fingerprints()['vectorizer']
+
+		for (name, pct), folds_scores in results.items():
+			scores[(name, pct)] = float(numpy.mean(list(folds_scores.values())))
+			report({
+				'event': 'result',
+				'algorithm': name,
+				'pct': pct,
+				'folds': len(folds_scores),
+				'score': scores[(name, pct)],
+				'complete': len(folds_scores) == cv_folds,
+				'features': features
+			})
+
+		return scores
+
+
+
+
+	@staticmethod
+	def __describe(estimator, ignored: tuple = ()) -> str:
+
+		""" Describes the class and the parameters of a pipeline stage
+
+		Arguments:
+		----------
+			estimator: sklearn estimator of the stage
+			ignored: parameters not affecting the stage output (optional)
+
+		Returns:
+		----------
+			description: class name and sorted parameters
+
+		"""
+
+		if isinstance(estimator, QuantizedModel):
+			return repr([type(estimator).__name__, estimator.kind, estimator.precision])
+
+		params = estimator.get_params(deep = False)
+		params = sorted((k, v) for k, v in params.items() if k not in ignored)
+
+		return repr([type(estimator).__name__, params])
+
+
+
+
+	def get_fingerprints(self) -> dict:
+
+		""" Computes a digest of every pipeline stage, including the previous stages
+
+		Two pipelines with the same digest at a stage produce the same output
+		up to that stage, so its cached results can be shared between them.
+
+		Returns:
+		----------
+			fingerprints: hexadecimal digest of the 'tokenizer', 'vectorizer', 'selector' and 'model' stages
+
+		"""
+
+		stages = (
+			('tokenizer', self.vectorizer.tokenizer.fingerprint()),
+			('vectorizer', self.__describe(self.vectorizer, ('tokenizer',))),
+			('selector', self.__describe(self.selector, ('chunk_rows',))),
+			('model', self.__describe(self.model, ('n_jobs', 'verbose'))),
 		)
 
-		print('F-score:', round(results.mean(), 4))
+		digest = hashlib.sha1()
+		fingerprints = {}
+
+		for stage, description in stages:
+			digest.update((stage + ':' + description + ';').encode('utf-8'))
+			fingerprints[stage] = digest.hexdigest()
+
+		return fingerprints
 
 
 
@@ -179,6 +767,55 @@ class NodeClassif(object):
 
 
 
+	def __batch_model(self, feats):
+
+		""" Gets the model used to predict the given selected features rows
+
+		Arguments:
+		----------
+			feats: sparse selected features matrix
+
+		Returns:
+		----------
+			model: compiled forest, parallel forest copy or trained model
+
+		"""
+
+		# Compiled trees avoid the per tree overhead, but not the per row one
+		if (getattr(self, 'forest', None) is not None) and (feats.shape[0] <= self.compiled_rows):
+			return self.forest
+
+		model = self.model
+
+		# Parallel trees only pay off for large batches
+		if isinstance(model, RandomForest) and (feats.shape[0] >= self.parallel_rows):
+			model = copy.copy(model)
+			model.n_jobs = -1
+
+		return model
+
+
+
+
+	def __predict_feats(self, feats) -> numpy.ndarray:
+
+		""" Predicts the labels of the given selected features rows
+
+		Arguments:
+		----------
+			feats: sparse selected features matrix
+
+		Returns:
+		----------
+			labels: predicted label of each row
+
+		"""
+
+		return self.__batch_model(feats).predict(feats)
+
+
+
+
 	def predict(self, sentence: str) -> Union[str, None]:
 
 		""" Predicts the label of the given sentence
@@ -201,7 +838,72 @@ class NodeClassif(object):
 			if feats.getnnz() == 0:
 				return None
 
-			return self.model.predict(feats)[0]
+			return self.__predict_feats(feats)[0]
+
+		except AttributeError:
+			exit('The classifier has not been trained')
+
+
+
+
+	def __batch_feats(self, sentences: list):
+
+		""" Builds the selected features of the given sentences in a single batch
+
+		Arguments:
+		----------
+			sentences: texts to classify
+
+		Returns:
+		----------
+			feats: sparse selected features matrix
+
+		"""
+
+		# Token ids vectorizers tokenize the batch by themselves, without token strings
+		if isinstance(self.vectorizer, IdNgramVectorizer):
+			feats = self.vectorizer.transform(sentences)
+
+		# Vectorizers of older models lowercase the raw texts, so they cannot receive tokens
+		elif getattr(self.vectorizer, 'lowercase', False):
+			feats = self.vectorizer.transform(sentences)
+
+		else:
+			feats = self.vectorizer.transform(self.vectorizer.tokenizer.tokenize_docs(sentences))
+
+		feats = self.selector.transform(feats)
+
+		return feats
+
+
+
+
+	def predict_batch(self, sentences: list) -> List[Union[str, None]]:
+
+		""" Predicts the labels of the given sentences in a single batch
+
+		Arguments:
+		----------
+			sentences: texts to classify
+
+		Returns:
+		----------
+			labels: predicted sentences labels (None if unknown)
+
+		"""
+
+		if len(sentences) == 0:
+			return []
+
+		try:
+			feats = self.__batch_feats(sentences)
+			labels = self.__predict_feats(feats)
+
+			# If none of the features give any information
+			return [
+				label if nnz > 0 else None
+				for label, nnz in zip(labels, feats.getnnz(axis = 1))
+			]
 
 		except AttributeError:
 			exit('The classifier has not been trained')
@@ -209,7 +911,54 @@ class NodeClassif(object):
 
 
 
-	def train(self, profile_data: list, validate: bool = True):
+	def predict_batch_scores(self, sentences: list) -> Tuple[list, list]:
+
+		""" Predicts the labels of the given sentences and their probabilities
+
+		Arguments:
+		----------
+			sentences: texts to classify
+
+		Returns:
+		----------
+			labels: predicted sentences labels (None if unknown)
+			scores: probability of each predicted label (None if unknown or not probabilistic)
+
+		"""
+
+		if len(sentences) == 0:
+			return [], []
+
+		try:
+			feats = self.__batch_feats(sentences)
+			model = self.__batch_model(feats)
+			labels = model.predict(feats)
+
+			nnz = feats.getnnz(axis = 1)
+			labels = [label if n > 0 else None for label, n in zip(labels, nnz)]
+
+			# Linear SVC models do not estimate probabilities
+			if not hasattr(model, 'predict_proba'):
+				return labels, [None] * len(labels)
+
+			probas = model.predict_proba(feats)
+			columns = {label: i for i, label in enumerate(self.model.classes_)}
+
+			scores = [
+				None if label is None else float(proba[columns[label]])
+				for label, proba in zip(labels, probas)
+			]
+
+			return labels, scores
+
+		except AttributeError:
+			exit('The classifier has not been trained')
+
+
+
+
+	def train(self, profile_data: list, validate: bool = True, budget: int = None,
+			  quantize: str = None) -> Union[float, None]:
 
 		""" Trains the specified classification algorithm
 
@@ -217,18 +966,70 @@ class NodeClassif(object):
 		----------
 			profile_data: dictionaries containing datasets paths and labels
 			validate: indicates if the model should be validated (optional)
+			budget: maximum total number of training sentences (optional)
+			quantize: precision of the model weights, validated as well (optional)
+
+		Returns:
+		----------
+			score: mean validation F-score of the kept model (None if not validated)
 
 		"""
 
-		samples, labels = self.__build_feats(profile_data)
+		feats, labels, weights = self.__load_feats(profile_data, budget)
 
-		# Samples are transformed into features in order to train
-		feats = self.vectorizer.fit_transform(samples)
-		feats = self.selector.fit_transform(feats, labels)
-		self.model.fit(feats, labels)
+		# The stems of the training vocabulary are saved with the model
+		if getattr(self, 'stems', None) is not None:
+			sizes = self.__sample_sizes(profile_data, budget)
+
+			for info, size in zip(profile_data, sizes):
+				sentences = self.__read_dataset(info, size)
+				self.stems.update(self.vectorizer.tokenizer.build_stems(sentences))
+
+		# Stored features are transformed into selected features in order to train
+		selected = self.selector.fit_transform(feats, labels)
+
+		if weights is None:
+			self.model.fit(selected, labels)
+		else:
+			self.model.fit(selected, labels, sample_weight = weights)
+
+		self.fingerprint = self.get_fingerprints()['model']
+		score = None
 
 		# Validation process
-		if validate: self.__validate(
-			samples = samples,
-			labels = labels
+		if validate: score = self.__validate(
+			feats = feats,
+			labels = labels,
+			weights = weights,
+			precision = quantize
 		)
+
+		if quantize is not None:
+			self.quantize(quantize)
+
+		return score
+
+
+
+
+	def quantize(self, precision: str):
+
+		""" Replaces the trained model weights by lower precision ones
+
+		The original model is discarded, so the quantized one is used by
+		every prediction method and saved in its place.
+
+		Arguments:
+		----------
+			precision: weights precision ('float32' or 'int8')
+
+		"""
+
+		if isinstance(self.model, QuantizedModel):
+			exit('The classifier is already quantized')
+
+		if not hasattr(self.model, 'classes_'):
+			exit('The classifier has not been trained')
+
+		self.model = QuantizedModel(self.model, precision)
+		self.fingerprint = self.get_fingerprints()['model']
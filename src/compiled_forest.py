@@ -0,0 +1,289 @@
+# Created by Sinclert Perez (Sinclert@hotmail.com)
+
+
+import numpy
+
+from scipy.sparse import csr_matrix
+
+
+
+
+class CompiledForest(object):
+
+	""" Represents a trained random forest compiled for sparse rows
+
+	Text features are mostly zero, so the tree nodes are split into chains:
+	the paths followed when the tested features are absent. Each row only
+	leaves a chain at the nodes testing one of its few non-zero features,
+	so the rows of a batch are sent down all the trees at once, jumping
+	from chain to chain instead of visiting every node of their paths.
+
+	Attributes:
+	----------
+		classes:
+			type: numpy.ndarray
+			info: labels of the forest, in its probabilities order
+
+		root_chains:
+			type: numpy.ndarray
+			info: chain starting at the root of each tree
+
+		node_chains:
+			type: numpy.ndarray
+			info: chain of each node (nodes are numbered in chain order)
+
+		chain_leaves:
+			type: numpy.ndarray
+			info: leaf node ending each chain
+
+		jumps:
+			type: numpy.ndarray
+			info: chain entered when a node takes its non-zero branch (-1 in leaves)
+
+		threshold:
+			type: numpy.ndarray
+			info: threshold compared by each node
+
+		feature_ptr:
+			type: numpy.ndarray
+			info: position in 'feature_nodes' where the nodes of each feature start
+
+		feature_nodes:
+			type: numpy.ndarray
+			info: inner nodes sorted by their tested feature
+
+		value:
+			type: numpy.ndarray
+			info: class probabilities of each node
+	"""
+
+
+	# Rows predicted at once when predicting a batch (class attribute)
+	chunk_rows = 256
+
+
+
+
+	def __init__(self, forest):
+
+		""" Compiles the trees of a trained random forest
+
+		Arguments:
+		----------
+			forest: trained RandomForestClassifier object
+
+		"""
+
+		trees = [estimator.tree_ for estimator in forest.estimators_]
+		offsets = numpy.concatenate(([0], numpy.cumsum([t.node_count for t in trees])[:-1]))
+
+		feature = numpy.concatenate([t.feature for t in trees]).astype(numpy.int64)
+		threshold = numpy.concatenate([t.threshold for t in trees])
+		left = numpy.concatenate([self.__shift(t.children_left, o) for t, o in zip(trees, offsets)])
+		right = numpy.concatenate([self.__shift(t.children_right, o) for t, o in zip(trees, offsets)])
+		value = numpy.concatenate([t.value[:, 0, :] for t in trees])
+
+		inner = left >= 0
+		nodes = numpy.arange(len(left))
+
+		# Branches followed by an absent feature (zero) and by a present one
+		zero_left = 0 <= threshold
+		zero_child = numpy.where(zero_left, left, right)
+		other_child = numpy.where(zero_left, right, left)
+
+		heads, positions = self.__rank_chains(zero_child, inner)
+
+		# Nodes are renumbered so that every chain is contiguous
+		order = numpy.lexsort((positions, heads))
+		renumber = numpy.empty_like(order)
+		renumber[order] = nodes
+
+		starts = positions[order] == 0
+		self.node_chains = numpy.cumsum(starts) - 1
+		self.chain_leaves = numpy.append(numpy.flatnonzero(starts)[1:] - 1, len(order) - 1)
+		self.root_chains = self.node_chains[renumber[offsets]]
+
+		inner = inner[order]
+		other_child = other_child[order]
+		self.jumps = numpy.full(len(order), -1, dtype = numpy.int64)
+		self.jumps[inner] = self.node_chains[renumber[other_child[inner]]]
+
+		self.threshold = threshold[order]
+		self.value = value[order] / value[order].sum(axis = 1, keepdims = True)
+		self.classes = forest.classes_
+
+		feature = feature[order]
+		inner_nodes = numpy.flatnonzero(inner)
+		inner_nodes = inner_nodes[numpy.argsort(feature[inner_nodes], kind = 'stable')]
+		counts = numpy.bincount(feature[inner_nodes], minlength = forest.n_features_in_)
+
+		self.feature_nodes = inner_nodes
+		self.feature_ptr = numpy.concatenate(([0], numpy.cumsum(counts)))
+
+
+
+
+	@staticmethod
+	def __shift(children: numpy.ndarray, offset: int) -> numpy.ndarray:
+
+		""" Converts the children indexes of a tree into forest node indexes
+
+		Arguments:
+		----------
+			children: children indexes within the tree (-1 in leaves)
+			offset: forest node index of the tree root
+
+		Returns:
+		----------
+			children: children indexes within the forest (-1 in leaves)
+
+		"""
+
+		children = children.astype(numpy.int64)
+		return numpy.where(children < 0, -1, children + offset)
+
+
+
+
+	@staticmethod
+	def __rank_chains(zero_child: numpy.ndarray, inner: numpy.ndarray) -> tuple:
+
+		""" Computes the chain head and position of every node (pointer jumping)
+
+		Arguments:
+		----------
+			zero_child: child followed by each node when its feature is absent
+			inner: whether each node is an inner node
+
+		Returns:
+		----------
+			heads: first node of the chain of each node
+			positions: distance from the chain head to each node
+
+		"""
+
+		heads = numpy.arange(len(zero_child))
+		heads[zero_child[inner]] = numpy.flatnonzero(inner)
+		positions = (heads != numpy.arange(len(zero_child))).astype(numpy.int64)
+
+		while True:
+			jumped = heads[heads]
+
+			if numpy.array_equal(jumped, heads):
+				return heads, positions
+
+			positions = positions + positions[heads]
+			heads = jumped
+
+
+
+
+	def __leaves(self, feats: csr_matrix) -> numpy.ndarray:
+
+		""" Sends the rows down every tree until they reach a leaf
+
+		Arguments:
+		----------
+			feats: sparse selected features matrix
+
+		Returns:
+		----------
+			leaves: leaf node of each row (rows) in each tree (columns)
+
+		"""
+
+		n_rows = feats.shape[0]
+		n_chains = len(self.chain_leaves)
+
+		rows = numpy.repeat(numpy.arange(n_rows), numpy.diff(feats.indptr))
+		starts = self.feature_ptr[feats.indices]
+		lengths = self.feature_ptr[feats.indices + 1] - starts
+
+		# Every node testing a present feature is a candidate exit of its chain
+		shifts = numpy.repeat(starts - (numpy.cumsum(lengths) - lengths), lengths)
+		nodes = self.feature_nodes[numpy.arange(lengths.sum()) + shifts]
+		rows = numpy.repeat(rows, lengths)
+
+		# Trees compare the features as float32, as scikit-learn does
+		values = numpy.repeat(feats.data.astype(numpy.float32), lengths)
+		threshold = self.threshold[nodes]
+
+		exits = (values <= threshold) != (0 <= threshold)
+		nodes, rows = nodes[exits], rows[exits]
+
+		# The first candidate of each (row, chain) is where the row leaves it
+		n_nodes = len(self.node_chains)
+		candidates = numpy.sort(rows * n_nodes + nodes, kind = 'stable')
+		rows, nodes = numpy.divmod(candidates, n_nodes)
+		keys = rows * n_chains + self.node_chains[nodes]
+
+		first = numpy.concatenate(([True], keys[1:] != keys[:-1]))
+		keys, nodes = keys[first], nodes[first]
+
+		chains = numpy.repeat(self.root_chains[None, :], n_rows, axis = 0)
+		offsets = numpy.arange(n_rows)[:, None] * n_chains
+
+		while len(keys) > 0:
+			indexes = numpy.searchsorted(keys, chains + offsets)
+			indexes = numpy.minimum(indexes, len(keys) - 1)
+			jumping = keys[indexes] == (chains + offsets)
+
+			if not jumping.any():
+				break
+
+			chains[jumping] = self.jumps[nodes[indexes[jumping]]]
+
+		return self.chain_leaves[chains]
+
+
+
+
+	def predict_proba(self, feats: csr_matrix) -> numpy.ndarray:
+
+		""" Computes the class probabilities of the given features rows
+
+		Arguments:
+		----------
+			feats: sparse selected features matrix
+
+		Returns:
+		----------
+			probas: mean class probabilities of the trees for each row
+
+		"""
+
+		feats = csr_matrix(feats)
+		feats.sum_duplicates()
+		probas = numpy.empty((feats.shape[0], len(self.classes)))
+
+		for start in range(0, feats.shape[0], self.chunk_rows):
+			chunk = feats[start:start + self.chunk_rows]
+			leaves = self.__leaves(chunk)
+			total = numpy.zeros((chunk.shape[0], len(self.classes)))
+
+			# Summed in the trees order, so ties are broken as scikit-learn does
+			for tree_leaves in leaves.T:
+				total += self.value[tree_leaves]
+
+			probas[start:start + chunk.shape[0]] = total / leaves.shape[1]
+
+		return probas
+
+
+
+
+	def predict(self, feats: csr_matrix) -> numpy.ndarray:
+
+		""" Predicts the labels of the given features rows
+
+		Arguments:
+		----------
+			feats: sparse selected features matrix
+
+		Returns:
+		----------
+			labels: predicted label of each row
+
+		"""
+
+		return self.classes[self.predict_proba(feats).argmax(axis = 1)]
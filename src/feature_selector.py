@@ -0,0 +1,260 @@
+# Created by Sinclert Perez (Sinclert@hotmail.com)
+
+
+import numpy
+
+from scipy.sparse import csr_matrix
+from sklearn.base import BaseEstimator
+from sklearn.feature_selection import SelectorMixin
+
+
+
+
+class ChiSquareSelector(SelectorMixin, BaseEstimator):
+
+	""" Represents a chi-square features selector for large sparse matrices
+
+	The per class counts are computed in a single sparse pass over chunks
+	of rows, without converting the matrix into floats, and the percentile
+	threshold is found by partial selection. Its scores and its selected
+	features are the same as 'SelectPercentile(chi2)'.
+
+	Attributes:
+	----------
+		percentile:
+			type: float
+			info: percentage of most informative features to keep
+
+		max_features:
+			type: int
+			info: maximum number of features to keep (None if unbounded)
+
+		chunk_rows:
+			type: int
+			info: number of rows counted at once
+
+		scores_:
+			type: numpy.ndarray
+			info: chi-square statistic of each feature
+
+		support_:
+			type: numpy.ndarray
+			info: whether each feature is selected
+	"""
+
+
+
+
+	def __init__(self, percentile: float = 10, max_features: int = None, chunk_rows: int = 100000):
+
+		""" Creates a chi-square selector object
+
+		Arguments:
+		----------
+			percentile: percentage of most informative features to keep (optional)
+			max_features: maximum number of features to keep (optional)
+			chunk_rows: number of rows counted at once (optional)
+
+		"""
+
+		self.percentile = percentile
+		self.max_features = max_features
+		self.chunk_rows = chunk_rows
+
+
+
+
+	def __count(self, feats, labels: numpy.ndarray, n_classes: int) -> numpy.ndarray:
+
+		""" Counts the occurrences of each feature in each class
+
+		Arguments:
+		----------
+			feats: sparse features matrix (possibly memory-mapped)
+			labels: class index of each row
+			n_classes: number of classes
+
+		Returns:
+		----------
+			observed: feature counts (columns) of each class (rows)
+
+		"""
+
+		observed = numpy.zeros((n_classes, feats.shape[1]))
+
+		# Only one chunk of rows is read at once
+		for start in range(0, feats.shape[0], self.chunk_rows):
+			chunk = csr_matrix(feats[start:start + self.chunk_rows])
+			chunk_labels = labels[start:start + self.chunk_rows]
+
+			classes = csr_matrix(
+				(numpy.ones(len(chunk_labels), dtype = chunk.dtype),
+				 (chunk_labels, numpy.arange(len(chunk_labels)))),
+				shape = (n_classes, len(chunk_labels))
+			)
+
+			observed += (classes @ chunk).toarray()
+
+		return observed
+
+
+
+
+	@staticmethod
+	def __scores(observed: numpy.ndarray, class_counts: numpy.ndarray) -> numpy.ndarray:
+
+		""" Computes the chi-square statistic of each feature
+
+		Arguments:
+		----------
+			observed: feature counts (columns) of each class (rows)
+			class_counts: number of rows of each class
+
+		Returns:
+		----------
+			scores: chi-square statistics (minimum float where undefined)
+
+		"""
+
+		class_prob = class_counts / class_counts.sum()
+		expected = numpy.outer(class_prob, observed.sum(axis = 0))
+
+		# Same operations order as scikit-learn, so the scores are identical
+		scores = observed
+		scores -= expected
+		scores **= 2
+
+		with numpy.errstate(invalid = 'ignore'):
+			scores /= expected
+
+		scores = scores.sum(axis = 0)
+		scores[numpy.isnan(scores)] = numpy.finfo(scores.dtype).min
+
+		return scores
+
+
+
+
+	@staticmethod
+	def __percentile(scores: numpy.ndarray, q: float) -> float:
+
+		""" Computes a linear interpolated percentile by partial selection
+
+		Arguments:
+		----------
+			scores: features scores
+			q: percentile to compute
+
+		Returns:
+		----------
+			threshold: score of the percentile (as 'numpy.percentile')
+
+		"""
+
+		index = (len(scores) - 1) * (q / 100)
+		lower = int(numpy.floor(index))
+		upper = min(lower + 1, len(scores) - 1)
+
+		partitioned = numpy.partition(scores, [lower, upper])
+		a, b = partitioned[lower], partitioned[upper]
+		gamma = index - lower
+
+		if gamma >= 0.5:
+			return b - (b - a) * (1 - gamma)
+
+		return a + (b - a) * gamma
+
+
+
+
+	@staticmethod
+	def __keep_best(scores: numpy.ndarray, mask: numpy.ndarray, k: int) -> numpy.ndarray:
+
+		""" Keeps the best k features of a mask (ties broken by lowest index)
+
+		Arguments:
+		----------
+			scores: features scores
+			mask: currently selected features
+			k: number of features to keep
+
+		Returns:
+		----------
+			mask: selected features
+
+		"""
+
+		candidates = numpy.flatnonzero(mask)
+		kth = numpy.partition(scores[candidates], len(candidates) - k)[len(candidates) - k]
+
+		best = numpy.zeros_like(mask)
+		best[candidates[scores[candidates] > kth]] = True
+
+		ties = candidates[scores[candidates] == kth]
+		best[ties[:k - best.sum()]] = True
+
+		return best
+
+
+
+
+	def fit(self, feats, labels: list):
+
+		""" Computes the features scores and selects the best ones
+
+		Arguments:
+		----------
+			feats: sparse features matrix (possibly memory-mapped)
+			labels: contains all the sentences labels
+
+		Returns:
+		----------
+			self: fitted selector
+
+		"""
+
+		classes, labels = numpy.unique(labels, return_inverse = True)
+
+		# At least two classes are counted, as scikit-learn does
+		n_classes = max(len(classes), 2)
+		class_counts = numpy.bincount(labels, minlength = n_classes).astype(numpy.float64)
+		observed = self.__count(feats, labels, n_classes)
+
+		self.n_features_in_ = feats.shape[1]
+		self.scores_ = self.__scores(observed, class_counts)
+
+		if self.percentile >= 100:
+			mask = numpy.ones(len(self.scores_), dtype = bool)
+		elif self.percentile <= 0:
+			mask = numpy.zeros(len(self.scores_), dtype = bool)
+
+		# Same ties handling as 'SelectPercentile'
+		else:
+			threshold = self.__percentile(self.scores_, 100 - self.percentile)
+			mask = self.scores_ > threshold
+			ties = numpy.flatnonzero(self.scores_ == threshold)
+
+			if len(ties) > 0:
+				max_feats = int(len(self.scores_) * self.percentile / 100)
+				mask[ties[:max_feats - mask.sum()]] = True
+
+		if (self.max_features is not None) and (mask.sum() > self.max_features):
+			mask = self.__keep_best(self.scores_, mask, self.max_features)
+
+		self.support_ = mask
+		return self
+
+
+
+
+	def _get_support_mask(self) -> numpy.ndarray:
+
+		""" Gets the mask of selected features (used by 'SelectorMixin')
+
+		Returns:
+		----------
+			mask: whether each feature is selected
+
+		"""
+
+		return self.support_
@@ -0,0 +1,134 @@
+# Created by Sinclert Perez (Sinclert@hotmail.com)
+
+
+import os
+import shutil
+
+import numpy
+
+from scipy.sparse import csr_matrix
+from typing import Tuple
+from typing import Union
+
+from utils import compute_path
+
+
+# Arrays stored in every feature store entry
+store_arrays = ('data', 'indices', 'indptr', 'shape', 'labels', 'groups', 'vocab')
+
+
+
+
+class FeatureStore(object):
+
+	""" Represents a persistent store of vectorized training matrices
+
+	Every entry is a folder containing one '.npy' file per array, so the
+	CSR matrix components and the labels can be memory-mapped (zero-copy)
+	by any number of processes training over the same features.
+
+	Attributes:
+	----------
+		path:
+			type: string
+			info: folder containing the entry arrays
+	"""
+
+
+
+
+	def __init__(self, key: str):
+
+		""" Creates a feature store object
+
+		Arguments:
+		----------
+			key: identifier of the stored features (datasets and pipeline)
+
+		"""
+
+		self.path = compute_path(os.path.join('features', key), 'cache')
+
+
+
+
+	def load(self) -> Union[Tuple[csr_matrix, numpy.ndarray, numpy.ndarray, dict], None]:
+
+		""" Opens the stored features as memory-mapped arrays
+
+		Returns:
+		----------
+			feats: sparse features matrix (read only)
+			labels: samples labels (read only)
+			groups: dataset index of each sample (read only)
+			vocab: dictionary mapping each feature to its column
+
+			None if the entry is not stored
+
+		"""
+
+		try:
+			arrays = {}
+
+			for name in store_arrays:
+				file_path = os.path.join(self.path, name + '.npy')
+				arrays[name] = numpy.load(file_path, mmap_mode = 'r')
+
+		except (IOError, ValueError):
+			return None
+
+		feats = csr_matrix(
+			(arrays['data'], arrays['indices'], arrays['indptr']),
+			shape = tuple(arrays['shape']),
+			copy = False
+		)
+
+		vocab = bytes(arrays['vocab']).decode('utf-8')
+		vocab = vocab.split('\n') if vocab else []
+		vocab = {feat: i for i, feat in enumerate(vocab)}
+
+		return feats, arrays['labels'], arrays['groups'], vocab
+
+
+
+
+	def save(self, feats: csr_matrix, labels: list, groups: list, vocab: dict):
+
+		""" Atomically stores the features of a training matrix
+
+		Arguments:
+		----------
+			feats: sparse features matrix
+			labels: samples labels
+			groups: dataset index of each sample
+			vocab: dictionary mapping each feature to its column
+
+		"""
+
+		feats = csr_matrix(feats)
+		names = sorted(vocab.keys(), key = vocab.get)
+		names = '\n'.join(names).encode('utf-8')
+
+		arrays = {
+			'data': feats.data,
+			'indices': feats.indices,
+			'indptr': feats.indptr,
+			'shape': numpy.array(feats.shape, dtype = numpy.int64),
+			'labels': numpy.array(labels, dtype = str),
+			'groups': numpy.array(groups, dtype = numpy.int32),
+			'vocab': numpy.frombuffer(names, dtype = numpy.uint8)
+		}
+
+		temp_path = self.path + '.' + str(os.getpid()) + '.tmp'
+
+		try:
+			os.makedirs(temp_path, exist_ok = True)
+
+			for name, array in arrays.items():
+				numpy.save(os.path.join(temp_path, name + '.npy'), array)
+
+			os.rename(temp_path, self.path)
+
+		# Concurrent trainings may have stored the same entry (or the cache may not be writable)
+		except OSError:
+			shutil.rmtree(temp_path, ignore_errors = True)
@@ -1,11 +1,19 @@
 # Created by Sinclert Perez (Sinclert@hotmail.com)
 
 
+import json
+import math
+import os
+import time
+
+from utils import compute_path
+
+
 
 
 class FiguresDrawer(object):
 
-	""" Represents a pie drawer static class """
+	""" Represents a pie and trend drawer static class """
 
 
 
@@ -42,60 +50,327 @@ class FiguresDrawer(object):
 
 
 	@staticmethod
-	def update_pie(frame, axis, counter: dict, labels: list, colors: list):
+	def draw_trend(times: list, counts, labels: list, colors: list, title: str, gaps: list = None):
 
-		""" Plots a pie graph with the desired parameters (animation)
+		""" Plots a stacked area graph of the label counts over time
 
 		Arguments:
 		----------
-			axis: space where the pie is drawn
-			counter: occurrences of each label
+			times: UNIX timestamp of each bucket
+			counts: label counts of each bucket (one column per label)
 			labels: labels names
 			colors: colors RGB codes
+			title: name of the graph
+			gaps: (start, end) UNIX timestamps of the disconnected intervals (optional)
 
 		"""
 
-		if len(counter) > 0:
+		from datetime import datetime
+		from matplotlib import pyplot
+
+		dates = [datetime.fromtimestamp(t) for t in times]
 
-			sizes = [counter[label] for label in labels]
-			axis.clear()
-			axis.pie(
-				x = sizes,
-				labels = labels,
-				colors = colors
+		pyplot.stackplot(
+			dates,
+			counts.T,
+			labels = labels,
+			colors = colors
+		)
+
+		# Disconnected intervals are shaded, so their low counts are not misread
+		for i, (start, end) in enumerate(gaps or []):
+			pyplot.axvspan(
+				datetime.fromtimestamp(start),
+				datetime.fromtimestamp(end),
+				color = 'grey',
+				alpha = 0.3,
+				label = 'disconnected' if i == 0 else None
 			)
 
+		pyplot.legend(loc = 'upper left')
+		pyplot.gcf().autofmt_xdate()
+		pyplot.title(title)
+		pyplot.show()
+
 
 
 
 	@staticmethod
-	def animate_pie(counter: dict, labels: list, colors: list, title: str):
+	def build_pie(axis, labels: list, colors: list) -> tuple:
 
-		""" Plots a pie graph with the desired parameters (animation)
+		""" Builds the pie wedges and texts that are later updated in place
 
 		Arguments:
 		----------
-			counter: occurrences of each label
+			axis: space where the pie is drawn
 			labels: labels names
 			colors: colors RGB codes
-			title: name of the graph
+
+		Returns:
+		----------
+			wedges: pie wedges (initially hidden)
+			texts: pie labels texts (initially hidden)
+
+		"""
+
+		wedges, texts = axis.pie(
+			x = [1] * len(labels),
+			labels = labels,
+			colors = colors
+		)
+
+		for artist in wedges + texts:
+			artist.set_visible(False)
+
+		return wedges, texts
+
+
+
+
+	@staticmethod
+	def update_pie(wedges: list, texts: list, counter: dict, labels: list):
+
+		""" Updates the pie wedges geometry in place (without clearing the axis)
+
+		Arguments:
+		----------
+			wedges: pie wedges
+			texts: pie labels texts
+			counter: occurrences of each label
+			labels: labels names
+
+		"""
+
+		sizes = [counter.get(label, 0) for label in labels]
+		total = sum(sizes)
+
+		if total <= 0:
+			return
+
+		theta = 0
+
+		for wedge, text, size in zip(wedges, texts, sizes):
+			angle = 360 * size / total
+
+			wedge.set_theta1(theta)
+			wedge.set_theta2(theta + angle)
+
+			# Same label placement as pyplot.pie
+			middle = math.radians(theta + angle / 2)
+			x = 1.1 * math.cos(middle)
+			y = 1.1 * math.sin(middle)
+
+			text.set_position((x, y))
+			text.set_horizontalalignment('left' if x > 0 else 'right')
+
+			wedge.set_visible(size > 0)
+			text.set_visible(size > 0)
+			theta += angle
+
+
+
+
+	@staticmethod
+	def format_status(status: dict) -> str:
+
+		""" Formats a status dictionary as a figure subtitle
+
+		Arguments:
+		----------
+			status: dictionary of status values
+
+		Returns:
+		----------
+			text: subtitle text
+
+		"""
+
+		return ', '.join(k.replace('_', ' ') + ': ' + str(v) for k, v in status.items())
+
+
+
+
+	@staticmethod
+	def build_panels(figure, panels: list) -> list:
+
+		""" Builds one pie graph per panel inside a grid of the figure
+
+		Arguments:
+		----------
+			figure: matplotlib figure where the panels are drawn
+			panels: list of dictionaries containing:
+				- snapshot (function returning a (version, counter) snapshot)
+				- labels (list)
+				- colors (list)
+				- title (string)
+
+		Returns:
+		----------
+			pies: list of (panel, wedges, texts) tuples
+
+		"""
+
+		cols = math.ceil(math.sqrt(len(panels)))
+		rows = math.ceil(len(panels) / cols)
+		axes = figure.subplots(rows, cols, squeeze = False).flatten()
+
+		pies = []
+
+		for axis, panel in zip(axes, panels):
+			axis.set_title(panel['title'])
+			axis.axis('equal')
+
+			wedges, texts = FiguresDrawer.build_pie(axis, panel['labels'], panel['colors'])
+			pies.append((panel, wedges, texts))
+
+		for axis in axes[len(panels):]:
+			axis.set_visible(False)
+
+		return pies
+
+
+
+
+	@staticmethod
+	def update_panels(pies: list, drawn: list) -> bool:
+
+		""" Updates the panels whose distribution changed since they were drawn
+
+		Arguments:
+		----------
+			pies: list of (panel, wedges, texts) tuples
+			drawn: last drawn (version, counter) snapshot of each panel
+
+		Returns:
+		----------
+			changed: whether any panel was updated
+
+		"""
+
+		changed = False
+
+		for i, (panel, wedges, texts) in enumerate(pies):
+			version, counter = panel['snapshot']()
+
+			if (drawn[i] is None) or (version != drawn[i][0]):
+				drawn[i] = (version, counter)
+				changed = True
+				FiguresDrawer.update_pie(wedges, texts, counter, panel['labels'])
+
+		return changed
+
+
+
+
+	@staticmethod
+	def animate_pies(panels: list, status = None, interval: int = 250):
+
+		""" Plots several pie graphs with the desired parameters (animation)
+
+		Arguments:
+		----------
+			panels: list of dictionaries containing:
+				- snapshot (function returning a (version, counter) snapshot)
+				- labels (list)
+				- colors (list)
+				- title (string)
+
+			status: function returning a dictionary to show as subtitle (optional)
+			interval: milliseconds between snapshots checks (optional)
 
 		"""
 
 		from matplotlib import pyplot
-		from matplotlib.animation import FuncAnimation
 
-		figure, axis = pyplot.subplots()
+		figure = pyplot.figure()
+		pies = FiguresDrawer.build_panels(figure, panels)
+		drawn = [None] * len(pies)
+		shown = [None]
 
-		pyplot.title(title)
-		pyplot.axis('equal')
+		# The figure is only redrawn when any distribution or the status changed
+		def refresh():
+			changed = FiguresDrawer.update_panels(pies, drawn)
+			subtitle = None if status is None else FiguresDrawer.format_status(status())
 
-		ani = FuncAnimation(
-			fig = figure,
-			func = FiguresDrawer.update_pie,
-			interval = 250,
-			repeat = False,
-			fargs = (axis, counter, labels, colors)
-		)
+			if changed or (subtitle != shown[0]):
+				if subtitle is not None:
+					figure.suptitle(subtitle)
+
+				shown[0] = subtitle
+				figure.canvas.draw_idle()
+
+		timer = figure.canvas.new_timer(interval = interval)
+		timer.add_callback(refresh)
+		timer.start()
 
 		pyplot.show()
+
+
+
+
+	@staticmethod
+	def snapshot_pies(panels: list, output: str, status = None, interval: int = 5):
+
+		""" Periodically saves PNG and JSON snapshots of several pie graphs (headless)
+
+		Arguments:
+		----------
+			panels: list of dictionaries containing:
+				- snapshot (function returning a (version, counter) snapshot)
+				- labels (list)
+				- colors (list)
+				- title (string)
+
+			output: output files name (without extension)
+			status: function returning a dictionary to include (optional)
+			interval: seconds between snapshots (optional)
+
+		"""
+
+		from matplotlib.backends.backend_agg import FigureCanvasAgg
+		from matplotlib.figure import Figure
+
+		file_path = compute_path(output, 'snapshot')
+		os.makedirs(os.path.dirname(file_path), exist_ok = True)
+
+		figure = Figure()
+		FigureCanvasAgg(figure)
+
+		pies = FiguresDrawer.build_panels(figure, panels)
+		drawn = [None] * len(pies)
+		shown = None
+
+		try:
+			while True:
+				changed = FiguresDrawer.update_panels(pies, drawn)
+				info = {} if status is None else status()
+
+				# The files are only rewritten when any distribution or the status changed
+				if changed or (info != shown):
+					shown = info
+					figure.suptitle(FiguresDrawer.format_status(info))
+					figure.savefig(file_path + '.tmp.png')
+					os.replace(file_path + '.tmp.png', file_path + '.png')
+
+					with open(file_path + '.tmp.json', 'w', encoding = 'utf-8') as file:
+						json.dump({
+							'time': time.time(),
+							'status': info,
+							'panels': [
+								{
+									'title': panel['title'],
+									'counters': {l: counter.get(l, 0) for l in panel['labels']}
+								}
+								for panel, (_, counter) in zip(panels, drawn)
+							]
+						}, file)
+
+					os.replace(file_path + '.tmp.json', file_path + '.json')
+
+				time.sleep(interval)
+
+		except KeyboardInterrupt:
+			pass
+
+		except IOError:
+			exit('The snapshots could not be saved in ' + file_path)
@@ -0,0 +1,301 @@
+# Created by Sinclert Perez (Sinclert@hotmail.com)
+
+
+import json
+import os
+import time
+
+from collections import deque
+from multiprocessing import Pool
+from typing import Tuple
+
+from clf_hierarchy import HierarchicalClassif
+from utils import clean_text
+from utils import compute_path
+
+
+
+
+class FilePredictor(object):
+
+	""" Represents a batch classification of a large file of tweets
+
+	The input file is read line by line, so it never has to fit in memory.
+	Its lines are cleaned and classified in batches, which are spread over
+	several processes when requested. Only a few batches per process are
+	in flight at once, and their results are written in the input order.
+
+	Attributes:
+	----------
+		profile:
+			type: string
+			info: predicting profile file name
+
+		batch_size:
+			type: int
+			info: number of lines classified at once
+
+		workers:
+			type: int
+			info: number of classifying processes
+
+		scores:
+			type: bool
+			info: whether the path probability of each label is written
+	"""
+
+
+	# Classifier of the current process (class attribute)
+	classifier = None
+
+	# Batches in flight per classifying process (class attribute)
+	pending_batches = 2
+
+
+
+
+	def __init__(self, profile: str, batch_size: int = 1000, workers: int = 1, scores: bool = False):
+
+		""" Creates a file predictor object
+
+		Arguments:
+		----------
+			profile: predicting profile file name
+			batch_size: number of lines classified at once (optional)
+			workers: number of classifying processes (optional)
+			scores: whether the path probabilities are written (optional)
+
+		"""
+
+		if (batch_size < 1) or (workers < 1):
+			exit('The batch size and the number of workers must be positive')
+
+		self.profile = profile
+		self.batch_size = batch_size
+		self.workers = workers
+		self.scores = scores
+
+
+
+
+	@staticmethod
+	def load_worker(profile: str):
+
+		""" Loads the classifier of the current process (used as Pool initializer)
+
+		Arguments:
+		----------
+			profile: predicting profile file name
+
+		"""
+
+		FilePredictor.classifier = HierarchicalClassif(profile)
+
+
+
+
+	@staticmethod
+	def predict_lines(batch: list) -> Tuple[list, list]:
+
+		""" Classifies a batch of lines with the classifier of the current process
+
+		Arguments:
+		----------
+			batch: tuples containing the cleaned text and the language of each line
+
+		Returns:
+		----------
+			labels: predicted label of each line (None if unknown)
+			scores: path probability of each label (None if unknown or not probabilistic)
+
+		"""
+
+		texts = [text for text, _ in batch]
+		langs = [lang for _, lang in batch]
+
+		return FilePredictor.classifier.predict_batch_scores(texts, langs)
+
+
+
+
+	@staticmethod
+	def __parse_line(line: str, jsonl: bool) -> Tuple[object, str, object]:
+
+		""" Extracts the ID, the cleaned text and the language of an input line
+
+		Arguments:
+		----------
+			line: input file line (without the new line character)
+			jsonl: whether the line is a JSON object
+
+		Returns:
+		----------
+			tweet_id: tweet ID (None if not provided)
+			text: lowercase cleaned text
+			lang: tweet language code (None if not provided)
+
+		"""
+
+		if not jsonl:
+			return None, clean_text(line.lower()), None
+
+		try:
+			tweet = json.loads(line)
+			text = tweet.get('full_text', tweet.get('text')) or ''
+
+			return tweet.get('id'), clean_text(text.lower()), tweet.get('lang')
+
+		# Malformed lines are kept, so the output lines stay aligned
+		except (ValueError, AttributeError):
+			return None, '', None
+
+
+
+
+	def __read_batches(self, file_path: str):
+
+		""" Reads the input file in batches of parsed lines
+
+		Arguments:
+		----------
+			file_path: input file path
+
+		Returns:
+		----------
+			batches: generator of lists of (ID, text, language) tuples
+
+		"""
+
+		jsonl = file_path.endswith('.jsonl')
+		batch = []
+
+		with open(file_path, 'r', encoding = 'utf-8') as file:
+			for line in file:
+				batch.append(self.__parse_line(line.rstrip('\n'), jsonl))
+
+				if len(batch) == self.batch_size:
+					yield batch
+					batch = []
+
+		if batch:
+			yield batch
+
+
+
+
+	def __write_batch(self, file, first_line: int, batch: list, labels: list, scores: list):
+
+		""" Writes the results of a batch as JSON lines
+
+		Arguments:
+		----------
+			file: output file object
+			first_line: input line number of the first line of the batch
+			batch: (ID, text, language) tuples of the batch
+			labels: predicted label of each line
+			scores: path probability of each label
+
+		"""
+
+		for i, ((tweet_id, _, _), label, score) in enumerate(zip(batch, labels, scores)):
+			row = {'line': first_line + i}
+
+			if tweet_id is not None:
+				row['id'] = tweet_id
+
+			row['label'] = label
+
+			if self.scores:
+				row['score'] = score
+
+			file.write(json.dumps(row) + '\n')
+
+
+
+
+	def __write_pending(self, file, pending: tuple):
+
+		""" Waits for the results of a pending batch and writes them
+
+		Arguments:
+		----------
+			file: output file object
+			pending: first line number, batch and result (or asynchronous result)
+
+		"""
+
+		first_line, batch, result = pending
+
+		if not isinstance(result, tuple):
+			result = result.get()
+
+		self.__write_batch(file, first_line, batch, *result)
+
+
+
+
+	def predict(self, input_name: str, output_name: str) -> Tuple[int, float]:
+
+		""" Classifies every line of a dataset file into an export file
+
+		Arguments:
+		----------
+			input_name: input dataset file name (plain text or JSONL)
+			output_name: output export file name
+
+		Returns:
+		----------
+			lines: number of classified lines
+			seconds: elapsed seconds
+
+		"""
+
+		input_path = compute_path(input_name, 'dataset')
+		output_path = compute_path(output_name, 'export')
+
+		if not os.path.exists(input_path):
+			exit('The file ' + input_name + ' cannot be opened')
+
+		os.makedirs(os.path.dirname(output_path), exist_ok = True)
+
+		start = time.time()
+		lines = 0
+		pool = None
+
+		if self.workers > 1:
+			pool = Pool(self.workers, initializer = self.load_worker, initargs = (self.profile,))
+		else:
+			self.load_worker(self.profile)
+
+		try:
+			with open(output_path + '.tmp', 'w', encoding = 'utf-8') as file:
+				pending = deque()
+
+				for batch in self.__read_batches(input_path):
+					texts = [(text, lang) for _, text, lang in batch]
+
+					if pool is None:
+						result = self.predict_lines(texts)
+					else:
+						result = pool.apply_async(self.predict_lines, (texts,))
+
+					pending.append((lines, batch, result))
+					lines += len(batch)
+
+					# Results are written in order, bounding the batches in memory
+					while pending and ((pool is None) or (len(pending) > self.workers * self.pending_batches)):
+						self.__write_pending(file, pending.popleft())
+
+				while pending:
+					self.__write_pending(file, pending.popleft())
+
+			os.replace(output_path + '.tmp', output_path)
+
+		except IOError:
+			exit('The file ' + output_name + ' cannot be written')
+
+		finally:
+			if pool is not None:
+				pool.terminate()
+
+		return lines, time.time() - start
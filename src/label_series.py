@@ -0,0 +1,305 @@
+# Created by Sinclert Perez (Sinclert@hotmail.com)
+
+
+import os
+import time
+
+import numpy
+
+from threading import Lock
+from typing import Tuple
+
+from utils import compute_path
+
+
+# Series levels: (name, bucket seconds, number of buckets kept)
+series_levels = (
+	('minute', 60, 60 * 24),
+	('hour', 3600, 24 * 90),
+	('day', 86400, 365 * 10),
+)
+
+
+
+
+class LabelSeries(object):
+
+	""" Represents the label counts of a stream aggregated in time buckets
+
+	Every level keeps its latest buckets in a fixed size ring of NumPy
+	arrays, so the memory does not grow with the stream duration. Each
+	label is counted in all the levels at once, so coarser levels keep
+	the history after the finer ones have been overwritten. The intervals
+	where the stream was disconnected are kept too, so low counts caused by
+	a disconnection can be told apart from real drops.
+
+	Attributes:
+	----------
+		file_path:
+			type: string
+			info: path of the persisted series file
+
+		labels:
+			type: list
+			info: labels names, in the counts columns order
+
+		widths:
+			type: list
+			info: bucket seconds of each level (finest first)
+
+		buckets:
+			type: list
+			info: bucket number stored in each ring slot, per level (-1 if empty)
+
+		counts:
+			type: list
+			info: weighted label counts of each ring slot, per level
+
+		gaps:
+			type: list
+			info: (start, end) UNIX timestamps of the latest disconnected intervals
+
+		lock:
+			type: threading.Lock
+			info: guards the rings against concurrent readers
+	"""
+
+
+	# Maximum number of disconnected intervals kept (class attribute)
+	max_gaps = 1000
+
+
+
+
+	def __init__(self, file_name: str, labels: list):
+
+		""" Creates a label series, loading the persisted buckets if any
+
+		Arguments:
+		----------
+			file_name: series file name (without extension)
+			labels: labels names
+
+		"""
+
+		self.file_path = compute_path(file_name + '.npz', 'series')
+		self.labels = list(labels)
+		self.widths = [width for _, width, _ in series_levels]
+		self.buckets = [numpy.full(size, -1, dtype = numpy.int64) for _, _, size in series_levels]
+		self.counts = [numpy.zeros((size, len(labels))) for _, _, size in series_levels]
+		self.gaps = []
+		self.lock = Lock()
+
+		if os.path.exists(self.file_path):
+			self.__load()
+
+
+
+
+	def __load(self):
+
+		""" Loads the persisted buckets of the labels that still exist """
+
+		try:
+			with numpy.load(self.file_path) as data:
+				stored = list(data['labels'])
+
+				for i in range(len(series_levels)):
+					if len(data['buckets_' + str(i)]) != len(self.buckets[i]):
+						continue
+
+					self.buckets[i] = data['buckets_' + str(i)]
+
+					for column, label in enumerate(self.labels):
+						if label in stored:
+							self.counts[i][:, column] = data['counts_' + str(i)][:, stored.index(label)]
+
+				# Series stored before the disconnections were recorded have no gaps
+				if 'gaps' in data:
+					self.gaps = [tuple(gap) for gap in data['gaps'].tolist()]
+
+		except (IOError, KeyError, ValueError):
+			exit('The series file ' + self.file_path + ' could not be loaded')
+
+
+
+
+	def save(self):
+
+		""" Atomically persists the buckets of every level """
+
+		with self.lock:
+			arrays = {
+				'labels': numpy.array(self.labels, dtype = str),
+				'gaps': numpy.array(self.gaps, dtype = numpy.float64).reshape(-1, 2)
+			}
+
+			for i in range(len(series_levels)):
+				arrays['buckets_' + str(i)] = self.buckets[i].copy()
+				arrays['counts_' + str(i)] = self.counts[i].copy()
+
+		os.makedirs(os.path.dirname(self.file_path), exist_ok = True)
+
+		try:
+			with open(self.file_path + '.tmp', 'wb') as file:
+				numpy.savez(file, **arrays)
+
+			os.replace(self.file_path + '.tmp', self.file_path)
+
+		except IOError:
+			exit('The series could not be saved in ' + self.file_path)
+
+
+
+
+	def add(self, label: str, weight: float = 1.0, timestamp: float = None):
+
+		""" Counts a label in the bucket of its timestamp, in every level
+
+		Arguments:
+		----------
+			label: predicted label
+			weight: number of tweets the label represents (optional)
+			timestamp: UNIX timestamp of the tweet (optional, now by default)
+
+		"""
+
+		if label not in self.labels:
+			return
+
+		if timestamp is None:
+			timestamp = time.time()
+
+		column = self.labels.index(label)
+
+		with self.lock:
+			for width, buckets, counts in zip(self.widths, self.buckets, self.counts):
+				bucket = int(timestamp // width)
+				slot = bucket % len(buckets)
+
+				# Slots are reused once their bucket falls out of the ring
+				if buckets[slot] < bucket:
+					buckets[slot] = bucket
+					counts[slot] = 0
+
+				if buckets[slot] == bucket:
+					counts[slot, column] += weight
+
+
+
+
+	def add_gap(self, start: float, end: float):
+
+		""" Records an interval where the stream was disconnected
+
+		Arguments:
+		----------
+			start: UNIX timestamp of the disconnection
+			end: UNIX timestamp of the reconnection
+
+		"""
+
+		if end <= start:
+			return
+
+		with self.lock:
+			self.gaps.append((start, end))
+			del self.gaps[:-self.max_gaps]
+
+
+
+
+	def get_gaps(self, start: float, end: float) -> list:
+
+		""" Gets the disconnected intervals overlapping a time range
+
+		Arguments:
+		----------
+			start: UNIX timestamp of the range start
+			end: UNIX timestamp of the range end
+
+		Returns:
+		----------
+			gaps: (start, end) UNIX timestamps of each interval, clipped to the range
+
+		"""
+
+		with self.lock:
+			return [
+				(max(g_start, start), min(g_end, end))
+				for g_start, g_end in self.gaps
+				if (g_start < end) and (g_end > start)
+			]
+
+
+
+
+	def __select_level(self, start: float, resolution: int) -> int:
+
+		""" Selects the finest level covering the start of a range
+
+		Arguments:
+		----------
+			start: UNIX timestamp of the range start
+			resolution: requested bucket seconds
+
+		Returns:
+		----------
+			level: index of the selected level
+
+		"""
+
+		for i, (width, buckets) in enumerate(zip(self.widths, self.buckets)):
+			oldest = (buckets.max() - len(buckets) + 1) * width
+
+			if (width <= resolution) and (resolution % width == 0) and (start >= oldest):
+				return i
+
+		for i in reversed(range(len(self.widths))):
+			if (self.widths[i] <= resolution) and (resolution % self.widths[i] == 0):
+				return i
+
+		exit('The resolution must be a multiple of ' + str(self.widths[0]) + ' seconds')
+
+
+
+
+	def query(self, start: float, end: float, resolution: int = None) -> Tuple[numpy.ndarray, numpy.ndarray]:
+
+		""" Gets the label counts of a time range, downsampled to a resolution
+
+		Arguments:
+		----------
+			start: UNIX timestamp of the range start
+			end: UNIX timestamp of the range end
+			resolution: seconds of each returned bucket (optional, finest by default)
+
+		Returns:
+		----------
+			times: UNIX timestamp where each returned bucket starts
+			counts: weighted label counts of each returned bucket (one column per label)
+
+		"""
+
+		if resolution is None:
+			resolution = self.widths[0]
+
+		level = self.__select_level(start, resolution)
+		width = self.widths[level]
+
+		numbers = numpy.arange(int(start // width), int(end // width) + 1)
+
+		if len(numbers) == 0:
+			return numpy.array([], dtype = numpy.int64), numpy.zeros((0, len(self.labels)))
+
+		with self.lock:
+			buckets = self.buckets[level]
+			slots = numbers % len(buckets)
+			stored = buckets[slots] == numbers
+			counts = numpy.where(stored[:, None], self.counts[level][slots], 0)
+
+		# Consecutive buckets are summed into the requested resolution
+		groups = numbers * width // resolution
+		bounds = numpy.flatnonzero(numpy.diff(groups, prepend = groups[0] - 1))
+
+		return groups[bounds] * resolution, numpy.add.reduceat(counts, bounds, axis = 0)
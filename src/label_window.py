@@ -0,0 +1,110 @@
+# Created by Sinclert Perez (Sinclert@hotmail.com)
+
+
+from collections import Counter
+from threading import Lock
+
+
+
+
+class LabelWindow(object):
+
+	""" Represents a sliding window over the latest predicted labels
+
+	Attributes:
+	----------
+		buffer:
+			type: list
+			info: circular buffer containing the latest predictions
+
+		weights:
+			type: list
+			info: circular buffer containing the latest predictions weights
+
+		index:
+			type: int
+			info: buffer index to the next position to be replaced
+
+		counters
+			type: dict
+			info: label counters (weighted)
+
+		version:
+			type: int
+			info: number of updates of the label counters
+
+		lock:
+			type: threading.Lock
+			info: guards the buffer and counters against concurrent readers
+	"""
+
+
+
+
+	def __init__(self, buffer_size: int):
+
+		""" Creates a label window object
+
+		Arguments:
+		----------
+			buffer_size: size of the label circular buffer
+
+		"""
+
+		self.buffer = [None] * buffer_size
+		self.weights = [0.0] * buffer_size
+		self.index = 0
+		self.counters = Counter()
+		self.version = 0
+		self.lock = Lock()
+
+
+
+
+	def update(self, label: str, weight: float = 1.0):
+
+		""" Replace the self.index position by the specified label
+
+		Arguments:
+		----------
+			label: replaces the one in self.index position
+			weight: number of tweets the label represents (optional)
+
+		"""
+
+		with self.lock:
+			old_label = self.buffer[self.index]
+			old_weight = self.weights[self.index]
+
+			if old_label is not None:
+				self.counters[old_label] -= old_weight
+
+				# Avoids floating point residues of removed labels
+				if self.counters[old_label] < 1e-9:
+					del self.counters[old_label]
+
+			self.buffer[self.index] = label
+			self.weights[self.index] = weight
+			self.index = (self.index + 1) % len(self.buffer)
+			self.counters[label] += weight
+
+			# Replacing a label by itself does not change the distribution
+			if (old_label != label) or (old_weight != weight):
+				self.version += 1
+
+
+
+
+	def snapshot(self) -> tuple:
+
+		""" Gets an atomic copy of the label counters
+
+		Returns:
+		----------
+			version: number of updates of the label counters
+			counters: copy of the label counters
+
+		"""
+
+		with self.lock:
+			return self.version, dict(self.counters)
@@ -1,36 +1,56 @@
 # Created by Sinclert Perez (Sinclert@hotmail.com)
 
 
+import json
+import os
+import time
+
 from argparse import ArgumentParser as Parser
 from argparse import RawDescriptionHelpFormatter
 from collections import Counter
+from functools import partial
 
 from clf_node import NodeClassif
+from clf_node import vectorizers
 from clf_hierarchy import HierarchicalClassif
 
 from figures import FiguresDrawer
+from file_predictor import FilePredictor
+from label_series import LabelSeries
+from label_series import series_levels
+from pipeline_config import read_training_profile
+from prediction_cache import PredictionCache
+from quantized_model import precisions
 
 from twitter_miner import TwitterMiner
 from twitter_stream import TwitterListener
+from tweet_sink import ColumnarSink
 from twitter_keys import USER_KEYS as U_K
 
 from utils import append_text
+from utils import compute_path
 from utils import read_json
 from utils import save_object
+from utils import write_json
 
 
 # Default CLI modes
 modes = (
 	'train_model',
+	'evaluate_models',
 	'search_data',
 	'predict_user',
 	'predict_stream',
+	'plot_series',
+	'predict_file',
 )
 
 
 
 
-def train_model(algorithm: str, feats_pct: int, lang: str, output: str, profile: str):
+def train_model(algorithm: str, feats_pct: int, lang: str, output: str, profile: str,
+				vectorizer: str = 'count', hash_bits: int = 18, stem_table: bool = False,
+				max_features: int = None, budget: int = None, quantize: str = None):
 
 	""" Prepares arguments to train and saves a NodeClassif object
 
@@ -41,30 +61,106 @@ def train_model(algorithm: str, feats_pct: int, lang: str, output: str, profile:
 		lang: language to perform the tokenizer process
 		output: output file name including extension
 		profile: JSON training profile file name
+		vectorizer: name of the vectorizer (optional)
+		hash_bits: bit width of the hashed features space (optional)
+		stem_table: whether to save a stem table with the model (optional)
+		max_features: maximum number of features to keep (optional)
+		budget: maximum total number of training sentences (optional)
+		quantize: precision of the saved model weights (optional)
 
 	"""
 
 	if (feats_pct < 0) or (feats_pct > 100):
 		exit('The specified features percentage is invalid')
 
-	profile_data = read_json(
-		file_name = profile,
-		file_type = 'profile_t'
-	)
+	if (hash_bits < 1) or (hash_bits > 31):
+		exit('The specified hash bit width is invalid')
+
+	if (max_features is not None) and (max_features < 1):
+		exit('The specified maximum number of features is invalid')
+
+	if (budget is not None) and (budget < 1):
+		exit('The specified sentences budget is invalid')
+
+	if (quantize is not None) and (algorithm.lower() == 'random-forest'):
+		exit('Only linear and naive Bayes models can be quantized')
+
+	profile_data, pipeline = read_training_profile(profile)
 
 	node_classif = NodeClassif(
 		algorithm = algorithm.lower(),
 		feats_pct = feats_pct,
 		lang = lang,
+		vectorizer = vectorizer,
+		hash_bits = hash_bits,
+		stem_table = stem_table,
+		max_features = max_features,
+		pipeline = pipeline
 	)
 
-	node_classif.train(profile_data)
+	node_classif.train(profile_data, budget = budget, quantize = quantize)
+
 	save_object(node_classif, output, 'model')
 
 
 
 
-def search_data(query: str, lang: str, depth: int, output: str):
+def evaluate_models(algorithms: list, feats_pcts: list, lang: str, profile: str, cv_folds: int = 10,
+					scoring: str = 'f1_weighted', min_folds: int = None, budget: int = None):
+
+	""" Prepares arguments to validate several algorithms over the same features
+
+	Arguments:
+	----------
+		algorithms: names of the algorithms to validate
+		feats_pcts: percentages of features to keep
+		lang: language to perform the tokenizer process
+		profile: JSON training profile file name
+		cv_folds: number of cross validation folds (optional)
+		scoring: name of the scikit-learn scoring metric (optional)
+		min_folds: folds validated before discarding the worst combinations (optional)
+		budget: maximum total number of sentences (optional)
+
+	"""
+
+	if any((pct < 0) or (pct > 100) for pct in feats_pcts):
+		exit('The specified features percentage is invalid')
+
+	if cv_folds < 2:
+		exit('The specified number of folds is invalid')
+
+	if (min_folds is not None) and ((min_folds < 1) or (min_folds > cv_folds)):
+		exit('The specified minimum number of folds is invalid')
+
+	if (budget is not None) and (budget < 1):
+		exit('The specified sentences budget is invalid')
+
+	profile_data, pipeline = read_training_profile(profile)
+
+	node_classif = NodeClassif(
+		algorithm = algorithms[0].lower(),
+		feats_pct = feats_pcts[0],
+		lang = lang,
+		pipeline = pipeline
+	)
+
+	# Every event is printed as a JSON line as soon as it happens
+	node_classif.evaluate(
+		profile_data = profile_data,
+		algorithms_names = [a.lower() for a in algorithms],
+		feats_pcts = feats_pcts,
+		cv_folds = cv_folds,
+		scoring = scoring,
+		min_folds = min_folds,
+		report = lambda event: print(json.dumps(event), flush = True),
+		budget = budget
+	)
+
+
+
+
+def search_data(query: str, lang: str, depth: int, output: str, resume: bool = False,
+				checkpoint_every: int = 1000):
 
 	""" Prepares arguments to search tweets and save them in a file
 
@@ -74,32 +170,60 @@ def search_data(query: str, lang: str, depth: int, output: str):
 		lang: language abbreviation to filter the tweets
 		depth: number of tweets to retrieve
 		output: output file name including extension
+		resume: continues an interrupted search from its checkpoint (optional)
+		checkpoint_every: number of tweets between checkpoints (optional)
 
 	"""
 
+	checkpoint_name = output + '.checkpoint.json'
+	checkpoint = {
+		'query': query,
+		'lang': lang,
+		'max_id': None,
+		'count': 0,
+		'offset': None
+	}
+
+	if resume:
+		checkpoint = read_json(checkpoint_name, 'cache')
+
+		if (checkpoint['query'] != query) or (checkpoint['lang'] != lang):
+			exit('The checkpoint belongs to a different search')
+
 	miner = TwitterMiner(
 		token_key = U_K['token_key'],
 		token_secret = U_K['token_secret']
 	)
 
-	text_producer = miner.search_tweets(
+	text_producer = miner.search_statuses(
 		query = query,
 		lang = lang,
-		depth = depth
+		depth = depth - checkpoint['count'],
+		max_id = checkpoint['max_id']
 	)
 
-	text_consumer = append_text(output)
-	next(text_consumer)
+	# Any tail written after the checkpoint is truncated
+	text_consumer = append_text(output, offset = checkpoint['offset'])
+	checkpoint['offset'] = next(text_consumer)
+	write_json(checkpoint, checkpoint_name, 'cache')
 
-	for text in text_producer:
+	for tweet_id, text in text_producer:
 		text_consumer.send(text)
 
+		checkpoint['count'] += 1
+		checkpoint['max_id'] = min(tweet_id - 1, checkpoint['max_id'] or tweet_id)
+
+		if checkpoint['count'] % checkpoint_every == 0:
+			checkpoint['offset'] = text_consumer.send(None)
+			write_json(checkpoint, checkpoint_name, 'cache')
+
 	text_consumer.close()
+	os.remove(compute_path(checkpoint_name, 'cache'))
 
 
 
 
-def predict_user(user_id: str, filter_word: str, profile: str):
+def predict_user(user_id: str, filter_word: str, profile: str, export: str = None):
 
 	""" Prepares arguments to predict Twitter account tweets labels
 
@@ -108,26 +232,63 @@ def predict_user(user_id: str, filter_word: str, profile: str):
 		user_id: Twitter user account without the '@'
 		filter_word: word applied to filter all tweets sentences
 		profile: JSON profile file name
+		export: columnar export folder name (optional)
 
 	"""
 
 	h_clf = HierarchicalClassif(profile)
+	cache = PredictionCache()
 
 	miner = TwitterMiner(
 		token_key = U_K['token_key'],
 		token_secret = U_K['token_secret']
 	)
 
-	tweets = miner.get_user_tweets(
+	# Only the tweets newer than the cached ones are retrieved
+	statuses = miner.get_user_statuses(
 		user = user_id,
-		word = filter_word.lower()
+		since_id = cache.get_since_id(user_id)
 	)
 
-	results = Counter()
+	cache.add_tweets(user_id, statuses)
+
+	tweets = cache.get_tweets(user_id)
+	tweets = [t for t in tweets if filter_word.lower() in t[1]]
+
+	# Cached predictions are invalidated when the profile models change
+	fingerprint = h_clf.fingerprint()
+	cache.set_fingerprint(profile, fingerprint)
+
+	labels = cache.get_labels([t[0] for t in tweets], fingerprint)
+	missing = [t for t in tweets if t[0] not in labels]
+
+	predicted, nodes = h_clf.predict_batch_nodes(
+		[t[1] for t in missing],
+		[t[3] for t in missing]
+	)
+	predicted = list(zip([t[0] for t in missing], predicted, nodes))
+
+	cache.add_labels(fingerprint, predicted)
+	cache.close()
+
+	labels.update((i, (label, n)) for i, label, n in predicted)
+	results = Counter(label for label, _ in labels.values() if label is not None)
 
-	for tweet in tweets:
-		label = h_clf.predict(tweet)
-		if label is not None: results[label] += 1
+	if export is not None:
+		sink = ColumnarSink(export, h_clf.get_nodes())
+
+		for tweet_id, text, timestamp, lang in tweets:
+			label, nodes = labels[tweet_id]
+			sink.write(dict(
+				nodes,
+				id = tweet_id,
+				timestamp = timestamp,
+				lang = lang,
+				text = text,
+				weight = 1.0
+			))
+
+		sink.close()
 
 	FiguresDrawer.draw_pie(
 		counter = results,
@@ -139,7 +300,8 @@ def predict_user(user_id: str, filter_word: str, profile: str):
 
 
 
-def predict_stream(buffer_size: int, tracks: str, langs: str, coords: list, profile: str):
+def predict_stream(buffer_size: int, tracks: str, langs: str, coords: list, profiles: list,
+				   group_by: str = None, headless: str = None, export: str = None, series: str = None):
 
 	""" Prepares arguments to predict Twitter stream tweets labels
 
@@ -155,37 +317,161 @@ def predict_stream(buffer_size: int, tracks: str, langs: str, coords: list, prof
 			3. North-East longitude
 			4. North-East latitude
 
-		profile: JSON profile file name
+		profiles: JSON profile file names (all evaluated over the same stream)
+		group_by: keeps a window per 'track' or per 'lang' (optional)
+		headless: snapshots output name, instead of the live graph (optional)
+		export: columnar export folder name (optional)
+		series: time series name, stored per profile (optional)
 
 	"""
 
-	h_clf = HierarchicalClassif(profile)
+	tracks = tracks.split(', ')
+	langs = langs.split(', ')
+	groups = {None: None, 'track': tracks, 'lang': langs}[group_by]
 
 	listener = TwitterListener(
 		token_key = U_K['token_key'],
-		token_secret = U_K['token_secret'],
-		buffer_size = buffer_size,
-		clf = h_clf
+		token_secret = U_K['token_secret']
 	)
 
+	panels = []
+
+	for profile in profiles:
+		h_clf = HierarchicalClassif(profile)
+
+		for node, timing in h_clf.timings.items():
+			print(profile, node, 'loaded in', round(timing['load'], 3), 's,',
+				  'warmed up in', round(timing['warm_up'], 3), 's')
+
+		listener.add_classifier(
+			name = profile,
+			clf = h_clf,
+			buffer_size = buffer_size,
+			group_by = group_by,
+			groups = groups
+		)
+
+		if series is not None:
+			listener.add_series(
+				name = profile,
+				series = LabelSeries(series_name(series, profile), h_clf.get_labels())
+			)
+
+		for group in (groups or [None]):
+			panels.append({
+				'snapshot': partial(listener.snapshot, profile, group),
+				'labels': h_clf.get_labels(),
+				'colors': h_clf.get_colors(),
+				'title': profile + ' on ' + str(group or tracks)
+			})
+
+	if export is not None:
+		listener.set_sink(ColumnarSink(export, listener.get_label_columns()))
+
 	# Start the stream
-	tracks = tracks.split(', ')
-	langs = langs.split(', ')
 	listener.start_stream(tracks, langs, coords)
 
-	FiguresDrawer.animate_pie(
-		counter = listener.counters,
-		labels = h_clf.get_labels(),
-		colors = h_clf.get_colors(),
-		title = 'Stream on ' + str(tracks)
-	)
+	if headless is None:
+		FiguresDrawer.animate_pies(panels, listener.get_status)
+	else:
+		FiguresDrawer.snapshot_pies(panels, headless, listener.get_status)
 
-	# Finish the stream when the graph is closed
+	# Finish the stream when the graph is closed (or interrupted)
 	listener.finish_stream()
 
 
 
 
+def series_name(series: str, profile: str) -> str:
+
+	""" Builds the time series file name of a predicting profile
+
+	Arguments:
+	----------
+		series: time series name
+		profile: JSON profile file name
+
+	Returns:
+	----------
+		file_name: series file name (without extension)
+
+	"""
+
+	return series + '.' + os.path.splitext(profile)[0]
+
+
+
+
+def plot_series(series: str, profile: str, resolution: str, since: float):
+
+	""" Plots the label trends of a stored stream time series
+
+	Arguments:
+	----------
+		series: time series name
+		profile: JSON profile file name the series was stored with
+		resolution: bucket size name (minute, hour or day)
+		since: hours before now where the plot starts
+
+	"""
+
+	colors = read_json(
+		file_name = profile,
+		file_type = 'profile_p'
+	)['colors']
+
+	if not os.path.exists(compute_path(series_name(series, profile) + '.npz', 'series')):
+		exit('The specified time series does not exist')
+
+	labels = list(colors.keys())
+	label_series = LabelSeries(series_name(series, profile), labels)
+
+	end = time.time()
+	start = end - since * 3600
+
+	times, counts = label_series.query(
+		start = start,
+		end = end,
+		resolution = {name: width for name, width, _ in series_levels}[resolution]
+	)
+
+	FiguresDrawer.draw_trend(
+		times = times,
+		counts = counts,
+		labels = labels,
+		colors = list(colors.values()),
+		title = profile + ' per ' + resolution,
+		gaps = label_series.get_gaps(start, end)
+	)
+
+
+
+
+def predict_file(profile: str, input_name: str, output: str, batch_size: int = 1000, workers: int = 1,
+				 scores: bool = False):
+
+	""" Classifies every line of a large dataset file into an export file
+
+	Arguments:
+	----------
+		profile: JSON profile file name
+		input_name: dataset file name (plain text or JSONL, one tweet per line)
+		output: export file name
+		batch_size: number of lines classified at once (optional)
+		workers: number of classifying processes (optional)
+		scores: whether the path probabilities are written (optional)
+
+	"""
+
+	predictor = FilePredictor(profile, batch_size, workers, scores)
+	lines, seconds = predictor.predict(input_name, output)
+
+	print(lines, 'lines classified in', round(seconds, 2), 'seconds',
+		  '(' + str(round(lines / max(seconds, 1e-9))) + ' lines/s)')
+
+
+
+
 if __name__ == '__main__':
 
 	global_parser = Parser(
@@ -199,24 +485,61 @@ if __name__ == '__main__':
 			'			-l <language>\n'
 			'			-o <output name>\n'
 			'			-p <training profile name>\n'
+			'			--vectorizer <vectorizer name> (optional)\n'
+			'			--hash-bits <hashed features bit width> (optional)\n'
+			'			--stem-table (optional)\n'
+			'			--max-features <maximum features> (optional)\n'
+			'			--budget <maximum training sentences> (optional)\n'
+			'			--quantize <weights precision> (optional)\n'
+			'  \n'
+			'  evaluate_models: validates several ML algorithms over the same features\n'
+			'			-a <algorithm names>\n'
+			'			-f <features percentages>\n'
+			'			-l <language>\n'
+			'			-p <training profile name>\n'
+			'			--folds <number of folds> (optional)\n'
+			'			--metric <scoring metric> (optional)\n'
+			'			--min-folds <folds before discarding> (optional)\n'
+			'			--budget <maximum sentences> (optional)\n'
 			'  \n'
 			'  search_data: stores query tweets into a new dataset\n'
 			'			-q <search query>\n'
 			'			-l <language code>\n'
 			'			-d <search depth>\n'
 			'			-o <output name>\n'
+			'			-k <tweets between checkpoints> (optional)\n'
+			'			--resume (optional)\n'
 			'  \n'
 			'  predict_user: analyses tweets of a Twitter account\n'
 			'			-u <Twitter user>\n'
 			'			-w <filter word>\n'
 			'			-p <predicting profile name>\n'
+			'			--export <export name> (optional)\n'
 			'  \n'
 			'  predict_stream: analyses tweets of a Twitter stream\n'
 			'			-s <buffer size>\n'
 			'			-t <filter tracks>\n'
 			'			-l <language codes>\n'
 			'			-c <coord 1> <coord 2> <coord 3> <coord 4>\n'
-			'			-p <predicting profile name>\n',
+			'			-p <predicting profile names>\n'
+			'			-g <windows grouping: track or lang> (optional)\n'
+			'			--headless <snapshots name> (optional)\n'
+			'			--export <export name> (optional)\n'
+			'			--series <time series name> (optional)\n'
+			'  \n'
+			'  plot_series: plots the label trends of a stream time series\n'
+			'			-n <time series name>\n'
+			'			-p <predicting profile name>\n'
+			'			-r <resolution: minute, hour or day> (optional)\n'
+			'			--since <hours> (optional)\n'
+			'  \n'
+			'  predict_file: classifies a large file of tweets (one per line)\n'
+			'			-p <predicting profile name>\n'
+			'			-i <input dataset name>\n'
+			'			-o <output export name>\n'
+			'			-b <lines per batch> (optional)\n'
+			'			-w <number of workers> (optional)\n'
+			'			--scores (optional)\n',
 		formatter_class = RawDescriptionHelpFormatter
 	)
 
@@ -233,9 +556,33 @@ if __name__ == '__main__':
 		parser.add_argument('-l', required = True)
 		parser.add_argument('-o', required = True)
 		parser.add_argument('-p', required = True)
+		parser.add_argument('--vectorizer', default = 'count', choices = vectorizers)
+		parser.add_argument('--hash-bits', default = 18, type = int)
+		parser.add_argument('--stem-table', action = 'store_true')
+		parser.add_argument('--max-features', default = None, type = int)
+		parser.add_argument('--budget', default = None, type = int)
+		parser.add_argument('--quantize', default = None, choices = precisions)
+
+		args = parser.parse_args(func_args)
+		train_model(args.a, args.f, args.l, args.o, args.p, args.vectorizer, args.hash_bits, args.stem_table,
+					args.max_features, args.budget, args.quantize)
+
+
+	elif arg.mode == 'evaluate_models':
+
+		parser = Parser(usage = "Use 'main.py -h' for help")
+		parser.add_argument('-a', required = True, nargs = '+')
+		parser.add_argument('-f', required = True, type = int, nargs = '+')
+		parser.add_argument('-l', required = True)
+		parser.add_argument('-p', required = True)
+
+		parser.add_argument('--folds', default = 10, type = int)
+		parser.add_argument('--metric', default = 'f1_weighted')
+		parser.add_argument('--min-folds', default = None, type = int)
+		parser.add_argument('--budget', default = None, type = int)
 
 		args = parser.parse_args(func_args)
-		train_model(args.a, args.f, args.l, args.o, args.p)
+		evaluate_models(args.a, args.f, args.l, args.p, args.folds, args.metric, args.min_folds, args.budget)
 
 
 	elif arg.mode == 'search_data':
@@ -245,9 +592,11 @@ if __name__ == '__main__':
 		parser.add_argument('-l', required = True)
 		parser.add_argument('-d', required = True, type = int)
 		parser.add_argument('-o', required = True)
+		parser.add_argument('-k', default = 1000, type = int)
+		parser.add_argument('--resume', action = 'store_true')
 
 		args = parser.parse_args(func_args)
-		search_data(args.q, args.l, args.d, args.o)
+		search_data(args.q, args.l, args.d, args.o, args.resume, args.k)
 
 
 	elif arg.mode == 'predict_user':
@@ -256,9 +605,10 @@ if __name__ == '__main__':
 		parser.add_argument('-u', required = True)
 		parser.add_argument('-w', required = True)
 		parser.add_argument('-p', required = True)
+		parser.add_argument('--export', default = None)
 
 		args = parser.parse_args(func_args)
-		predict_user(args.u, args.w, args.p)
+		predict_user(args.u, args.w, args.p, args.export)
 
 
 	elif arg.mode == 'predict_stream':
@@ -268,7 +618,37 @@ if __name__ == '__main__':
 		parser.add_argument('-t', required = True)
 		parser.add_argument('-l', required = True)
 		parser.add_argument('-c', required = True, type = float, nargs = '+')
+		parser.add_argument('-p', required = True, nargs = '+')
+		parser.add_argument('-g', default = None, choices = TwitterListener.group_criteria)
+		parser.add_argument('--headless', default = None)
+		parser.add_argument('--export', default = None)
+		parser.add_argument('--series', default = None)
+
+		args = parser.parse_args(func_args)
+		predict_stream(args.s, args.t, args.l, args.c, args.p, args.g, args.headless, args.export, args.series)
+
+
+	elif arg.mode == 'plot_series':
+
+		parser = Parser(usage = "Use 'main.py -h' for help")
+		parser.add_argument('-n', required = True)
 		parser.add_argument('-p', required = True)
+		parser.add_argument('-r', default = 'hour', choices = [name for name, _, _ in series_levels])
+		parser.add_argument('--since', default = 24, type = float)
+
+		args = parser.parse_args(func_args)
+		plot_series(args.n, args.p, args.r, args.since)
+
+
+	elif arg.mode == 'predict_file':
+
+		parser = Parser(usage = "Use 'main.py -h' for help")
+		parser.add_argument('-p', required = True)
+		parser.add_argument('-i', required = True)
+		parser.add_argument('-o', required = True)
+		parser.add_argument('-b', default = 1000, type = int)
+		parser.add_argument('-w', default = 1, type = int)
+		parser.add_argument('--scores', action = 'store_true')
 
 		args = parser.parse_args(func_args)
-		predict_stream(args.s, args.t, args.l, args.c, args.p)
+		predict_file(args.p, args.i, args.o, args.b, args.w, args.scores)
@@ -0,0 +1,106 @@
+# Created by Sinclert Perez (Sinclert@hotmail.com)
+
+
+import os
+
+from threading import Lock
+
+from clf_node import NodeClassif
+from utils import compute_path
+
+
+# Process-wide loaded models (one entry per model file version)
+registry = {}
+registry_lock = Lock()
+
+
+
+
+def acquire_model(file_name: str) -> NodeClassif:
+
+	""" Gets the shared model of a file, loading it the first time
+
+	Models are identified by their file path and modification time, so a
+	retrained model is loaded again instead of serving the stale one. The
+	same model is only loaded once, even when requested concurrently.
+
+	Arguments:
+	----------
+		file_name: saved model file name
+
+	Returns:
+	----------
+		model: NodeClassif object shared by the whole process
+
+	"""
+
+	file_path = compute_path(file_name, 'model')
+
+	try:
+		key = (file_path, os.stat(file_path).st_mtime_ns)
+	except OSError:
+		key = (file_path, None)
+
+	with registry_lock:
+		if key not in registry:
+			registry[key] = {'model': None, 'refs': 0, 'lock': Lock()}
+
+		entry = registry[key]
+		entry['refs'] += 1
+
+	# Only the threads requesting the same model wait for each other
+	with entry['lock']:
+		try:
+			if entry['model'] is None:
+				entry['model'] = NodeClassif(file_name)
+
+			return entry['model']
+
+		# Failed loads (including exits due to invalid files) do not keep their reference
+		except BaseException:
+			with registry_lock:
+				entry['refs'] -= 1
+
+				if (entry['refs'] <= 0) and (registry.get(key) is entry):
+					del registry[key]
+
+			raise
+
+
+
+
+def release_model(model: NodeClassif):
+
+	""" Releases a shared model, evicting it when it is no longer used
+
+	Arguments:
+	----------
+		model: NodeClassif object obtained from 'acquire_model'
+
+	"""
+
+	with registry_lock:
+		for key, entry in registry.items():
+			if entry['model'] is model:
+				entry['refs'] -= 1
+
+				if entry['refs'] <= 0:
+					del registry[key]
+
+				return
+
+
+
+
+def release_models(models: list):
+
+	""" Releases several shared models
+
+	Arguments:
+	----------
+		models: NodeClassif objects obtained from 'acquire_model'
+
+	"""
+
+	for model in models:
+		release_model(model)
@@ -0,0 +1,106 @@
+# Created by Sinclert Perez (Sinclert@hotmail.com)
+
+
+import copy
+
+from typing import Tuple
+
+from utils import read_json
+
+
+# Settings of every pipeline stage, used when not specified by the training profile
+default_pipeline = {
+	'tokenizer': {
+		'reduce_len': True,
+		'strip_handles': True
+	},
+	'vectorizer': {
+		'ngram_range': [1, 2]
+	},
+	'selector': {
+		'score': 'chi2'
+	}
+}
+
+
+# Supported selector scores
+selector_scores = ('chi2',)
+
+
+
+
+def resolve_pipeline(pipeline: dict = None) -> dict:
+
+	""" Completes and validates the pipeline settings of a training profile
+
+	Arguments:
+	----------
+		pipeline: settings of some pipeline stages (optional)
+
+	Returns:
+	----------
+		pipeline: settings of every pipeline stage
+
+	"""
+
+	resolved = copy.deepcopy(default_pipeline)
+
+	for stage, settings in (pipeline or {}).items():
+		if (stage not in resolved) or (not isinstance(settings, dict)):
+			exit('Invalid pipeline stage: ' + str(stage))
+
+		for name, value in settings.items():
+			if name not in resolved[stage]:
+				exit('Invalid pipeline setting: ' + stage + '.' + str(name))
+
+			resolved[stage][name] = value
+
+	for name in ('reduce_len', 'strip_handles'):
+		if not isinstance(resolved['tokenizer'][name], bool):
+			exit('The tokenizer setting ' + name + ' must be a boolean')
+
+	ngram_range = resolved['vectorizer']['ngram_range']
+
+	if not (
+		isinstance(ngram_range, list) and (len(ngram_range) == 2)
+		and all(isinstance(n, int) for n in ngram_range)
+		and (1 <= ngram_range[0] <= ngram_range[1])
+	):
+		exit('The vectorizer n-gram range must be two increasing positive integers')
+
+	if resolved['selector']['score'] not in selector_scores:
+		exit('Invalid selector score: ' + str(resolved['selector']['score']))
+
+	return resolved
+
+
+
+
+def read_training_profile(file_name: str) -> Tuple[list, dict]:
+
+	""" Reads the datasets and the pipeline settings of a training profile
+
+	Profiles are either a list of datasets, or a dictionary containing the
+	'datasets' list and optionally the 'pipeline' settings.
+
+	Arguments:
+	----------
+		file_name: JSON training profile file name
+
+	Returns:
+	----------
+		datasets: dictionaries containing datasets paths and labels
+		pipeline: settings of every pipeline stage
+
+	"""
+
+	profile = read_json(file_name, 'profile_t')
+
+	if isinstance(profile, list):
+		return profile, resolve_pipeline()
+
+	try:
+		return profile['datasets'], resolve_pipeline(profile.get('pipeline'))
+
+	except (KeyError, TypeError, AttributeError):
+		exit('The training profile ' + file_name + ' does not have the correct format')
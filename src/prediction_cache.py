@@ -0,0 +1,248 @@
+# Created by Sinclert Perez (Sinclert@hotmail.com)
+
+
+import json
+import os
+import sqlite3
+
+from typing import Union
+
+from utils import compute_path
+
+
+# Database schema (created if it does not exist)
+cache_schema = (
+	'CREATE TABLE IF NOT EXISTS tweets ('
+	'	user TEXT NOT NULL,'
+	'	tweet_id INTEGER NOT NULL,'
+	'	text TEXT NOT NULL,'
+	'	created_at REAL,'
+	'	lang TEXT,'
+	'	PRIMARY KEY (user, tweet_id))',
+
+	'CREATE TABLE IF NOT EXISTS predictions ('
+	'	tweet_id INTEGER NOT NULL,'
+	'	fingerprint TEXT NOT NULL,'
+	'	label TEXT,'
+	'	nodes TEXT NOT NULL,'
+	'	PRIMARY KEY (tweet_id, fingerprint))',
+
+	'CREATE TABLE IF NOT EXISTS profiles ('
+	'	profile TEXT PRIMARY KEY,'
+	'	fingerprint TEXT NOT NULL)',
+)
+
+
+
+
+class PredictionCache(object):
+
+	""" Represents a persistent cache of cleaned tweets and their predictions
+
+	Attributes:
+	----------
+		conn:
+			type: sqlite3.Connection
+			info: connection to the cache database
+	"""
+
+
+
+
+	def __init__(self, file_name: str = 'predictions.sqlite'):
+
+		""" Opens (or creates) the cache database
+
+		Arguments:
+		----------
+			file_name: database file name (optional)
+
+		"""
+
+		file_path = compute_path(file_name, 'cache')
+		os.makedirs(os.path.dirname(file_path), exist_ok = True)
+
+		try:
+			self.conn = sqlite3.connect(file_path)
+
+			with self.conn:
+				for statement in cache_schema:
+					self.conn.execute(statement)
+
+		except sqlite3.Error:
+			exit('The prediction cache could not be opened in ' + file_path)
+
+
+
+
+	def close(self):
+
+		""" Closes the cache database """
+
+		self.conn.close()
+
+
+
+
+	def get_since_id(self, user: str) -> Union[int, None]:
+
+		""" Gets the most recent cached tweet ID of a user
+
+		Arguments:
+		----------
+			user: Twitter user account without the '@'
+
+		Returns:
+		----------
+			since_id: most recent tweet ID (None if there are no tweets)
+
+		"""
+
+		row = self.conn.execute(
+			'SELECT MAX(tweet_id) FROM tweets WHERE user = ?',
+			(user,)
+		)
+
+		return row.fetchone()[0]
+
+
+
+
+	def add_tweets(self, user: str, tweets: iter):
+
+		""" Stores the cleaned text of the specified user tweets
+
+		Arguments:
+		----------
+			user: Twitter user account without the '@'
+			tweets: iterable of (tweet ID, cleaned text, timestamp, language) tuples
+
+		"""
+
+		with self.conn:
+			self.conn.executemany(
+				'INSERT OR REPLACE INTO tweets VALUES (?, ?, ?, ?, ?)',
+				((user,) + tuple(tweet) for tweet in tweets)
+			)
+
+
+
+
+	def get_tweets(self, user: str, depth: int = 1000) -> list:
+
+		""" Gets the most recent cached tweets of a user
+
+		Arguments:
+		----------
+			user: Twitter user account without the '@'
+			depth: number of tweets to retrieve (optional)
+
+		Returns:
+		----------
+			tweets: list of (tweet ID, cleaned text, timestamp, language) tuples
+
+		"""
+
+		rows = self.conn.execute(
+			'SELECT tweet_id, text, created_at, lang FROM tweets WHERE user = ? '
+			'ORDER BY tweet_id DESC LIMIT ?',
+			(user, depth)
+		)
+
+		return rows.fetchall()
+
+
+
+
+	def set_fingerprint(self, profile: str, fingerprint: str):
+
+		""" Invalidates the predictions of a profile if its models changed
+
+		Arguments:
+		----------
+			profile: JSON predicting profile file name
+			fingerprint: digest of the profile models
+
+		"""
+
+		row = self.conn.execute(
+			'SELECT fingerprint FROM profiles WHERE profile = ?',
+			(profile,)
+		)
+
+		row = row.fetchone()
+
+		if (row is not None) and (row[0] == fingerprint):
+			return
+
+		with self.conn:
+			if row is not None:
+				self.conn.execute(
+					'DELETE FROM predictions WHERE fingerprint = ?',
+					(row[0],)
+				)
+
+			self.conn.execute(
+				'INSERT OR REPLACE INTO profiles VALUES (?, ?)',
+				(profile, fingerprint)
+			)
+
+
+
+
+	def get_labels(self, tweet_ids: list, fingerprint: str) -> dict:
+
+		""" Gets the cached predicted labels of the specified tweets
+
+		Arguments:
+		----------
+			tweet_ids: IDs of the tweets
+			fingerprint: digest of the models that predicted the labels
+
+		Returns:
+		----------
+			labels: dictionary with the (label, node labels) tuple (value) of each cached ID (key)
+
+		"""
+
+		labels = {}
+		tweet_ids = list(tweet_ids)
+
+		# SQLite limits the number of variables of a statement
+		for i in range(0, len(tweet_ids), 500):
+			chunk = tweet_ids[i:i+500]
+
+			rows = self.conn.execute(
+				'SELECT tweet_id, label, nodes FROM predictions '
+				'WHERE fingerprint = ? AND tweet_id IN (' +
+				', '.join('?' * len(chunk)) + ')',
+				[fingerprint] + chunk
+			)
+
+			for tweet_id, label, nodes in rows:
+				labels[tweet_id] = (label, json.loads(nodes))
+
+		return labels
+
+
+
+
+	def add_labels(self, fingerprint: str, labels: iter):
+
+		""" Stores the predicted labels of the specified tweets
+
+		Arguments:
+		----------
+			fingerprint: digest of the models that predicted the labels
+			labels: iterable of (tweet ID, label, node labels) tuples
+
+		"""
+
+		with self.conn:
+			self.conn.executemany(
+				'INSERT OR REPLACE INTO predictions VALUES (?, ?, ?, ?)',
+				(
+					(tweet_id, fingerprint, label, json.dumps(nodes))
+					for tweet_id, label, nodes in labels
+				)
+			)
@@ -0,0 +1,225 @@
+# Created by Sinclert Perez (Sinclert@hotmail.com)
+
+
+import numpy
+
+from scipy.sparse import csr_matrix
+from sklearn.linear_model import LogisticRegression
+from sklearn.naive_bayes import MultinomialNB
+from sklearn.svm import LinearSVC
+
+
+# Supported weights precisions
+precisions = ('float32', 'int8')
+
+
+
+
+class QuantizedModel(object):
+
+	""" Represents a trained linear or naive Bayes model with quantized weights
+
+	Every class score is a linear function of the features, so only the
+	weights matrix and the intercepts are kept. In 'int8' precision each
+	class row is mapped into 256 levels between its own minimum and maximum
+	weights: the scores are rescaled by a per class scale, plus a per class
+	offset times the number of features of each row.
+
+	Attributes:
+	----------
+		classes_:
+			type: numpy.ndarray
+			info: labels of the model, in its scores order
+
+		kind:
+			type: string
+			info: original model family ('logistic', 'svm' or 'bayes')
+
+		precision:
+			type: string
+			info: weights precision ('float32' or 'int8')
+
+		weights:
+			type: numpy.ndarray
+			info: quantized weight of each feature (columns) for each score (rows)
+
+		scales:
+			type: numpy.ndarray
+			info: weights step of each score row (None if 'float32')
+
+		offsets:
+			type: numpy.ndarray
+			info: weight represented by the level zero of each score row (None if 'float32')
+
+		intercepts:
+			type: numpy.ndarray
+			info: intercept of each score row
+	"""
+
+
+
+
+	def __init__(self, model, precision: str):
+
+		""" Quantizes the weights of a trained model
+
+		Arguments:
+		----------
+			model: trained LogisticRegression, LinearSVC or MultinomialNB object
+			precision: weights precision ('float32' or 'int8')
+
+		"""
+
+		if precision not in precisions:
+			exit('Invalid quantization precision')
+
+		if isinstance(model, MultinomialNB):
+			self.kind = 'bayes'
+			weights, intercepts = model.feature_log_prob_, model.class_log_prior_
+		elif isinstance(model, LogisticRegression):
+			self.kind = 'logistic'
+			weights, intercepts = model.coef_, model.intercept_
+		elif isinstance(model, LinearSVC):
+			self.kind = 'svm'
+			weights, intercepts = model.coef_, model.intercept_
+		else:
+			exit('Only linear and naive Bayes models can be quantized')
+
+		self.classes_ = model.classes_
+		self.precision = precision
+		self.intercepts = numpy.array(intercepts, dtype = numpy.float64)
+
+		if precision == 'float32':
+			self.weights = weights.astype(numpy.float32)
+			self.scales = None
+			self.offsets = None
+
+		else:
+			low = weights.min(axis = 1)
+			high = weights.max(axis = 1)
+
+			# Constant rows are kept exact (any step works)
+			self.scales = numpy.where(high > low, (high - low) / 255, 1.0)
+			self.offsets = low + 128 * self.scales
+
+			levels = numpy.rint((weights - self.offsets[:, None]) / self.scales[:, None])
+			self.weights = numpy.clip(levels, -128, 127).astype(numpy.int8)
+
+
+
+
+	def nbytes(self) -> int:
+
+		""" Computes the memory used by the model arrays
+
+		Returns:
+		----------
+			bytes: total bytes of the weights, scales, offsets and intercepts
+
+		"""
+
+		arrays = (self.weights, self.scales, self.offsets, self.intercepts)
+		return sum(a.nbytes for a in arrays if a is not None)
+
+
+
+
+	def decision_function(self, feats: csr_matrix) -> numpy.ndarray:
+
+		""" Computes the score of each class (or of the positive class if binary)
+
+		Arguments:
+		----------
+			feats: sparse selected features matrix
+
+		Returns:
+		----------
+			scores: class scores of each row (a single column if binary)
+
+		"""
+
+		feats = csr_matrix(feats)
+		scores = numpy.asarray(feats @ self.weights.T, dtype = numpy.float64)
+
+		if self.precision == 'int8':
+			scores *= self.scales
+			scores += numpy.asarray(feats.sum(axis = 1), dtype = numpy.float64) * self.offsets
+
+		scores += self.intercepts
+
+		# Binary linear models only score the positive class
+		if scores.shape[1] == 1:
+			return scores.ravel()
+
+		return scores
+
+
+
+
+	def predict(self, feats: csr_matrix) -> numpy.ndarray:
+
+		""" Predicts the labels of the given features rows
+
+		Arguments:
+		----------
+			feats: sparse selected features matrix
+
+		Returns:
+		----------
+			labels: predicted label of each row
+
+		"""
+
+		scores = self.decision_function(feats)
+
+		if scores.ndim == 1:
+			return self.classes_[(scores > 0).astype(int)]
+
+		return self.classes_[scores.argmax(axis = 1)]
+
+
+
+
+	@property
+	def predict_proba(self):
+
+		""" Gets the probabilities function (only for probabilistic models)
+
+		Returns:
+		----------
+			function: computes the class probabilities of the given features rows
+
+		"""
+
+		if self.kind == 'svm':
+			raise AttributeError('Linear SVC models do not estimate probabilities')
+
+		return self.__predict_proba
+
+
+
+
+	def __predict_proba(self, feats: csr_matrix) -> numpy.ndarray:
+
+		""" Computes the class probabilities of the given features rows
+
+		Arguments:
+		----------
+			feats: sparse selected features matrix
+
+		Returns:
+		----------
+			probas: class probabilities of each row
+
+		"""
+
+		scores = self.decision_function(feats)
+
+		if scores.ndim == 1:
+			positive = 1 / (1 + numpy.exp(-scores))
+			return numpy.column_stack((1 - positive, positive))
+
+		scores -= scores.max(axis = 1, keepdims = True)
+		numpy.exp(scores, out = scores)
+
+		return scores / scores.sum(axis = 1, keepdims = True)
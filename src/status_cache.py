@@ -0,0 +1,162 @@
+# Created by Sinclert Perez (Sinclert@hotmail.com)
+
+
+import time
+
+from collections import OrderedDict
+from threading import Lock
+
+
+
+
+class StatusCache(object):
+
+	""" Represents a bounded in-memory cache of classified stream statuses
+
+	Retweets carry the text of the status they retweet, so they are keyed
+	by the original status ID and reuse its cleaned text and labels. The
+	entries are kept in least recently used order: the ones unused for
+	longer than the time to live, and the oldest ones when the cache is
+	full, are evicted.
+
+	Attributes:
+	----------
+		entries:
+			type: collections.OrderedDict
+			info: (last use timestamp, value) of each cached key
+
+		max_size:
+			type: int
+			info: maximum number of cached statuses
+
+		ttl:
+			type: float
+			info: seconds an unused status is kept
+
+		hits:
+			type: int
+			info: number of lookups answered by the cache
+
+		misses:
+			type: int
+			info: number of lookups not found in the cache
+
+		lock:
+			type: threading.Lock
+			info: guards the entries against concurrent lookups
+	"""
+
+
+
+
+	def __init__(self, max_size: int = 100000, ttl: float = 3600):
+
+		""" Creates an empty status cache
+
+		Arguments:
+		----------
+			max_size: maximum number of cached statuses (optional)
+			ttl: seconds an unused status is kept (optional)
+
+		"""
+
+		if (max_size < 1) or (ttl <= 0):
+			exit('The status cache size and time to live must be positive')
+
+		self.entries = OrderedDict()
+		self.max_size = max_size
+		self.ttl = ttl
+		self.hits = 0
+		self.misses = 0
+		self.lock = Lock()
+
+
+
+
+	def __expire(self, now: float):
+
+		""" Evicts the entries unused for longer than the time to live
+
+		Arguments:
+		----------
+			now: current timestamp
+
+		"""
+
+		while self.entries:
+			key, (used, _) = next(iter(self.entries.items()))
+
+			if now - used <= self.ttl:
+				break
+
+			del self.entries[key]
+
+
+
+
+	def get(self, key):
+
+		""" Gets the cached value of a status, refreshing its last use
+
+		Arguments:
+		----------
+			key: status key
+
+		Returns:
+		----------
+			value: cached value (None if not cached or expired)
+
+		"""
+
+		now = time.time()
+
+		with self.lock:
+			self.__expire(now)
+			entry = self.entries.get(key)
+
+			if entry is None:
+				self.misses += 1
+				return None
+
+			self.entries[key] = (now, entry[1])
+			self.entries.move_to_end(key)
+			self.hits += 1
+
+			return entry[1]
+
+
+
+
+	def put(self, key, value):
+
+		""" Caches the value of a status, evicting the oldest one if full
+
+		Arguments:
+		----------
+			key: status key
+			value: value to cache
+
+		"""
+
+		with self.lock:
+			self.entries[key] = (time.time(), value)
+			self.entries.move_to_end(key)
+
+			if len(self.entries) > self.max_size:
+				self.entries.popitem(last = False)
+
+
+
+
+	def get_hit_rate(self) -> float:
+
+		""" Computes the fraction of lookups answered by the cache
+
+		Returns:
+		----------
+			rate: hits over lookups (0 if there were none)
+
+		"""
+
+		lookups = self.hits + self.misses
+		return self.hits / lookups if lookups > 0 else 0.0
@@ -0,0 +1,208 @@
+# Created by Sinclert Perez (Sinclert@hotmail.com)
+
+
+import random
+import time
+
+from threading import Lock
+from typing import Union
+
+
+
+
+class AdaptiveSampler(object):
+
+	""" Represents an adaptive uniform sampler in front of the classification
+
+	The arrival rate and the classification throughput are estimated using
+	exponentially weighted moving averages. When the arrivals exceed the
+	classification capacity, every tweet is independently accepted with
+	probability equal to the sampling rate, and weighted by its inverse so
+	that the label counters keep estimating the real totals.
+
+	When the classification queue overflows, the sampling rate is halved and
+	kept below that ceiling until the queue is drained again.
+
+	Attributes:
+	----------
+		rate:
+			type: float
+			info: current sampling rate (between 'min_rate' and 1)
+
+		ceiling:
+			type: float
+			info: highest sampling rate allowed since the last overflow
+
+		min_rate:
+			type: float
+			info: lowest allowed sampling rate
+
+		headroom:
+			type: float
+			info: fraction of the classification capacity to use
+
+		smoothing:
+			type: float
+			info: weight of the newest measurement in the moving averages
+
+		arrival_time:
+			type: float
+			info: average seconds between arrivals
+
+		service_time:
+			type: float
+			info: average seconds to classify a tweet
+
+		last_arrival:
+			type: float
+			info: timestamp of the previous arrival
+
+		dropped:
+			type: int
+			info: number of sampled tweets discarded because the queue was full
+
+		lock:
+			type: threading.Lock
+			info: guards the estimations against the classification thread
+	"""
+
+
+
+
+	def __init__(self, min_rate: float = 0.01, headroom: float = 0.8, smoothing: float = 0.05):
+
+		""" Creates an adaptive sampler object
+
+		Arguments:
+		----------
+			min_rate: lowest allowed sampling rate (optional)
+			headroom: fraction of the classification capacity to use (optional)
+			smoothing: weight of the newest measurement (optional)
+
+		"""
+
+		self.rate = 1.0
+		self.ceiling = 1.0
+		self.min_rate = min_rate
+		self.headroom = headroom
+		self.smoothing = smoothing
+		self.arrival_time = None
+		self.service_time = None
+		self.last_arrival = None
+		self.dropped = 0
+		self.lock = Lock()
+
+
+
+
+	def __average(self, average: Union[float, None], value: float) -> float:
+
+		""" Updates an exponentially weighted moving average
+
+		Arguments:
+		----------
+			average: current average (None if there is no measurement)
+			value: newest measurement
+
+		Returns:
+		----------
+			average: updated average
+
+		"""
+
+		if average is None:
+			return value
+
+		return (1 - self.smoothing) * average + self.smoothing * value
+
+
+
+
+	def __update_rate(self):
+
+		""" Computes the sampling rate from the current estimations """
+
+		if (self.arrival_time is None) or (self.service_time is None):
+			return
+
+		capacity = self.headroom * self.arrival_time / max(self.service_time, 1e-9)
+		self.rate = min(self.ceiling, max(self.min_rate, capacity))
+
+
+
+
+	def accept(self) -> Union[float, None]:
+
+		""" Registers an arrival and decides whether it must be classified
+
+		Returns:
+		----------
+			weight: number of arrivals the tweet represents (None if discarded)
+
+		"""
+
+		with self.lock:
+			now = time.time()
+
+			if self.last_arrival is not None:
+				self.arrival_time = self.__average(self.arrival_time, now - self.last_arrival)
+				self.__update_rate()
+
+			self.last_arrival = now
+			rate = self.rate
+
+		if random.random() < rate:
+			return 1 / rate
+
+		return None
+
+
+
+
+	def record(self, seconds: float):
+
+		""" Registers the time spent classifying a tweet
+
+		Arguments:
+		----------
+			seconds: classification time
+
+		"""
+
+		with self.lock:
+			self.service_time = self.__average(self.service_time, seconds)
+			self.__update_rate()
+
+
+
+
+	def overflow(self):
+
+		""" Halves the sampling rate ceiling when the classification queue is full, counting the dropped tweet """
+
+		with self.lock:
+			self.dropped += 1
+			self.ceiling = max(self.min_rate, self.rate / 2)
+			self.rate = self.ceiling
+
+
+
+
+	def drained(self):
+
+		""" Lifts the sampling rate ceiling once the classification queue is empty """
+
+		with self.lock:
+			if self.ceiling < 1.0:
+				self.ceiling = 1.0
+				self.__update_rate()
+
+
+
+
+	def pause(self):
+
+		""" Forgets the previous arrival, so a stream interruption is not measured as an arrival interval """
+
+		with self.lock:
+			self.last_arrival = None
@@ -1,6 +1,12 @@
 # Created by Sinclert Perez (Sinclert@hotmail.com)
 
 
+import hashlib
+import numpy
+
+from threading import Lock
+from typing import Tuple
+
 from nltk.stem import SnowballStemmer
 from nltk.tokenize import TweetTokenizer
 
@@ -14,6 +20,38 @@ languages = {
 }
 
 
+# Process-wide shared tokenizers (one per language and settings)
+registry = {}
+registry_lock = Lock()
+
+
+
+
+def get_tokenizer(lang: str, reduce_len: bool = True, strip_handles: bool = True) -> 'TextTokenizer':
+
+	""" Gets the shared tokenizer of a language and settings, creating it the first time
+
+	Arguments:
+	----------
+		lang: language to perform the tokenizer process
+		reduce_len: whether to shorten the repeated character sequences (optional)
+		strip_handles: whether to remove the Twitter handles (optional)
+
+	Returns:
+	----------
+		tokenizer: TextTokenizer object shared by the whole process
+
+	"""
+
+	key = (lang, reduce_len, strip_handles)
+
+	with registry_lock:
+		if key not in registry:
+			registry[key] = TextTokenizer(lang, reduce_len, strip_handles)
+
+		return registry[key]
+
+
 
 
 class TextTokenizer(object):
@@ -22,6 +60,10 @@ class TextTokenizer(object):
 
 	Attributes:
 	----------
+		lang:
+			type: string
+			info: language of the stemmer and the stopwords
+
 		lemmatizer:
 			type: SnowballStemmer
 			info: use to extract the root of every word
@@ -33,29 +75,40 @@ class TextTokenizer(object):
 		stopwords:
 			type: set
 			info: irrelevant words to filter
+
+		stems:
+			type: dict
+			info: stem (value) of each already stemmed word (key)
 	"""
 
 
+	# Maximum number of words in the stem table (class attribute)
+	max_stems = 1000000
+
 
 
-	def __init__(self, lang: str):
+
+	def __init__(self, lang: str, reduce_len: bool = True, strip_handles: bool = True):
 
 		""" Creates a text tokenizer object
 
 		Arguments:
 		----------
 			lang: language to perform the tokenizer process
+			reduce_len: whether to shorten the repeated character sequences (optional)
+			strip_handles: whether to remove the Twitter handles (optional)
 
 		"""
 
 		if lang not in languages:
 			exit('Invalid language')
 
+		self.lang = lang
 		self.lemmatizer = SnowballStemmer(lang)
 		self.tokenizer = TweetTokenizer(
 			preserve_case = False,
-			reduce_len = True,
-			strip_handles = True
+			reduce_len = reduce_len,
+			strip_handles = strip_handles
 		)
 
 		self.stopwords = set(read_lines(
@@ -63,6 +116,8 @@ class TextTokenizer(object):
 			file_type = 'stopwords'
 		))
 
+		self.stems = {}
+
 
 
 
@@ -72,7 +127,7 @@ class TextTokenizer(object):
 
 		Arguments:
 		----------
-			text: what is going to be tokenize
+			text: what is going to be tokenize (or its already computed tokens)
 
 		Returns:
 		----------
@@ -80,8 +135,217 @@ class TextTokenizer(object):
 
 		"""
 
-		tokens = self.tokenizer.tokenize(text)
+		# Sentences loaded from the token cache are already tokenized
+		if not isinstance(text, str):
+			return list(text)
+
+		stems = self.stems
+		tokens = self.tokenizer.tokenize(text.lower())
 		tokens = filter(lambda t: t not in self.stopwords, tokens)
-		tokens = [self.lemmatizer.stem(token) for token in tokens]
+		tokens = [stems[t] if t in stems else self.stem(t) for t in tokens]
 
 		return tokens
+
+
+
+
+	def stem(self, word: str) -> str:
+
+		""" Stems a word, storing its stem in the table while there is room
+
+		Arguments:
+		----------
+			word: lowercased word to stem
+
+		Returns:
+		----------
+			stem: root of the word
+
+		"""
+
+		try:
+			return self.stems[word]
+
+		except KeyError:
+			stem = self.lemmatizer.stem(word)
+
+			if len(self.stems) < self.max_stems:
+				self.stems[word] = stem
+
+			return stem
+
+
+
+
+	def add_stems(self, stems: dict):
+
+		""" Adds precomputed stems to the table
+
+		Arguments:
+		----------
+			stems: stem (value) of each word (key)
+
+		"""
+
+		room = self.max_stems - len(self.stems)
+
+		if len(stems) <= room:
+			self.stems.update(stems)
+		else:
+			self.stems.update(list(stems.items())[:max(room, 0)])
+
+
+
+
+	def build_stems(self, texts: list) -> dict:
+
+		""" Precomputes the stems of the words observed in the specified texts
+
+		Arguments:
+		----------
+			texts: what is going to be tokenize
+
+		Returns:
+		----------
+			stems: stem (value) of each observed word (key, without stopwords)
+
+		"""
+
+		words = set()
+
+		for text in texts:
+			words.update(self.tokenizer.tokenize(text.lower()))
+
+		return {w: self.stem(w) for w in words - self.stopwords}
+
+
+
+
+	def __setstate__(self, state: dict):
+
+		""" Restores a pickled tokenizer, completing the attributes of older versions
+
+		Arguments:
+		----------
+			state: pickled attributes
+
+		"""
+
+		self.__dict__.update(state)
+
+		# Tokenizers pickled before the language was stored keep it in their stemmer
+		if not hasattr(self, 'lang'):
+			self.lang = type(self.lemmatizer.stemmer).__name__[:-len('Stemmer')].lower()
+
+		if not hasattr(self, 'stems'):
+			self.stems = {}
+
+
+
+
+	def __reduce__(self) -> tuple:
+
+		""" Pickles the tokenizer as a reference to the shared one
+
+		Returns:
+		----------
+			reduction: registry function and its arguments
+
+		"""
+
+		return get_tokenizer, (self.lang, self.tokenizer.reduce_len, self.tokenizer.strip_handles)
+
+
+
+
+	def tokenize_batch(self, texts: list) -> Tuple[list, numpy.ndarray, numpy.ndarray]:
+
+		""" Tokenize the specified texts into arrays of token ids
+
+		Arguments:
+		----------
+			texts: what is going to be tokenize
+
+		Returns:
+		----------
+			vocab: stemmed tokens, indexed by their id
+			ids: concatenated token ids of all the texts (without stopwords)
+			offsets: position where the ids of each text start (plus the end)
+
+		"""
+
+		words = {}
+		ids = []
+		offsets = [0]
+
+		# Each distinct word is mapped to an id only once
+		for text in texts:
+			tokens = self.tokenizer.tokenize(text.lower())
+			ids.extend(words.setdefault(t, len(words)) for t in tokens)
+			offsets.append(len(ids))
+
+		vocab = {}
+		stem_ids = numpy.full(len(words), -1, dtype = numpy.int32)
+
+		# Each distinct word is stemmed only once
+		for word, word_id in words.items():
+			if word not in self.stopwords:
+				stem = self.stem(word)
+				stem_ids[word_id] = vocab.setdefault(stem, len(vocab))
+
+		ids = stem_ids[numpy.array(ids, dtype = numpy.int32)]
+		kept = numpy.concatenate(([0], numpy.cumsum(ids >= 0)))
+
+		offsets = kept[offsets]
+		ids = ids[ids >= 0]
+
+		return list(vocab), ids, offsets
+
+
+
+
+	def tokenize_docs(self, texts: list) -> list:
+
+		""" Tokenize the specified texts in a single batch
+
+		Arguments:
+		----------
+			texts: what is going to be tokenize
+
+		Returns:
+		----------
+			docs: list containing the tokens of each text (without stopwords)
+
+		"""
+
+		vocab, ids, offsets = self.tokenize_batch(texts)
+
+		# Tokens are shared references to the vocabulary strings
+		vocab = numpy.array(vocab, dtype = object)
+		tokens = vocab[ids].tolist()
+		offsets = offsets.tolist()
+
+		return [tokens[s:e] for s, e in zip(offsets[:-1], offsets[1:])]
+
+
+
+
+	def fingerprint(self) -> str:
+
+		""" Computes a digest identifying the tokenizer output
+
+		Returns:
+		----------
+			digest: hexadecimal digest of the language, settings and stopwords
+
+		"""
+
+		settings = [
+			self.lang,
+			self.tokenizer.preserve_case,
+			self.tokenizer.reduce_len,
+			self.tokenizer.strip_handles,
+			sorted(self.stopwords)
+		]
+
+		return hashlib.sha1(repr(settings).encode('utf-8')).hexdigest()
@@ -0,0 +1,382 @@
+# Created by Sinclert Perez (Sinclert@hotmail.com)
+
+
+import numpy
+
+from scipy.sparse import csr_matrix
+from sklearn.feature_extraction.text import CountVectorizer
+from sklearn.feature_extraction.text import HashingVectorizer
+from typing import Tuple
+
+
+
+
+class SignedHashingVectorizer(HashingVectorizer):
+
+	""" Represents a bounded memory vectorizer using the hashing trick
+
+	The features are hashed into a fixed width space, using a hash sign
+	so that collisions tend to cancel out. The absolute value of every
+	hashed count is returned, as the chi2 selector requires non-negative
+	features.
+	"""
+
+
+
+
+	def transform(self, X):
+
+		""" Builds the non-negative hashed features of the given documents
+
+		Arguments:
+		----------
+			X: documents to vectorize (texts or tokens)
+
+		Returns:
+		----------
+			feats: sparse features matrix
+
+		"""
+
+		return abs(super().transform(X))
+
+
+
+
+class IdNgramVectorizer(CountVectorizer):
+
+	""" Represents a vocabulary vectorizer building its n-grams from token ids
+
+	The documents are tokenized in batch into integer token ids, so the
+	bigrams are paired as 64-bit keys instead of joining their strings in
+	every document. Strings are only built once per distinct feature, and
+	the columns are sorted by feature string, so the features matrix is the
+	same as the one of 'CountVectorizer'. Unsupported settings fall back to
+	the 'CountVectorizer' implementation.
+
+	Tokens may contain spaces (as '. . .'), so the unigrams are looked up
+	by string, and the bigrams of those tokens are joined as strings too.
+	"""
+
+
+
+
+	def __supported(self) -> bool:
+
+		""" Checks whether the settings are supported by the token ids path
+
+		Returns:
+		----------
+			supported: whether the token ids path produces the same features
+
+		"""
+
+		return (
+			hasattr(self.tokenizer, 'tokenize_batch')
+			and self.analyzer == 'word'
+			and self.ngram_range in ((1, 1), (1, 2))
+			and self.stop_words is None
+			and self.max_df == 1.0 and self.min_df == 1
+			and self.max_features is None
+			and self.preprocessor is None
+			and not self.lowercase
+			and self.strip_accents is None
+			and self.input == 'content'
+		)
+
+
+
+
+	def __tokenize(self, docs: list) -> Tuple[list, numpy.ndarray, numpy.ndarray]:
+
+		""" Converts texts (or already computed tokens) into token ids
+
+		Arguments:
+		----------
+			docs: documents to vectorize (texts or tokens)
+
+		Returns:
+		----------
+			vocab: tokens, indexed by their id
+			ids: concatenated token ids of all the documents
+			offsets: position where the ids of each document start (plus the end)
+
+		"""
+
+		if all(isinstance(d, str) for d in docs):
+			return self.tokenizer.tokenize_batch(docs)
+
+		index = {}
+		ids = [index.setdefault(t, len(index)) for doc in docs for t in doc]
+		offsets = numpy.cumsum([0] + [len(doc) for doc in docs])
+
+		return list(index), numpy.array(ids, dtype = numpy.int32), offsets
+
+
+
+
+	@staticmethod
+	def __adjacent(ids: numpy.ndarray, offsets: numpy.ndarray) -> numpy.ndarray:
+
+		""" Finds the tokens followed by another token of the same document
+
+		Arguments:
+		----------
+			ids: concatenated token ids of all the documents
+			offsets: position where the ids of each document start (plus the end)
+
+		Returns:
+		----------
+			starts: whether each token starts a bigram
+
+		"""
+
+		starts = numpy.ones(len(ids), dtype = bool)
+
+		# The last token of every (non empty) document does not start any bigram
+		ends = offsets[1:][offsets[1:] > offsets[:-1]]
+		starts[ends - 1] = False
+
+		return starts
+
+
+
+
+	def __build_tables(self):
+
+		""" Indexes the vocabulary by token ids, so it can be looked up without strings """
+
+		tokens = {}
+		keys, columns = [], []
+
+		for name, column in self.vocabulary_.items():
+			parts = name.split(' ')
+
+			for part in parts:
+				tokens.setdefault(part, len(tokens))
+
+			if len(parts) == 2:
+				keys.append((tokens[parts[0]] << 32) | tokens[parts[1]])
+				columns.append(column)
+
+		keys = numpy.array(keys, dtype = numpy.int64)
+		order = numpy.argsort(keys)
+
+		self._tables = (self.vocabulary_, tokens, keys[order], numpy.array(columns, dtype = numpy.int32)[order])
+
+
+
+
+	def __getstate__(self) -> dict:
+
+		""" Gets the pickled state, without the lookup tables (rebuilt when needed)
+
+		Returns:
+		----------
+			state: object attributes
+
+		"""
+
+		state = super().__getstate__()
+		state.pop('_tables', None)
+
+		return state
+
+
+
+
+	def __build(self, unigrams: numpy.ndarray, bigrams: numpy.ndarray, offsets: numpy.ndarray) -> csr_matrix:
+
+		""" Builds the counts matrix from the feature column of every token
+
+		Each token takes two consecutive slots of its document row: its
+		unigram and the bigram it starts. Unknown features and tokens not
+		starting a bigram leave their slot empty.
+
+		Arguments:
+		----------
+			unigrams: unigram column of each token (-1 if unknown)
+			bigrams: column of the bigram started by each token (-1 if none)
+			offsets: position where the tokens of each document start (plus the end)
+
+		Returns:
+		----------
+			feats: sparse features matrix (sorted indices)
+
+		"""
+
+		if self.ngram_range[1] < 2:
+			indices, indptr = unigrams, offsets
+		else:
+			indices, indptr = numpy.stack((unigrams, bigrams), axis = 1).ravel(), offsets * 2
+
+		kept = indices >= 0
+		positions = numpy.zeros(len(kept) + 1, dtype = numpy.int32)
+		numpy.cumsum(kept, dtype = numpy.int32, out = positions[1:])
+
+		# Empty slots are dropped before allocating the counts
+		indptr = positions[indptr]
+		indices = indices[kept]
+		del positions, kept
+
+		feats = csr_matrix(
+			(numpy.ones(len(indices), dtype = self.dtype), indices, indptr),
+			shape = (len(offsets) - 1, len(self.vocabulary_))
+		)
+
+		feats.sum_duplicates()
+		return feats
+
+
+
+
+	def __lookup_bigrams(self, vocab: list, ids: numpy.ndarray, starts: numpy.ndarray) -> numpy.ndarray:
+
+		""" Finds the column of the bigram started by each token
+
+		Arguments:
+		----------
+			vocab: tokens, indexed by their id
+			ids: concatenated token ids of all the documents
+			starts: whether each token starts a bigram
+
+		Returns:
+		----------
+			bigrams: column of the bigram started by each token (-1 if none or unknown)
+
+		"""
+
+		_, tokens, table_keys, table_columns = self._tables
+
+		bigrams = numpy.full(len(ids), -1, dtype = numpy.int32)
+
+		if self.ngram_range[1] < 2:
+			return bigrams
+
+		spaced = numpy.array([' ' in t for t in vocab], dtype = bool)
+		token_ids = numpy.array([tokens.get(t, -1) for t in vocab], dtype = numpy.int64)
+
+		# Pairs of known tokens are looked up by their 64-bit key
+		found = starts[:-1] & (token_ids >= 0)[ids[:-1]] & (token_ids >= 0)[ids[1:]]
+		keys = token_ids[ids[:-1]]
+		keys <<= 32
+		keys |= token_ids[ids[1:]]
+
+		indexes = numpy.searchsorted(table_keys, keys)
+		numpy.minimum(indexes, max(len(table_keys) - 1, 0), out = indexes)
+
+		if len(table_keys) > 0:
+			found &= table_keys[indexes] == keys
+		else:
+			found[:] = False
+
+		bigrams[:-1][found] = table_columns[indexes[found]]
+
+		# Bigrams of tokens containing spaces are looked up by string
+		for i in numpy.flatnonzero(starts[:-1] & (spaced[ids[:-1]] | spaced[ids[1:]])).tolist():
+			bigrams[i] = self.vocabulary_.get(vocab[ids[i]] + ' ' + vocab[ids[i + 1]], -1)
+
+		return bigrams
+
+
+
+
+	def fit(self, raw_documents, y = None):
+
+		""" Learns the vocabulary of the given documents
+
+		Arguments:
+		----------
+			raw_documents: documents to vectorize (texts or tokens)
+			y: ignored
+
+		Returns:
+		----------
+			self: fitted vectorizer
+
+		"""
+
+		self.fit_transform(raw_documents)
+		return self
+
+
+
+
+	def fit_transform(self, raw_documents, y = None) -> csr_matrix:
+
+		""" Learns the vocabulary of the given documents and builds their features
+
+		Arguments:
+		----------
+			raw_documents: documents to vectorize (texts or tokens)
+			y: ignored
+
+		Returns:
+		----------
+			feats: sparse features matrix
+
+		"""
+
+		if not self.__supported():
+			return super().fit_transform(raw_documents, y)
+
+		vocab, ids, offsets = self.__tokenize(list(raw_documents))
+		starts = numpy.flatnonzero(self.__adjacent(ids, offsets))
+
+		if len(vocab) == 0:
+			raise ValueError('empty vocabulary; perhaps the documents only contain stop words')
+
+		if self.ngram_range[1] < 2:
+			starts = starts[:0]
+
+		# Every distinct bigram is found by its key, without building its string
+		n_tokens = max(len(vocab), 1)
+		pair_keys = ids[starts].astype(numpy.int64) * n_tokens + ids[starts + 1]
+		pair_keys, pair_ids = numpy.unique(pair_keys, return_inverse = True)
+
+		names = list(vocab)
+		names.extend(vocab[k // n_tokens] + ' ' + vocab[k % n_tokens] for k in pair_keys.tolist())
+
+		# Columns sorted by feature string (equal strings share a column)
+		names, columns = numpy.unique(numpy.array(names, dtype = object), return_inverse = True)
+
+		self.vocabulary_ = dict(zip(names.tolist(), range(len(names))))
+		self.fixed_vocabulary_ = False
+		self.__build_tables()
+
+		columns = columns.astype(numpy.int32)
+		bigrams = numpy.full(len(ids), -1, dtype = numpy.int32)
+		bigrams[starts] = columns[len(vocab):][pair_ids]
+
+		return self.__build(columns[:len(vocab)][ids], bigrams, offsets)
+
+
+
+
+	def transform(self, raw_documents) -> csr_matrix:
+
+		""" Builds the features of the given documents
+
+		Arguments:
+		----------
+			raw_documents: documents to vectorize (texts or tokens)
+
+		Returns:
+		----------
+			feats: sparse features matrix
+
+		"""
+
+		if not self.__supported():
+			return super().transform(raw_documents)
+
+		if getattr(self, '_tables', (None,))[0] is not self.vocabulary_:
+			self.__build_tables()
+
+		vocab, ids, offsets = self.__tokenize(list(raw_documents))
+
+		# Each distinct token is looked up only once
+		unigrams = numpy.array([self.vocabulary_.get(t, -1) for t in vocab], dtype = numpy.int32)
+		bigrams = self.__lookup_bigrams(vocab, ids, self.__adjacent(ids, offsets))
+
+		return self.__build(unigrams[ids], bigrams, offsets)
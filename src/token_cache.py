@@ -0,0 +1,175 @@
+# Created by Sinclert Perez (Sinclert@hotmail.com)
+
+
+import hashlib
+import os
+
+import numpy
+
+from utils import compute_path
+from utils import hash_file
+from utils import read_lines
+
+
+# Bumped whenever the stored format changes
+cache_version = '1'
+
+
+
+
+class TokenCache(object):
+
+	""" Represents a persistent cache of tokenized datasets
+
+	Every dataset is stored in a NumPy archive containing:
+		- vocab (uint8 array): UTF-8 new line separated vocabulary
+		- ids (int32 array): concatenated token ids of all the sentences
+		- offsets (int64 array): position where each sentence starts
+
+	Attributes:
+	----------
+		tokenizer:
+			type: TextTokenizer
+			info: used to tokenize the datasets that are not cached
+	"""
+
+
+
+
+	def __init__(self, tokenizer):
+
+		""" Creates a token cache object
+
+		Arguments:
+		----------
+			tokenizer: TextTokenizer object used to fill the cache
+
+		"""
+
+		self.tokenizer = tokenizer
+
+
+
+
+	def __compute_key(self, file_name: str) -> str:
+
+		""" Computes the cache entry name of the specified dataset
+
+		Arguments:
+		----------
+			file_name: dataset file name
+
+		Returns:
+		----------
+			key: cache entry file name
+
+		"""
+
+		digest = hashlib.sha1()
+		digest.update(cache_version.encode('utf-8'))
+		digest.update(hash_file(file_name, 'dataset').encode('utf-8'))
+		digest.update(self.tokenizer.fingerprint().encode('utf-8'))
+
+		return os.path.splitext(file_name)[0] + '.' + digest.hexdigest() + '.npz'
+
+
+
+
+	@staticmethod
+	def __decode(vocab: list, ids: numpy.ndarray, offsets: numpy.ndarray) -> list:
+
+		""" Rebuilds the token lists from the token-id arrays
+
+		Arguments:
+		----------
+			vocab: tokens, indexed by their id
+			ids: concatenated token ids of all the sentences
+			offsets: position where each sentence starts (plus the end)
+
+		Returns:
+		----------
+			sentences: list containing the tokens of each sentence
+
+		"""
+
+		vocab = numpy.array(vocab, dtype = object)
+		tokens = vocab[ids].tolist()
+		offsets = offsets.tolist()
+
+		return [tokens[s:e] for s, e in zip(offsets[:-1], offsets[1:])]
+
+
+
+
+	def load(self, file_name: str) -> list:
+
+		""" Loads the tokenized dataset, computing it if it is not cached
+
+		Arguments:
+		----------
+			file_name: dataset file name
+
+		Returns:
+		----------
+			sentences: list containing the tokens of each sentence
+
+		"""
+
+		file_path = compute_path(self.__compute_key(file_name), 'cache')
+
+		try:
+			with numpy.load(file_path) as entry:
+				vocab = bytes(entry['vocab']).decode('utf-8')
+				vocab = vocab.split('\n') if vocab else []
+
+				return self.__decode(vocab, entry['ids'], entry['offsets'])
+
+		except (IOError, KeyError, ValueError):
+			pass
+
+		sentences = read_lines(
+			file_name = file_name,
+			file_type = 'dataset'
+		)
+
+		vocab, ids, offsets = self.tokenizer.tokenize_batch(sentences)
+		self.__store(file_path, vocab, ids, offsets)
+
+		return self.__decode(vocab, ids, offsets)
+
+
+
+
+	@staticmethod
+	def __store(file_path: str, vocab: list, ids: numpy.ndarray, offsets: numpy.ndarray):
+
+		""" Atomically writes a cache entry
+
+		Arguments:
+		----------
+			file_path: cache entry path
+			vocab: tokens, indexed by their id
+			ids: concatenated token ids of all the sentences
+			offsets: position where each sentence starts (plus the end)
+
+		"""
+
+		vocab = '\n'.join(vocab).encode('utf-8')
+
+		os.makedirs(os.path.dirname(file_path), exist_ok = True)
+		temp_path = file_path + '.' + str(os.getpid()) + '.tmp'
+
+		try:
+			with open(temp_path, 'wb') as file:
+				numpy.savez(
+					file,
+					vocab = numpy.frombuffer(vocab, dtype = numpy.uint8),
+					ids = ids.astype(numpy.int32),
+					offsets = offsets.astype(numpy.int64)
+				)
+
+			# Concurrent trainings may be storing the same entry
+			os.replace(temp_path, file_path)
+
+		except IOError:
+			print('The token cache entry could not be saved in', file_path)
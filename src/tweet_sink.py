@@ -0,0 +1,247 @@
+# Created by Sinclert Perez (Sinclert@hotmail.com)
+
+
+import os
+import time
+import uuid
+
+import numpy
+
+from queue import Full
+from queue import Queue
+from threading import Thread
+
+from utils import compute_path
+
+
+# Fixed columns of every exported row
+sink_columns = ('id', 'timestamp', 'lang', 'text', 'weight')
+
+
+
+
+class ColumnarSink(object):
+
+	""" Represents a columnar export of classified tweets
+
+	Rows are buffered in a background thread and written in large row
+	groups: as Parquet files if 'pyarrow' is installed, or as NumPy archives
+	otherwise. Every row group is written as a complete part file, so an
+	interrupted run only loses its buffered rows, and every run writes new
+	part files inside the export folder, so months of exports can be scanned
+	together.
+
+	Attributes:
+	----------
+		path:
+			type: string
+			info: export folder path
+
+		columns:
+			type: list
+			info: fixed columns followed by the label columns
+
+		group_size:
+			type: int
+			info: number of rows of each written row group
+
+		queue:
+			type: queue.Queue
+			info: bounded queue of rows pending to be written
+
+		error:
+			type: Exception
+			info: error that stopped the writing thread (None if running)
+
+		schema:
+			type: pyarrow.Schema
+			info: Parquet schema of the rows (None if 'pyarrow' is not installed)
+
+		writer:
+			type: threading.Thread
+			info: background thread writing the row groups
+	"""
+
+
+
+
+	def __init__(self, output: str, label_columns: list, group_size: int = 100000, queue_size: int = 100000):
+
+		""" Creates a columnar sink and starts its writing thread
+
+		Arguments:
+		----------
+			output: export folder name
+			label_columns: names of the predicted labels columns
+			group_size: number of rows of each row group (optional)
+			queue_size: maximum number of rows pending to be written (optional)
+
+		"""
+
+		self.path = compute_path(output, 'export')
+		self.columns = list(sink_columns) + list(label_columns)
+		self.group_size = group_size
+
+		os.makedirs(self.path, exist_ok = True)
+
+		# Imported before starting the thread, as other modules check it
+		try:
+			import pyarrow
+			import pyarrow.parquet
+
+			self.schema = pyarrow.schema(
+				[('id', pyarrow.int64()), ('timestamp', pyarrow.float64()),
+				 ('lang', pyarrow.string()), ('text', pyarrow.string()),
+				 ('weight', pyarrow.float64())] +
+				[(c, pyarrow.string()) for c in label_columns]
+			)
+
+		except ImportError:
+			self.schema = None
+
+		self.queue = Queue(maxsize = queue_size)
+		self.error = None
+		self.writer = Thread(target = self.__write_loop, daemon = True)
+		self.writer.start()
+
+
+
+
+	def write(self, row: dict):
+
+		""" Queues a row to be written, waiting while the queue is full
+
+		Arguments:
+		----------
+			row: dictionary with the value (value) of each column (key)
+
+		"""
+
+		while True:
+			self.__check()
+
+			try:
+				self.queue.put(row, timeout = 1)
+				return
+
+			except Full:
+				continue
+
+
+
+
+	def close(self):
+
+		""" Writes the pending rows and waits for the writing thread """
+
+		while self.writer.is_alive():
+			try:
+				self.queue.put(None, timeout = 1)
+				break
+
+			except Full:
+				continue
+
+		self.writer.join()
+		self.__check()
+
+
+
+
+	def __check(self):
+
+		""" Raises the error that stopped the writing thread, if any """
+
+		if self.error is not None:
+			raise IOError('The export could not be written in ' + self.path) from self.error
+
+
+
+
+	def __write_loop(self):
+
+		""" Buffers the queued rows and writes them in row groups (recording any error) """
+
+		part = 'part-' + time.strftime('%Y%m%d-%H%M%S') + '-' + uuid.uuid4().hex[:8]
+		chunk = 0
+		rows = []
+
+		try:
+			while True:
+				row = self.queue.get()
+
+				if row is not None:
+					rows.append(row)
+
+				if (len(rows) >= self.group_size) or ((row is None) and rows):
+					name = part + '-' + str(chunk).zfill(5)
+					columns = {c: [r.get(c) for r in rows] for c in self.columns}
+
+					if self.schema is not None:
+						self.__write_parquet(name + '.parquet', columns)
+					else:
+						self.__write_numpy(name + '.npz', columns)
+
+					chunk += 1
+					rows = []
+
+				if row is None:
+					break
+
+		except Exception as error:
+			self.error = error
+
+
+
+
+	def __write_parquet(self, file_name: str, columns: dict):
+
+		""" Writes a row group as a complete Parquet file
+
+		Arguments:
+		----------
+			file_name: part file name
+			columns: dictionary with the values (value) of each column (key)
+
+		"""
+
+		import pyarrow
+		import pyarrow.parquet as parquet
+
+		# Hidden until its footer is written, so readers skip it
+		temp_path = os.path.join(self.path, '.' + file_name)
+
+		parquet.write_table(pyarrow.table(columns, schema = self.schema), temp_path)
+		os.replace(temp_path, os.path.join(self.path, file_name))
+
+
+
+
+	def __write_numpy(self, file_name: str, columns: dict):
+
+		""" Writes a row group as a NumPy archive (no pickled objects)
+
+		Arguments:
+		----------
+			file_name: part file name
+			columns: dictionary with the values (value) of each column (key)
+
+		"""
+
+		arrays = {}
+
+		for name, values in columns.items():
+			if name == 'id':
+				arrays[name] = numpy.array(values, dtype = numpy.int64)
+			elif name in ('timestamp', 'weight'):
+				arrays[name] = numpy.array(values, dtype = numpy.float64)
+			else:
+				arrays[name] = numpy.array(['' if v is None else v for v in values], dtype = str)
+
+		# Hidden until completely written, so readers skip it
+		temp_path = os.path.join(self.path, '.' + file_name)
+
+		with open(temp_path, 'wb') as file:
+			numpy.savez(file, **arrays)
+
+		os.replace(temp_path, os.path.join(self.path, file_name))
@@ -1,6 +1,9 @@
 # Created by Sinclert Perez (Sinclert@hotmail.com)
 
 
+from datetime import timezone
+from typing import Tuple
+
 from tweepy import API
 from tweepy import Cursor
 from tweepy import OAuthHandler
@@ -83,35 +86,61 @@ class TwitterMiner(object):
 
 
 
-	def get_user_tweets(self, user: str, word: str, depth: int = 1000) -> str:
+	@staticmethod
+	def get_timestamp(tweet) -> float:
 
-		""" Generator that returns the 'depth' most recent user tweets
+		""" Extracts the creation UNIX timestamp from a Status object (tweet)
+
+		Arguments:
+		----------
+			tweet: Status object containing all the attributes of a tweet
+
+		Returns:
+		----------
+			timestamp: seconds since the epoch
+
+		"""
+
+		return tweet.created_at.replace(tzinfo = timezone.utc).timestamp()
+
+
+
+
+	def get_user_statuses(self, user: str, since_id: int = None, depth: int = 1000) -> Tuple[int, str, float, str]:
+
+		""" Generator that returns the 'depth' most recent user tweets and IDs
 
 		Arguments:
 		----------
 			user: Twitter user account without the '@'
-			word: word used to filter the tweets (lowercase)
+			since_id: only tweets more recent than this ID are returned (optional)
 			depth: number of tweets to retrieve (optional)
 
 		Yield:
 		----------
+			tweet_id: tweet ID
 			tweet_text: cleaned tweet text
+			tweet_time: tweet creation UNIX timestamp
+			tweet_lang: tweet language code
 
 		"""
 
+		params = {} if since_id is None else {'since_id': since_id}
+
 		try:
 			cursor = Cursor(
 				method = self.API.user_timeline,
 				id = user,
 				count = 200,
-				tweet_mode = 'extended'
+				tweet_mode = 'extended',
+				**params
 			)
 
 			for tweet in cursor.items(depth):
 				tweet_text = self.get_text(tweet)
 				tweet_text = clean_text(tweet_text)
 
-				if word in tweet_text: yield tweet_text
+				yield tweet.id, tweet_text, self.get_timestamp(tweet), tweet.lang
 
 		except TweepError:
 			exit('Unable to retrieve tweets from ' + user)
@@ -119,6 +148,28 @@ class TwitterMiner(object):
 
 
 
+	def get_user_tweets(self, user: str, word: str, depth: int = 1000) -> str:
+
+		""" Generator that returns the 'depth' most recent user tweets
+
+		Arguments:
+		----------
+			user: Twitter user account without the '@'
+			word: word used to filter the tweets (lowercase)
+			depth: number of tweets to retrieve (optional)
+
+		Yield:
+		----------
+			tweet_text: cleaned tweet text
+
+		"""
+
+		for _, tweet_text, _, _ in self.get_user_statuses(user, depth = depth):
+			if word in tweet_text: yield tweet_text
+
+
+
+
 	def search_tweets(self, query: str, lang: str, filter_prob: int = 95, depth: int = 1000) -> str:
 
 		""" Generator that returns the 'depth' most recent user tweets
@@ -136,13 +187,42 @@ class TwitterMiner(object):
 
 		"""
 
+		for _, tweet_text in self.search_statuses(query, lang, filter_prob, depth):
+			yield tweet_text
+
+
+
+
+	def search_statuses(self, query: str, lang: str, filter_prob: int = 95, depth: int = 1000,
+						max_id: int = None) -> Tuple[int, str]:
+
+		""" Generator that returns the 'depth' most recent query tweets and IDs
+
+		Arguments:
+		----------
+			query: string with logic operations (AND, OR...)
+			lang: language abbreviation to filter the tweets
+			filter_prob: probability percentage to remove query words (optional)
+			depth: number of tweets to retrieve (optional)
+			max_id: only tweets older or equal than this ID are returned (optional)
+
+		Yield:
+		----------
+			tweet_id: tweet ID
+			tweet_text: cleaned tweet text
+
+		"""
+
+		params = {} if max_id is None else {'max_id': max_id}
+
 		try:
 			cursor = Cursor(
 				method = self.API.search,
 				q = query,
 				lang = lang,
 				count = 100,
-				tweet_mode = 'extended'
+				tweet_mode = 'extended',
+				**params
 			)
 
 			# Obtaining the search query words in order to build a filter
@@ -161,7 +241,7 @@ class TwitterMiner(object):
 				tweet_text = clean_text(tweet_text, search_filters)
 				tweet_text = clean_text(tweet_text)
 
-				yield tweet_text
+				yield tweet.id, tweet_text
 
 		except TweepError:
 			exit('Unable to find ' + str(depth) + ' tweets')
@@ -1,7 +1,15 @@
 # Created by Sinclert Perez (Sinclert@hotmail.com)
 
 
-from collections import Counter
+import random
+import time
+
+from datetime import timezone
+from queue import Empty
+from queue import Full
+from queue import Queue
+from threading import Event
+from threading import Thread
 
 from tweepy import API
 from tweepy import OAuthHandler
@@ -9,6 +17,9 @@ from tweepy import StreamListener
 from tweepy import Stream
 from tweepy import TweepError
 
+from label_window import LabelWindow
+from status_cache import StatusCache
+from stream_sampler import AdaptiveSampler
 from twitter_keys import APP_KEYS
 
 from utils import clean_text
@@ -16,10 +27,45 @@ from utils import clean_text
 
 
 
+class ListenerStream(Stream):
+
+	""" Represents a Twitter stream that stops once its connection is closed
+
+	Tweepy reconnects immediately when the server closes the connection.
+	Stopping instead lets the listener reconnect with backoff, accounting
+	the disconnected interval as any other connection failure.
+	"""
+
+
+
+
+	def on_closed(self, resp):
+
+		""" Stops the stream when the server closes the connection
+
+		Arguments:
+		----------
+			resp: closed HTTP response
+
+		"""
+
+		self.running = False
+
+
+
+
 class TwitterListener(StreamListener):
 
 	""" Represents a Twitter Streaming listener
 
+	Every received tweet is cleaned once, and its text is fanned out to all
+	the registered classifiers, each one with its own label windows. Dropped
+	connections are retried with jittered exponential backoff, keeping the
+	label windows, and the disconnected intervals are accounted so that the
+	throughput and the time series do not silently undercount them. The
+	retweets of an already classified status reuse its cleaned text and
+	labels, while still being counted.
+
 	Attributes:
 	----------
 		API:
@@ -27,30 +73,124 @@ class TwitterListener(StreamListener):
 			info: object used to make connection with Twitter
 
 		stream:
-			type: tweepy.Stream
+			type: ListenerStream
 			info: Twitter stream end point
 
-		buffer:
-			type: list
-			info: circular buffer containing the latest predictions
+		connector:
+			type: threading.Thread
+			info: connection thread, reconnecting the stream until it is finished
 
-		index:
+		stopped:
+			type: threading.Event
+			info: set when the stream is finished, interrupting any backoff wait
+
+		connected:
+			type: bool
+			info: whether the stream is currently connected
+
+		connected_at:
+			type: float
+			info: timestamp of the last connection (None if disconnected)
+
+		disconnected:
+			type: float
+			info: timestamp of the current disconnection (None if connected)
+
+		attempts:
+			type: int
+			info: failed connection attempts since the last stable connection
+
+		reconnects:
 			type: int
-			info: buffer index to the next position to be replaced
+			info: number of successful connections after a disconnection
+
+		downtime:
+			type: float
+			info: seconds disconnected during the closed disconnections
 
-		clf:
-			type: HierarchicalClassif
-			info: hierarchical classifier to predict labels
+		code:
+			type: int
+			info: HTTP error code of the last connection attempt (None if not failed)
 
-		counters
+		started:
+			type: float
+			info: timestamp of the stream start
+
+		received:
+			type: int
+			info: number of tweets received, before sampling
+
+		classifiers:
+			type: dict
+			info: registered classifiers (name as key). Each one has:
+				- clf (HierarchicalClassif)
+				- group_by (string)
+				- groups (list)
+
+		windows:
 			type: dict
-			info: label counters
+			info: label windows, with (classifier name, group) as key
+
+		sampler:
+			type: AdaptiveSampler
+			info: decides which tweets are classified under overload
+
+		queue:
+			type: queue.Queue
+			info: bounded queue of sampled tweets pending classification
+
+		statuses:
+			type: StatusCache
+			info: cleaned text and labels of the latest classified statuses
+
+		worker:
+			type: threading.Thread
+			info: classification thread, decoupled from the stream thread
+
+		running:
+			type: bool
+			info: whether the classification thread must keep running
+
+		sink:
+			type: ColumnarSink
+			info: optional export of every classified tweet
+
+		series:
+			type: dict
+			info: label time series (LabelSeries), with classifier name as key
+
+		saved:
+			type: float
+			info: timestamp of the last time series persistence
 	"""
 
 
+	# Possible windows grouping criteria (class attribute)
+	group_criteria = ('track', 'lang')
+
+	# Seconds between time series persistences (class attribute)
+	series_interval = 60
+
+	# Backoff seconds after the first failed connection (class attribute)
+	retry_start = 1
+
+	# Backoff seconds after the first rate limited connection (class attribute)
+	retry_limited = 60
+
+	# Maximum backoff seconds (class attribute)
+	retry_cap = 320
+
+	# Connected seconds after which the backoff is reset (class attribute)
+	stable_seconds = 60
+
+	# HTTP error codes that are not solved by reconnecting (class attribute)
+	fatal_codes = (401, 403, 404, 406, 413, 416)
+
 
 
-	def __init__(self, token_key: str, token_secret: str, buffer_size: int, clf):
+
+	def __init__(self, token_key: str, token_secret: str, queue_size: int = 1000,
+				 cache_size: int = 100000, cache_ttl: float = 3600):
 
 		""" Creates a Twitter listener object
 
@@ -58,8 +198,9 @@ class TwitterListener(StreamListener):
 		----------
 			token_key: identifies the user
 			token_secret: accompanies the token key
-			buffer_size: size of the label circular buffer
-			clf: HierarchicalClassif object used to predict labels
+			queue_size: maximum number of tweets pending classification (optional)
+			cache_size: maximum number of classified statuses kept for retweets (optional)
+			cache_ttl: seconds an unused classified status is kept (optional)
 
 		"""
 
@@ -78,32 +219,233 @@ class TwitterListener(StreamListener):
 			exit('Unable to create the tweepy API object')
 
 		self.stream = None
-		self.buffer = [None] * buffer_size
-		self.index = 0
-		self.clf = clf
-		self.counters = Counter()
+		self.connector = None
+		self.stopped = Event()
+		self.connected = False
+		self.connected_at = None
+		self.disconnected = None
+		self.attempts = 0
+		self.reconnects = 0
+		self.downtime = 0.0
+		self.code = None
+		self.started = None
+		self.received = 0
+		self.classifiers = {}
+		self.windows = {}
+		self.sampler = AdaptiveSampler()
+		self.queue = Queue(maxsize = queue_size)
+		self.statuses = StatusCache(cache_size, cache_ttl)
+		self.worker = None
+		self.running = False
+		self.sink = None
+		self.series = {}
+		self.saved = time.time()
+
+
+
+
+	def add_classifier(self, name: str, clf, buffer_size: int, group_by: str = None, groups: list = None):
+
+		""" Registers a classifier and creates its label windows
+
+		Arguments:
+		----------
+			name: classifier identifier
+			clf: HierarchicalClassif object used to predict labels
+			buffer_size: size of each label circular buffer
+			group_by: criteria to keep one window per group (optional)
+			groups: tracks or language codes to keep a window for (optional)
+
+		"""
+
+		if (group_by is not None) and (group_by not in self.group_criteria):
+			exit('Invalid grouping criteria')
 
+		if group_by is None:
+			groups = [None]
 
+		# Tweets are only served once the models reach their steady latency
+		if not getattr(clf, 'ready', True):
+			clf.warm_up()
 
+		self.classifiers[name] = {
+			'clf': clf,
+			'group_by': group_by,
+			'groups': groups
+		}
 
-	def __update_buffer(self, label: str):
+		for group in groups:
+			self.windows[(name, group)] = LabelWindow(buffer_size)
 
-		""" Replace the self.index position by the specified label
+
+
+
+	def snapshot(self, name: str, group: str = None) -> tuple:
+
+		""" Gets an atomic copy of the label counters of a window
 
 		Arguments:
 		----------
-			label: replaces the one in self.index position
+			name: classifier identifier
+			group: track or language code of the window (optional)
+
+		Returns:
+		----------
+			version: number of updates of the label counters
+			counters: copy of the label counters
 
 		"""
 
-		try:
-			self.counters[self.buffer[self.index]] -= 1
-		except KeyError:
-			pass
+		return self.windows[(name, group)].snapshot()
+
+
+
+
+	def get_label_columns(self) -> list:
+
+		""" Gets the export column names of every registered classifier node
+
+		Returns:
+		----------
+			columns: '<classifier name>:<clf_file>' of every node
+
+		"""
+
+		return [
+			name + ':' + node
+			for name, classifier in self.classifiers.items()
+			for node in classifier['clf'].get_nodes()
+		]
 
-		self.buffer[self.index] = label
-		self.index = (self.index + 1) % len(self.buffer)
-		self.counters[label] += 1
+
+
+
+	def set_sink(self, sink):
+
+		""" Exports every classified tweet to the specified columnar sink
+
+		Arguments:
+		----------
+			sink: ColumnarSink object built with the listener label columns
+
+		"""
+
+		self.sink = sink
+
+
+
+
+	def add_series(self, name: str, series):
+
+		""" Aggregates the labels of a classifier into the specified time series
+
+		Arguments:
+		----------
+			name: classifier identifier
+			series: LabelSeries object built with the classifier labels
+
+		"""
+
+		self.series[name] = series
+
+
+
+
+	def save_series(self):
+
+		""" Persists every time series """
+
+		for series in self.series.values():
+			series.save()
+
+		self.saved = time.time()
+
+
+
+
+	def get_status(self) -> dict:
+
+		""" Gets the current state of the classification pipeline
+
+		Returns:
+		----------
+			status: dictionary containing:
+				- sampling_rate (float)
+				- queued (int)
+				- dropped (int, sampled tweets discarded because the queue was full)
+				- connected (bool)
+				- reconnects (int)
+				- downtime_s (float)
+				- arrivals_per_s (float, over the connected time)
+				- reused (float, fraction of tweets whose labels were cached)
+
+		"""
+
+		downtime = self.get_downtime()
+		uptime = 0 if self.started is None else time.time() - self.started - downtime
+
+		return {
+			'sampling_rate': round(self.sampler.rate, 4),
+			'queued': self.queue.qsize(),
+			'dropped': self.sampler.dropped,
+			'connected': self.connected,
+			'reconnects': self.reconnects,
+			'downtime_s': round(downtime, 1),
+			'arrivals_per_s': round(self.received / uptime, 2) if uptime > 0 else 0.0,
+			'reused': round(self.statuses.get_hit_rate(), 4)
+		}
+
+
+
+
+	def get_downtime(self) -> float:
+
+		""" Gets the seconds the stream has been disconnected since it started
+
+		Returns:
+		----------
+			downtime: disconnected seconds, including the current disconnection
+
+		"""
+
+		disconnected = self.disconnected
+
+		if disconnected is None:
+			return self.downtime
+
+		return self.downtime + time.time() - disconnected
+
+
+
+
+	def __get_groups(self, classifier: dict, text: str, lang: str) -> list:
+
+		""" Gets the groups of a classifier the specified tweet belongs to
+
+		Arguments:
+		----------
+			classifier: registered classifier
+			text: cleaned tweet text
+			lang: tweet language code
+
+		Returns:
+		----------
+			groups: groups whose windows must be updated
+
+		"""
+
+		group_by = classifier['group_by']
+
+		if group_by is None:
+			return [None]
+
+		if group_by == 'lang':
+			return [g for g in classifier['groups'] if g == lang]
+
+		return [
+			g for g in classifier['groups']
+			if all(w in text for w in g.lower().split())
+		]
 
 
 
@@ -136,9 +478,36 @@ class TwitterListener(StreamListener):
 
 
 
-	def start_stream(self, queries: list, langs: list, coords: list, timeout: int = 15):
+	@staticmethod
+	def get_source_id(tweet) -> int:
 
-		""" Starts the Twitter stream
+		""" Gets the ID of the status whose text is classified
+
+		Quotes are classified by their own text, so only retweets are
+		identified by the status they retweet.
+
+		Arguments:
+		----------
+			tweet: Status object containing all the attributes of a tweet
+
+		Returns:
+		----------
+			source_id: retweeted status ID, or the tweet ID otherwise
+
+		"""
+
+		if hasattr(tweet, 'retweeted_status'):
+			return tweet.retweeted_status.id
+
+		return tweet.id
+
+
+
+
+	def start_stream(self, queries: list, langs: list, coords: list, timeout: int = 15,
+					 host: str = 'stream.twitter.com', verify = True):
+
+		""" Starts the Twitter stream, which is reconnected until it is finished
 
 		Arguments:
 		----------
@@ -151,23 +520,138 @@ class TwitterListener(StreamListener):
 				3. North-East longitude
 				4. North-East latitude
 
-			timeout: seconds to launch an exception (optional)
+			timeout: seconds without data to consider the connection lost (optional)
+			host: streaming end point host (optional)
+			verify: whether to verify the host certificate, or its CA bundle path (optional)
 
 		"""
 
-		self.stream = Stream(
+		self.running = True
+		self.started = time.time()
+		self.stopped.clear()
+
+		self.worker = Thread(target = self.__classify_loop, daemon = True)
+		self.worker.start()
+
+		self.stream = ListenerStream(
 			auth = self.API.auth,
 			listener = self,
-			timeout = timeout
+			timeout = timeout,
+			host = host,
+			verify = verify
 		)
 
-		self.stream.filter(
-			track = queries,
-			languages = langs,
-			locations = coords,
-			is_async = True
+		self.connector = Thread(
+			target = self.__connect_loop,
+			args = (queries, langs, coords),
+			daemon = True
 		)
 
+		self.connector.start()
+
+
+
+
+	def __backoff(self) -> float:
+
+		""" Computes the seconds to wait before the next connection attempt
+
+		The wait doubles with every failed attempt up to a cap, and it is
+		jittered so that many clients do not reconnect at the same time.
+
+		Returns:
+		----------
+			seconds: random wait between half and the whole backoff
+
+		"""
+
+		start = self.retry_limited if self.code in (420, 429) else self.retry_start
+		delay = min(self.retry_cap, start * 2 ** self.attempts)
+
+		return random.uniform(delay / 2, delay)
+
+
+
+
+	def __connect_loop(self, queries: list, langs: list, coords: list):
+
+		""" Connects the stream, reconnecting it with backoff until it is finished
+
+		Arguments:
+		----------
+			queries: words to filter
+			langs: language codes to filter
+			coords: groups of 4 coordinates to filter
+
+		"""
+
+		while not self.stopped.is_set():
+			self.code = None
+
+			try:
+				self.stream.filter(
+					track = queries,
+					languages = langs,
+					locations = coords
+				)
+
+			# Tweepy re-raises any connection failure, already reported by 'on_exception'
+			except Exception:
+				pass
+
+			if self.stopped.is_set():
+				break
+
+			self.__mark_disconnected()
+
+			if self.code in self.fatal_codes:
+				print('The stream cannot be reconnected (error ' + str(self.code) + ')')
+				break
+
+			delay = self.__backoff()
+			self.attempts += 1
+
+			print('Reconnecting in', round(delay, 1), 's')
+			self.stopped.wait(delay)
+
+
+
+
+	def __mark_disconnected(self):
+
+		""" Starts a disconnected interval, unless one is already open """
+
+		now = time.time()
+
+		# Connections dropping right after being established keep backing off
+		if (self.connected_at is not None) and (now - self.connected_at >= self.stable_seconds):
+			self.attempts = 0
+
+		self.connected = False
+		self.connected_at = None
+
+		if self.disconnected is None:
+			self.disconnected = now
+			self.sampler.pause()
+
+
+
+
+	def __close_gap(self):
+
+		""" Closes the current disconnected interval, recording it in the time series """
+
+		start, end = self.disconnected, time.time()
+
+		if start is None:
+			return
+
+		for series in self.series.values():
+			series.add_gap(start, end)
+
+		self.downtime += end - start
+		self.disconnected = None
+
 
 
 
@@ -175,15 +659,151 @@ class TwitterListener(StreamListener):
 
 		""" Closes the Twitter stream """
 
-		self.stream.disconnect()
+		self.stopped.set()
+
+		if self.stream is not None:
+			self.stream.disconnect()
+
+		self.running = False
+		self.connected = False
+
+		if self.worker is not None:
+			self.worker.join()
+
+		if self.sink is not None:
+			self.sink.close()
+
+		self.__close_gap()
+		self.save_series()
+
 		print('Disconnected from the Twitter stream')
 
 
 
 
+	def __classify_loop(self):
+
+		""" Classifies the queued tweets, measuring the classification time """
+
+		while self.running:
+			if time.time() - self.saved >= self.series_interval:
+				self.save_series()
+
+			try:
+				tweet = self.queue.get(timeout = 1)
+			except Empty:
+				continue
+
+			start = time.time()
+			self.process(*tweet)
+			self.sampler.record(time.time() - start)
+
+			# The overflow backoff lasts until the backlog is classified
+			if self.queue.empty():
+				self.sampler.drained()
+
+
+
+
+	def __classify(self, tweet_text: str, tweet_lang: str) -> dict:
+
+		""" Classifies a cleaned tweet with every classifier it has windows in
+
+		Arguments:
+		----------
+			tweet_text: cleaned tweet text
+			tweet_lang: tweet language code
+
+		Returns:
+		----------
+			labels: groups, label and node labels (None if not exporting) per classifier name
+
+		"""
+
+		labels = {}
+
+		for name, classifier in self.classifiers.items():
+			groups = self.__get_groups(classifier, tweet_text, tweet_lang)
+
+			# Tweets not belonging to any window are not classified
+			if len(groups) == 0:
+				continue
+
+			# The label of every node is only needed when exporting
+			if self.sink is None:
+				label, nodes = classifier['clf'].predict(tweet_text, tweet_lang), None
+			else:
+				label, nodes = classifier['clf'].predict_nodes(tweet_text, tweet_lang)
+
+			labels[name] = (groups, label, nodes)
+
+		return labels
+
+
+
+
+	def process(self, tweet_text: str, tweet_lang: str, weight: float = 1.0,
+				tweet_id: int = None, tweet_time: float = None, source_id: int = None):
+
+		""" Cleans, classifies and counts a tweet in all the windows it belongs to
+
+		Arguments:
+		----------
+			tweet_text: lowercase tweet text
+			tweet_lang: tweet language code
+			weight: number of arrivals the tweet represents (optional)
+			tweet_id: tweet ID (optional)
+			tweet_time: tweet creation UNIX timestamp (optional)
+			source_id: ID of the status whose text is classified (optional)
+
+		"""
+
+		key = None if source_id is None else (source_id, tweet_lang)
+		cached = None if key is None else self.statuses.get(key)
+
+		# Retweets of an already classified status reuse its text and labels
+		if cached is not None:
+			tweet_text, labels = cached
+
+		else:
+			tweet_text = clean_text(tweet_text)
+			labels = self.__classify(tweet_text, tweet_lang)
+
+			if key is not None:
+				self.statuses.put(key, (tweet_text, labels))
+
+		row = {}
+
+		for name, (groups, label, nodes) in labels.items():
+			if nodes is not None:
+				row.update((name + ':' + n, l) for n, l in nodes.items())
+
+			if label is None:
+				continue
+
+			for group in groups:
+				self.windows[(name, group)].update(label, weight)
+
+			if name in self.series:
+				self.series[name].add(label, weight, tweet_time)
+
+		if (self.sink is not None) and row:
+			row.update(
+				id = tweet_id,
+				timestamp = tweet_time,
+				lang = tweet_lang,
+				text = tweet_text,
+				weight = weight
+			)
+
+			self.sink.write(row)
+
+
+
+
 	def on_status(self, tweet):
 
-		""" Process received tweet
+		""" Samples the received tweet and queues it for classification
 
 		Arguments:
 		----------
@@ -191,35 +811,90 @@ class TwitterListener(StreamListener):
 
 		"""
 
+		self.received += 1
+		weight = self.sampler.accept()
+
+		# The tweet is represented by the sampled ones
+		if weight is None:
+			return
+
 		tweet_text = self.get_text(tweet)
-		tweet_text = clean_text(tweet_text)
+		tweet_lang = getattr(tweet, 'lang', None)
+		tweet_time = getattr(tweet, 'created_at', None)
 
-		label = self.clf.predict(tweet_text)
+		if tweet_time is not None:
+			tweet_time = tweet_time.replace(tzinfo = timezone.utc).timestamp()
 
-		if label is not None:
-			self.__update_buffer(label)
+		try:
+			self.queue.put_nowait((tweet_text, tweet_lang, weight, tweet.id, tweet_time, self.get_source_id(tweet)))
+		except Full:
+			self.sampler.overflow()
+
+
+
+
+	def on_connect(self):
+
+		""" Closes the current disconnected interval once the stream is connected """
+
+		if self.disconnected is not None:
+			print('Reconnected after', round(time.time() - self.disconnected, 1), 's')
+
+			self.reconnects += 1
+			self.__close_gap()
+
+		self.connected = True
+		self.connected_at = time.time()
 
 
 
 
 	def on_exception(self, exception: Exception):
 
-		""" Finish stream due to the timeout exception """
+		""" Prints the connection exception (the stream is reconnected)
+
+		Arguments:
+		----------
+			exception: exception raised by the connection
+
+		"""
+
+		print('Twitter stream exception:', exception)
+
+
+
+
+	def on_timeout(self) -> bool:
+
+		""" Stops the connection due to lack of data (the stream is reconnected)
+
+		Returns:
+		----------
+			continue: False, so the stream is reconnected with backoff
+
+		"""
 
 		print('Timeout exception due to lack of data')
-		self.finish_stream()
+		return False
 
 
 
 
-	def on_error(self, code: int):
+	def on_error(self, code: int) -> bool:
 
-		""" Prints error code
+		""" Prints and stores the error code (the stream is reconnected)
 
 		Arguments:
 		----------
 			code: stream error code
 
+		Returns:
+		----------
+			continue: False, so the stream is reconnected with backoff
+
 		"""
 
-		exit('Twitter stream error: ' + str(code))
+		print('Twitter stream error: ' + str(code))
+		self.code = code
+
+		return False
@@ -1,6 +1,7 @@
 # Created by Sinclert Perez (Sinclert@hotmail.com)
 
 
+import hashlib
 import json
 import os
 import pickle
@@ -11,10 +12,14 @@ from typing import Union
 
 
 project_paths = {
+	'cache': ['cache'],
 	'dataset': ['resources', 'datasets'],
+	'export': ['exports'],
 	'model': ['models'],
 	'profile_p': ['profiles', 'predicting'],
 	'profile_t': ['profiles', 'training'],
+	'series': ['series'],
+	'snapshot': ['snapshots'],
 	'stopwords': ['resources', 'stopwords']
 }
 
@@ -59,7 +64,7 @@ default_filters = (
 
 
 
-def append_text(file_name: str, min_length: int = 0):
+def append_text(file_name: str, min_length: int = 0, offset: int = None):
 
 	""" Coroutine that appends the received text at the end of a file
 
@@ -67,10 +72,15 @@ def append_text(file_name: str, min_length: int = 0):
 	----------
 		file_name: appendable file name
 		min_length: minimum length to append a text (optional)
+		offset: byte offset where the file is truncated before appending (optional)
 
 	Yield:
 	----------
-		text: text to append in the file
+		text: text to append in the file (None flushes the file to disk)
+
+	Returns (sent):
+	----------
+		offset: byte offset of the end of the written text
 
 	"""
 
@@ -82,12 +92,25 @@ def append_text(file_name: str, min_length: int = 0):
 	)
 
 	try:
-		file = open(file_path, 'a', encoding = 'utf-8')
+		file = open(file_path, 'ab')
+
+		# Removes any partially written tail (the position is not moved by truncating)
+		if offset is not None:
+			file.truncate(offset)
+			file.seek(0, os.SEEK_END)
 
 		try:
+			text = yield file.tell()
+
 			while True:
-				text = yield
-				if len(text) >= min_length: file.write(text + '\n')
+				if text is None:
+					file.flush()
+					os.fsync(file.fileno())
+
+				elif len(text) >= min_length:
+					file.write((text + '\n').encode('utf-8'))
+
+				text = yield file.tell()
 
 		finally:
 			file.close()
@@ -167,7 +190,7 @@ def compute_path(file_name: str, file_type: str) -> str:
 	Arguments:
 	----------
 		file_name: desired file name
-		file_type: {'dataset', 'model', 'profile_p', 'profile_t', 'stopwords'}
+		file_type: {'cache', 'dataset', 'export', 'model', 'profile_p', 'profile_t', 'snapshot', 'stopwords'}
 
 	Returns:
 	----------
@@ -190,6 +213,40 @@ def compute_path(file_name: str, file_type: str) -> str:
 
 
 
+def hash_file(file_name: str, file_type: str) -> str:
+
+	""" Computes the SHA-1 digest of the specified file content
+
+	Arguments:
+	----------
+		file_name: readable file name
+		file_type: used to determine the proper path
+
+	Returns:
+	----------
+		digest: hexadecimal digest of the file content
+
+	"""
+
+	file_path = compute_path(file_name, file_type)
+	digest = hashlib.sha1()
+
+	try:
+		file = open(file_path, 'rb')
+
+		for chunk in iter(lambda: file.read(1 << 20), b''):
+			digest.update(chunk)
+
+		file.close()
+
+		return digest.hexdigest()
+
+	except IOError:
+		exit('The file ' + file_name + ' cannot be opened')
+
+
+
+
 def load_object(file_name: str, file_type: str) -> dict:
 
 	""" Loads an object from the specified file
@@ -280,6 +337,88 @@ def read_json(file_name: str, file_type: str) -> Union[dict, list]:
 
 
 
+def write_json(obj: Union[dict, list], file_name: str, file_type: str):
+
+	""" Atomically writes a dictionary or list as a JSON file
+
+	Arguments:
+	----------
+		obj: JSON serializable dictionary or list
+		file_name: writable file name
+		file_type: used to determine the proper path
+
+	"""
+
+	file_path = compute_path(file_name, file_type)
+
+	os.makedirs(
+		file_path.replace(file_name, ''),
+		exist_ok = True
+	)
+
+	try:
+		file = open(file_path + '.tmp', 'w', encoding = 'utf-8')
+		json.dump(obj, file)
+		file.close()
+
+		os.replace(file_path + '.tmp', file_path)
+
+	except IOError:
+		exit('The file ' + file_name + ' cannot be written')
+
+
+
+
+def count_lines(file_name: str, file_type: str) -> int:
+
+	""" Counts the lines of a file, streaming it only once
+
+	Arguments:
+	----------
+		file_name: readable file name
+		file_type: used to determine the proper path
+
+	Returns:
+	----------
+		count: number of lines (split as 'read_lines' does)
+
+	"""
+
+	return sum(1 for _ in iterate_lines(file_name, file_type))
+
+
+
+
+def iterate_lines(file_name: str, file_type: str):
+
+	""" Generator that streams the lines of a file, split as 'read_lines' does
+
+	Arguments:
+	----------
+		file_name: readable file name
+		file_type: used to determine the proper path
+
+	Yield:
+	----------
+		line: file line (without its line boundary)
+
+	"""
+
+	file_path = compute_path(file_name, file_type)
+
+	try:
+		with open(file_path, 'r', encoding = 'utf-8') as file:
+
+			# Lines are also split on the boundaries other than the new line character
+			for line in file:
+				yield from line.splitlines()
+
+	except IOError:
+		exit('The file ' + file_name + ' cannot be opened')
+
+
+
+
 def read_lines(file_name: str, file_type: str) -> list:
 
 	""" Reads the lines of a file and returns them inside a list
@@ -306,3 +445,39 @@ def read_lines(file_name: str, file_type: str) -> list:
 
 	except IOError:
 		exit('The file ' + file_name + ' cannot be opened')
+
+
+
+
+def sample_lines(file_name: str, file_type: str, max_lines: int, seed: int = 0) -> list:
+
+	""" Reads a uniform sample of the lines of a file, streaming it only once
+
+	Arguments:
+	----------
+		file_name: readable file name
+		file_type: used to determine the proper path
+		max_lines: maximum number of sampled lines
+		seed: random generator seed, so the sample is reproducible (optional)
+
+	Returns:
+	----------
+		lines: sampled file lines (in the file order)
+
+	"""
+
+	generator = random.Random(seed)
+	reservoir = []
+
+	for i, line in enumerate(iterate_lines(file_name, file_type)):
+
+		# Reservoir sampling: every line is kept with probability max_lines / (i + 1)
+		if i < max_lines:
+			reservoir.append((i, line))
+		else:
+			j = generator.randint(0, i)
+
+			if j < max_lines:
+				reservoir[j] = (i, line)
+
+	return [line for _, line in sorted(reservoir)]